@@ -1,10 +1,34 @@
 __all__ = ['tools']
 
+from stmpy.config import set_dtype, get_dtype, precision
 from stmpy.io import load, save
-from stmpy import tools
-from stmpy import matio
-from stmpy import image
-from stmpy.image import saturate
-from stmpy.color.colormap import cm
-import stmpy.color.palette as palette
 
+# Submodules that pull in matplotlib or most of scipy are only imported the
+# first time they are used, e.g. stmpy.tools.fft or stmpy.cm.redblue, so that
+# 'import stmpy' stays cheap for scripts that only load data.
+_lazyModules = {'tools'     : 'stmpy.tools',
+                'matio'     : 'stmpy.matio',
+                'image'     : 'stmpy.image',
+                'color'     : 'stmpy.color',
+                'palette'   : 'stmpy.color.palette',
+                }
+_lazyAttributes = {'saturate'   : ('stmpy.image', 'saturate'),
+                   'cm'         : ('stmpy.color.colormap', 'cm'),
+                   }
+
+
+def __getattr__(name):
+    import importlib
+    if name in _lazyModules:
+        value = importlib.import_module(_lazyModules[name])
+    elif name in _lazyAttributes:
+        module, attr = _lazyAttributes[name]
+        value = getattr(importlib.import_module(module), attr)
+    else:
+        raise AttributeError("module 'stmpy' has no attribute {:}".format(name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazyModules) + list(_lazyAttributes))
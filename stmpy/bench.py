@@ -0,0 +1,609 @@
+'''
+Performance benchmarks for stmpy.
+
+The synthetic data generators write realistic Nanonis files (square
+lattice topography with drift, QPI-like LIY modulations around point
+defects, noise and bad pixels) so that loaders and tools can be timed
+without proprietary data.  The benchmark runner records the time,
+throughput and peak memory of each case to a JSON file, which can be kept
+as a baseline and compared against on every release.
+
+Contents:
+    import_time()       -   Time 'import stmpy' in a fresh interpreter.
+    check_import()      -   Check that importing stmpy stays within a budget.
+    synthetic_topo()    -   Lattice topography with drift and defects.
+    synthetic_map()     -   QPI-like LIY map with matching current.
+    write_3ds()         -   Write a synthetic Nanonis grid (.3ds) file.
+    write_sxm()         -   Write a synthetic Nanonis scan (.sxm) file.
+    write_dat()         -   Write a synthetic Nanonis point spectrum (.dat).
+    write_nsp()         -   Write a synthetic Nanonis long term spectrum (.nsp).
+    write_dataset()     -   Write one file of each type for a size preset.
+    measure()           -   Time a function and trace its peak memory.
+    run()               -   Time loaders and tools across sizes.
+    compare()           -   Compare results against a JSON baseline.
+
+Usage:
+    python -m stmpy.bench                                   # import check
+    python -m stmpy.bench --run small medium -o baseline.json
+    python -m stmpy.bench --run small medium --baseline baseline.json
+'''
+
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import subprocess
+import tracemalloc
+import numpy as np
+
+
+IMPORT_BUDGET = 0.5     # Seconds for 'import stmpy; stmpy.load'.
+HEAVY_MODULES = ['matplotlib', 'pylab', 'scipy.optimize', 'scipy.signal',
+                 'scipy.io', 'skimage']
+
+_IMPORT_SCRIPT = '''
+import sys, json, time
+t0 = time.perf_counter()
+{statement}
+dt = time.perf_counter() - t0
+print(json.dumps({{'time': dt, 'modules': [name for name in {heavy!r}
+                                           if name in sys.modules]}}))
+'''
+
+
+def import_time(statement='import stmpy; stmpy.load', repeat=5):
+    '''
+    Time a statement, by default 'import stmpy; stmpy.load', in fresh python
+    interpreters.
+
+    Inputs:
+        statement   - Optional : Python code to time.
+        repeat      - Optional : Number of interpreters to start. The best
+                                 time is reported.
+
+    Returns:
+        seconds     - Best time in seconds.
+        modules     - List of the HEAVY_MODULES imported by the statement.
+    '''
+    script = _IMPORT_SCRIPT.format(statement=statement, heavy=HEAVY_MODULES)
+    results = []
+    for __ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', script])
+        results.append(json.loads(output.decode('utf-8').splitlines()[-1]))
+    best = min(results, key=lambda result: result['time'])
+    return best['time'], best['modules']
+
+
+def check_import(budget=IMPORT_BUDGET, repeat=5):
+    '''
+    Check that 'import stmpy; stmpy.load' takes less than budget seconds and
+    does not import any of HEAVY_MODULES.
+
+    Returns:
+        passed  - Boolean.
+    '''
+    seconds, modules = import_time(repeat=repeat)
+    passed = seconds < budget and not modules
+    print('import stmpy: {:.3f} s (budget {:.3f} s)'.format(seconds, budget))
+    if modules:
+        print('ERR: import stmpy also imported: {:}'.format(', '.join(modules)))
+    elif seconds >= budget:
+        print('ERR: import stmpy is over budget.')
+    return passed
+
+
+####    ____SYNTHETIC DATA____    ####
+
+# Size presets used by write_dataset() and run().
+#   topo    - Pixels of the square topography (sxm and tool benchmarks).
+#   grid    - Pixels of the square spectroscopic grid (3ds).
+#   points  - Energies per spectrum in the grid.
+#   dat     - Points in the point spectrum (dat).
+#   nsp     - Rows and columns of the long term spectrum (nsp).
+SIZES = {'small'    : {'topo': 128, 'grid': 32, 'points': 32, 'dat': 512,
+                       'nsp': (64, 512)},
+         'medium'   : {'topo': 256, 'grid': 64, 'points': 64, 'dat': 2048,
+                       'nsp': (256, 1024)},
+         'large'    : {'topo': 512, 'grid': 128, 'points': 128, 'dat': 8192,
+                       'nsp': (1024, 2048)},
+         }
+
+
+def synthetic_topo(nx, ny=None, a=8.0, drift=1.0, noise=0.05, defects=5,
+                   badPixels=1e-3, seed=0):
+    '''
+    Square lattice topography with a slowly varying drift field, Gaussian
+    defects, noise and bad pixels.
+
+    Inputs:
+        nx          - Required : Number of pixels along x.
+        ny          - Optional : Number of pixels along y. Default is nx.
+        a           - Optional : Lattice constant in pixels.
+        drift       - Optional : Amplitude of the drift field in pixels.
+        noise       - Optional : Standard deviation of the white noise,
+                                 relative to the lattice amplitude.
+        defects     - Optional : Number of point defects.
+        badPixels   - Optional : Fraction of pixels replaced by spikes.
+        seed        - Optional : Seed of the random number generator.
+
+    Returns:
+        topo    - 2D array of shape (ny, nx) in units of the lattice
+                  amplitude.  The Bragg peaks of its tools.fft are at
+                  (nx//2 +- nx/a, ny//2) and (nx//2, ny//2 +- ny/a).
+    '''
+    ny = nx if ny is None else ny
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:ny, 0:nx].astype(np.float64)
+    ux = drift * np.sin(2*np.pi * y / ny) * np.cos(np.pi * x / nx)
+    uy = drift * np.cos(2*np.pi * x / nx) * np.sin(np.pi * y / ny)
+    q = 2*np.pi / a
+    topo = np.cos(q * (x + ux)) + np.cos(q * (y + uy))
+    topo += 2e-3 * (x - nx/2.) + 1e-3 * (y - ny/2.)
+    for x0, y0 in zip(rng.uniform(0, nx, defects), rng.uniform(0, ny, defects)):
+        topo -= 2 * np.exp(-((x - x0)**2 + (y - y0)**2) / (0.5 * a**2))
+    topo += rng.normal(scale=noise, size=topo.shape)
+    bad = rng.random(topo.shape) < badPixels
+    topo[bad] = rng.choice([-20., 20.], size=bad.sum())
+    return topo
+
+
+def synthetic_map(nx, ny=None, points=64, en=None, a=8.0, defects=5,
+                  noise=0.05, badPixels=1e-3, biasOffset=1e-3, seed=0):
+    '''
+    QPI-like spectroscopic map: a V-shaped density of states with Friedel
+    oscillations around point defects whose wavevector disperses with
+    energy, plus a weak lattice modulation, noise and bad pixels.
+
+    Inputs:
+        nx          - Required : Number of pixels along x.
+        ny          - Optional : Number of pixels along y. Default is nx.
+        points      - Optional : Number of energies.
+        en          - Optional : Array of energies in V. Default is
+                                 linspace(-0.1, 0.1, points).
+        a           - Optional : Lattice constant in pixels.
+        defects     - Optional : Number of point defects.
+        noise       - Optional : Standard deviation of the noise, relative
+                                 to the mean LIY.
+        badPixels   - Optional : Fraction of spectra replaced by spikes.
+        biasOffset  - Optional : Offset in V of the zero of the current.
+        seed        - Optional : Seed of the random number generator.
+
+    Returns:
+        en  - 1D array of energies in V.
+        LIY - 3D array of shape (points, ny, nx) in S.
+        I   - 3D array of shape (points, ny, nx) in A, crossing zero at
+              en = -biasOffset.
+    '''
+    ny = nx if ny is None else ny
+    rng = np.random.default_rng(seed)
+    if en is None:
+        en = np.linspace(-0.1, 0.1, points)
+    en = np.asarray(en, dtype=np.float64)
+    y, x = np.mgrid[0:ny, 0:nx].astype(np.float64)
+    dos = 0.2 + np.abs(en) / np.abs(en).max()
+    k = np.pi / a * (0.3 + 0.5 * (en - en.min()) / np.ptp(en))
+    LIY = np.empty((len(en), ny, nx))
+    LIY[:] = dos[:, None, None]
+    lattice = 0.05 * (np.cos(2*np.pi * x / a) + np.cos(2*np.pi * y / a))
+    LIY += lattice * dos[:, None, None]
+    for x0, y0 in zip(rng.uniform(0, nx, defects), rng.uniform(0, ny, defects)):
+        r = np.hypot(x - x0, y - y0)
+        envelope = 1. / (1. + r / a)
+        for ie, ke in enumerate(k):
+            LIY[ie] += 0.3 * dos[ie] * envelope * np.cos(2 * ke * r)
+    LIY += rng.normal(scale=noise * dos.mean(), size=LIY.shape)
+    bad = rng.random((ny, nx)) < badPixels
+    LIY[:, bad] *= 50
+    LIY *= 1e-9
+    I = np.cumsum(LIY, axis=0) * np.gradient(en)[:, None, None]
+    I -= I[np.argmin(np.abs(en + biasOffset))]
+    return en, LIY, I
+
+
+def write_3ds(filePath, nx=32, ny=None, points=32, seed=0):
+    '''
+    Write a synthetic Nanonis grid spectroscopy (.3ds) file with Current,
+    LIY and Z channels (see synthetic_map).
+
+    Inputs:
+        filePath    - Required : Path of the file to write.
+        nx          - Optional : Grid size along x.
+        ny          - Optional : Grid size along y. Default is nx.
+        points      - Optional : Energies per spectrum.
+        seed        - Optional : Seed of the random number generator.
+
+    Returns:
+        filePath    - Path of the written file.
+    '''
+    ny = nx if ny is None else ny
+    en, LIY, I = synthetic_map(nx, ny, points, seed=seed)
+    topo = 1e-11 * synthetic_topo(nx, ny, seed=seed)
+    channels = ['Current (A)', 'LIY 1 omega (A)', 'Z (m)']
+    params = ['Sweep Start', 'Sweep End', 'X (m)', 'Y (m)', 'Z (m)']
+    header = ['Grid dim="{:} x {:}"'.format(nx, ny),
+              'Grid settings=0;0;{:};{:};0'.format(nx * 1e-10, ny * 1e-10),
+              'Sweep Signal="Bias (V)"',
+              'Fixed parameters="Sweep Start;Sweep End"',
+              'Experiment parameters="{:}"'.format(';'.join(params[2:])),
+              '# Parameters (4 byte)={:}'.format(len(params)),
+              'Experiment size (bytes)={:}'.format(4 * points * len(channels)),
+              'Points={:}'.format(points),
+              'Channels="{:}"'.format(';'.join(channels)),
+              'Delay before measuring (s)=0',
+              'Experiment=Grid Spectroscopy',
+              'Start time={:}'.format(time.strftime('%d.%m.%Y %H:%M:%S')),
+              'Lock-in>Amplitude=0.001',
+              'Bias>Bias (V)=0.1',
+              'Current>Current (A)=1E-10',
+              ':HEADER_END:', '']
+    y, x = np.mgrid[0:ny, 0:nx] * 1e-10
+    data = np.empty((ny, nx, len(params) + len(channels) * points), '>f4')
+    data[..., :len(params)] = np.dstack([np.full((ny, nx), en[0]),
+                                         np.full((ny, nx), en[-1]),
+                                         x, y, topo])
+    for ic, channel in enumerate([I, LIY, np.broadcast_to(topo, LIY.shape)]):
+        start = len(params) + ic * points
+        data[..., start:start + points] = np.moveaxis(channel, 0, -1)
+    with open(filePath, 'wb') as fileObj:
+        fileObj.write('\r\n'.join(header).encode('utf-8'))
+        data.tofile(fileObj)
+    return filePath
+
+
+def write_sxm(filePath, nx=256, ny=None, seed=0):
+    '''
+    Write a synthetic Nanonis scan (.sxm) file with Z, Current and LIY
+    channels, forward and backward (see synthetic_topo).
+
+    Inputs:
+        filePath    - Required : Path of the file to write.
+        nx          - Optional : Pixels along x.
+        ny          - Optional : Pixels along y. Default is nx.
+        seed        - Optional : Seed of the random number generator.
+
+    Returns:
+        filePath    - Path of the written file.
+    '''
+    ny = nx if ny is None else ny
+    rng = np.random.default_rng(seed)
+    topo = 1e-11 * synthetic_topo(nx, ny, seed=seed)
+    current = 1e-10 * (1 + rng.normal(scale=0.02, size=topo.shape))
+    liy = 1e-12 * (1 + topo / np.abs(topo).max())
+    channels = [('Z', 'm', topo), ('Current', 'A', current),
+                ('LIY_1_omega', 'A', liy)]
+    header = [':NANONIS_VERSION:', '2',
+              ':SCANIT_TYPE:', '              FLOAT            MSBFIRST',
+              ':REC_DATE:', time.strftime(' %d.%m.%Y'),
+              ':REC_TIME:', time.strftime('%H:%M:%S'),
+              ':REC_TEMP:', '      0.3000000000',
+              ':ACQ_TIME:', '       {:.1f}'.format(ny * 2.),
+              ':SCAN_PIXELS:', '       {:}       {:}'.format(nx, ny),
+              ':SCAN_FILE:', filePath,
+              ':SCAN_TIME:', '             1.000E+0             1.000E+0',
+              ':SCAN_RANGE:', '           {:E}           {:E}'.format(
+                  nx * 1e-10, ny * 1e-10),
+              ':SCAN_OFFSET:', '             0.000000E+0         0.000000E+0',
+              ':SCAN_ANGLE:', '            0.000E+0',
+              ':SCAN_DIR:', 'up',
+              ':BIAS:', '            1.000E-1',
+              ':Z-CONTROLLER:', '\tName\ton\tSetpoint\tP-gain\tI-gain\tT-const',
+              '\tlog Current\t1\t1.000E-10 A\t1.000E-12 m\t1.000E-9 m/s\t1.000E-3 s',
+              ':COMMENT:', 'stmpy synthetic data',
+              ':DATA_INFO:', '\tChannel\tName\tUnit\tDirection\tCalibration\tOffset']
+    for ix, (name, unit, __) in enumerate(channels):
+        header.append('\t{:}\t{:}\t{:}\tboth\t1.000E+0\t0.000E+0'.format(
+                      ix, name, unit))
+    header += ['', ':SCANIT_END:', '', '', '']
+    with open(filePath, 'wb') as fileObj:
+        fileObj.write('\n'.join(header).encode('utf-8'))
+        fileObj.write(b'\x1a\x04')
+        for __, __, image in channels:
+            image.astype('>f4').tofile(fileObj)
+            image[:, ::-1].astype('>f4').tofile(fileObj)
+    return filePath
+
+
+def write_dat(filePath, points=512, sweeps=3, seed=0):
+    '''
+    Write a synthetic Nanonis bias spectroscopy (.dat) file: the average
+    Current and LIY of a single pixel of synthetic_map plus the individual
+    noisy sweeps.
+
+    Inputs:
+        filePath    - Required : Path of the file to write.
+        points      - Optional : Number of bias points.
+        sweeps      - Optional : Number of individual sweeps.
+        seed        - Optional : Seed of the random number generator.
+
+    Returns:
+        filePath    - Path of the written file.
+    '''
+    rng = np.random.default_rng(seed)
+    en, LIY, I = synthetic_map(1, 1, points, defects=0, badPixels=0, seed=seed)
+    LIY, I = LIY[:, 0, 0], I[:, 0, 0]
+    header = ['Experiment\tbias spectroscopy',
+              'Saved Date\t{:}'.format(time.strftime('%d.%m.%Y %H:%M:%S')),
+              'Bias Spectroscopy>Number of sweeps\t{:}'.format(sweeps),
+              'Bias>Bias (V)\t100E-3',
+              'Z-Controller>Setpoint\t1E-10',
+              'Temperature 1>Temperature 1 (K)\t0.3',
+              '', '[DATA]']
+    names = ['Bias calc (V)', 'Current (A)', 'LIY 1 omega (A)']
+    names += ['LIY 1 omega [{:05d}] (A)'.format(ix + 1) for ix in range(sweeps)]
+    scale = 0.05 * LIY.mean()
+    data = np.column_stack([en, I, LIY] + [LIY + rng.normal(scale=scale, size=points)
+                                           for __ in range(sweeps)])
+    with open(filePath, 'w') as fileObj:
+        fileObj.write('\n'.join(header) + '\n' + '\t'.join(names) + '\n')
+        np.savetxt(fileObj, data, fmt='%.6E', delimiter='\t')
+    return filePath
+
+
+def write_nsp(filePath, rows=64, cols=512, seed=0):
+    '''
+    Write a synthetic Nanonis long term spectrum (.nsp) file: a 1/f noise
+    spectrum with a few sharp lines that drift slowly in time.
+
+    Inputs:
+        filePath    - Required : Path of the file to write.
+        rows        - Optional : Number of spectra (time steps).
+        cols        - Optional : Number of frequency bins.
+        seed        - Optional : Seed of the random number generator.
+
+    Returns:
+        filePath    - Path of the written file.
+    '''
+    rng = np.random.default_rng(seed)
+    df = 0.5
+    f = df * np.arange(1, cols + 1)
+    t = np.arange(rows)[:, None]
+    data = 1e-12 / np.sqrt(f) * (1 + 0.1 * rng.standard_normal((rows, cols)))
+    for f0 in rng.uniform(0.1, 0.9, 3) * f[-1]:
+        center = f0 * (1 + 1e-3 * np.sin(2 * np.pi * t / rows))
+        data += 5e-13 * np.exp(-(f - center)**2 / (2 * (2 * df)**2))
+    header = [':NANONIS_VERSION:', '1',
+              ':DATASIZEROWS:', str(rows),
+              ':DATASIZECOLS:', str(cols),
+              ':DELTA_f:', str(df),
+              ':SIGNAL:', 'Current (A)',
+              ':START_DATE:', time.strftime('%d.%m.%Y'),
+              ':START_TIME:', '00:00:00',
+              ':END_DATE:', time.strftime('%d.%m.%Y'),
+              ':END_TIME:', time.strftime('%H:%M:%S', time.gmtime(rows)),
+              ':HEADER_END:', '']
+    with open(filePath, 'wb') as fileObj:
+        fileObj.write('\n'.join(header).encode('utf-8'))
+        fileObj.write(b'\x1a\x04')
+        data.astype('>f4').tofile(fileObj)
+    return filePath
+
+
+def write_dataset(directory, size='small', seed=0):
+    '''
+    Write one synthetic .3ds, .sxm, .dat and .nsp file for a size preset.
+
+    Inputs:
+        directory   - Required : Directory to write the files to.
+        size        - Optional : Key of SIZES.
+        seed        - Optional : Seed of the random number generator.
+
+    Returns:
+        paths   - Dictionary of file type: path.
+    '''
+    preset = SIZES[size]
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    path = lambda ext: os.path.join(directory, '{:}.{:}'.format(size, ext))
+    rows, cols = preset['nsp']
+    return {'3ds': write_3ds(path('3ds'), preset['grid'], points=preset['points'], seed=seed),
+            'sxm': write_sxm(path('sxm'), preset['topo'], seed=seed),
+            'dat': write_dat(path('dat'), preset['dat'], seed=seed),
+            'nsp': write_nsp(path('nsp'), rows, cols, seed=seed)}
+
+
+####    ____BENCHMARKS____    ####
+
+def measure(func, repeat=3):
+    '''
+    Time a function and measure its peak memory.
+
+    The time is the best of repeat calls.  The peak memory is the largest
+    amount of memory allocated through python and numpy during one more call
+    traced with tracemalloc, which is not included in the timing.
+
+    Returns:
+        seconds - Best time in seconds.
+        peak    - Peak traced memory in bytes.
+    '''
+    times = []
+    for __ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        func()
+        __, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def _cases(size, paths, seed=0):
+    '''Yield (name, function, amount of work, unit) for a size preset.'''
+    import stmpy
+    from stmpy import tools
+    preset = SIZES[size]
+    for fmt in ['3ds', 'sxm', 'dat', 'nsp']:
+        filePath = paths[fmt]
+        yield ('load.{:}'.format(fmt),
+               lambda filePath=filePath: stmpy.load(filePath, cache=False),
+               os.path.getsize(filePath) / 1e6, 'MB/s')
+    N = preset['topo']
+    topo = synthetic_topo(N, seed=seed)
+    __, LIY, __ = synthetic_map(preset['grid'], points=preset['points'], seed=seed)
+    bp = [N//2 + N//8, N//2]
+    yield ('tools.fft', lambda: tools.fft(LIY, zeroDC=True), LIY.size / 1e6, 'Mpx/s')
+    yield ('tools.symmetrize', lambda: tools.symmetrize(topo, 4, bp=bp),
+           topo.size / 1e6, 'Mpx/s')
+    yield ('tools.lineSubtract', lambda: tools.lineSubtract(topo, n=2),
+           topo.size / 1e6, 'Mpx/s')
+    yield ('tools.lineSubtract.3d', lambda: tools.lineSubtract(LIY, n=2),
+           LIY.size / 1e6, 'Mpx/s')
+    braggs = np.array([[N//2 + N//8, N//2], [N//2, N//2 + N//8],
+                       [N//2 - N//8, N//2], [N//2, N//2 - N//8]])
+    def local_corr():
+        from stmpy import driftcorr
+        return driftcorr.local_corr(topo, bp=braggs, sigma=N//16)
+    yield ('driftcorr.local_corr', local_corr, topo.size / 1e6, 'Mpx/s')
+
+
+def run(sizes=('small',), repeat=3, directory=None, outFile=None, seed=0):
+    '''
+    Time stmpy.load on synthetic files and tools.fft, tools.symmetrize,
+    tools.lineSubtract and driftcorr.local_corr on synthetic data, for each
+    size preset.  A case that raises is recorded with its error and the
+    remaining cases still run.
+
+    Inputs:
+        sizes       - Optional : List of keys of SIZES.
+        repeat      - Optional : Number of timed calls per case.
+        directory   - Optional : Where to write the synthetic files. Default
+                                 is a temporary directory that is removed
+                                 afterwards.
+        outFile     - Optional : Path of a JSON file to save the results to.
+        seed        - Optional : Seed of the random number generator.
+
+    Returns:
+        results - Dictionary with the keys 'meta' (versions and platform)
+                  and 'results' (one entry per case and size with the time in
+                  seconds, throughput and peak memory in bytes).
+
+    Usage:
+        results = run(['small', 'medium'], outFile='baseline.json')
+    '''
+    import stmpy
+    tempDir = directory is None
+    if tempDir:
+        directory = tempfile.mkdtemp(prefix='stmpy-bench-')
+    entries = []
+    try:
+        for size in sizes:
+            paths = write_dataset(directory, size, seed=seed)
+            for name, func, work, unit in _cases(size, paths, seed):
+                entry = {'name': name, 'size': size}
+                try:
+                    seconds, peak = measure(_quiet(func), repeat)
+                    entry.update({'seconds': seconds, 'peak_memory': peak,
+                                  'throughput': work / seconds, 'unit': unit})
+                    print('{:<24}{:<8}{:>10.4f} s{:>10.1f} {:<6}{:>9.1f} MB'.format(
+                          name, size, seconds, work / seconds, unit, peak / 1e6))
+                except Exception as error:
+                    entry['error'] = '{:}: {:}'.format(type(error).__name__,
+                                                       (str(error).splitlines() or [''])[0])
+                    print('WARNING: {:} ({:}) failed: {:}'.format(name, size,
+                                                                entry['error']))
+                entries.append(entry)
+    finally:
+        if tempDir:
+            shutil.rmtree(directory, ignore_errors=True)
+    results = {'meta': {'stmpy': getattr(stmpy, '__version__', None),
+                        'python': platform.python_version(),
+                        'numpy': np.__version__,
+                        'platform': platform.platform(),
+                        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                        'repeat': repeat},
+               'results': entries}
+    if outFile is not None:
+        with open(outFile, 'w') as fileObj:
+            json.dump(results, fileObj, indent=2)
+    return results
+
+
+def compare(results, baseline, tolerance=1.25):
+    '''
+    Compare benchmark results against a baseline.
+
+    Inputs:
+        results     - Required : Output of run(), or path to its JSON file.
+        baseline    - Required : Baseline results, or path to a JSON file.
+        tolerance   - Optional : Ratio of time (or peak memory) to the
+                                 baseline above which a case is reported as
+                                 a regression.
+
+    Returns:
+        passed  - Boolean, False if any case regressed or newly fails.
+    '''
+    results, baseline = [_read_results(item) for item in (results, baseline)]
+    reference = {(entry['name'], entry['size']): entry
+                 for entry in baseline['results']}
+    passed = True
+    for entry in results['results']:
+        base = reference.get((entry['name'], entry['size']))
+        if base is None or 'error' in base:
+            continue
+        if 'error' in entry:
+            print('ERR: {:} ({:}) fails: {:}'.format(entry['name'],
+                  entry['size'], entry['error']))
+            passed = False
+            continue
+        for key, label in [('seconds', 'time'), ('peak_memory', 'memory')]:
+            ratio = entry[key] / float(base[key]) if base[key] else 1.0
+            if ratio > tolerance:
+                print('ERR: {:} ({:}) {:} regressed by {:.2f}x'.format(
+                      entry['name'], entry['size'], label, ratio))
+                passed = False
+    if passed:
+        print('No regressions against the baseline.')
+    return passed
+
+
+def _read_results(results):
+    if isinstance(results, dict):
+        return results
+    with open(results, 'r') as fileObj:
+        return json.load(fileObj)
+
+
+def _quiet(func):
+    '''Wrap func so that it does not print (loaders report on stdout).'''
+    def wrapper():
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            return func()
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+    return wrapper
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m stmpy.bench',
+                                     description='stmpy performance benchmarks.')
+    parser.add_argument('--run', nargs='*', metavar='SIZE', choices=sorted(SIZES),
+                        help='Run the benchmarks for these sizes ({:}).'.format(
+                             ', '.join(sorted(SIZES))))
+    parser.add_argument('-o', '--output', help='Save the results to a JSON file.')
+    parser.add_argument('--baseline', help='Compare the results to a JSON baseline.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Timed calls per case (default 3).')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='Allowed slowdown against the baseline (default 1.25).')
+    options = parser.parse_args(args)
+    passed = check_import()
+    if options.run is not None:
+        results = run(options.run or ['small'], repeat=options.repeat,
+                      outFile=options.output)
+        if options.baseline:
+            passed = compare(results, options.baseline, options.tolerance) and passed
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1 +1,19 @@
+# The colormap and palette modules import matplotlib, so they are only
+# imported the first time they are used.  The lut module does not need
+# matplotlib.
+_lazyModules = {'colormap'  : 'stmpy.color.colormap',
+                'palette'   : 'stmpy.color.palette',
+                'lut'       : 'stmpy.color.lut',
+                }
 
+
+def __getattr__(name):
+    import importlib
+    if name in _lazyModules:
+        value = importlib.import_module(_lazyModules[name])
+    elif name == 'cm':
+        value = importlib.import_module(_lazyModules['colormap']).cm
+    else:
+        raise AttributeError("module 'stmpy.color' has no attribute {:}".format(name))
+    globals()[name] = value
+    return value
@@ -1,6 +1,7 @@
 from matplotlib.colors import LinearSegmentedColormap as _LSC
-from matplotlib.pylab import cm
-from scipy.io import loadmat as _loadmat
+from matplotlib.colors import ListedColormap as _LC
+from matplotlib import cm as _mplcm
+from stmpy.color import lut as _lut
 import numpy as _np
 import os as _os
 
@@ -9,9 +10,12 @@ A collection of nice colormaps combining those from stmview, the default
 matplotlib ones and custom stmpy colormaps. 
 
 Usage:
-    When making a colormap, ensure it is correcly named (i.e. it must have a
-    cmap.name attrubute), then add it to the list at the bottom of the file to
-    create the reversed colormap. 
+    When making a colormap, add a function that builds it to _colormaps at
+    the bottom of the file, and its name to _reversible to also create the
+    reversed colormap.  Colormaps are only built the first time they are
+    used, e.g. stmpy.cm.redblue.  The STMView colormaps in color/maps are
+    read from a precompiled lookup table (see stmpy.color.lut) and listed
+    in lut._SOURCES.
 
  History:
     2016-11-10  - HP : Initial commit.
@@ -37,18 +41,15 @@ def invert_cmap(cmap, name='my_cmap'):
     '''
     colors = cmap(_np.arange(cmap.N))
     colors[:,:3] = 1 - colors[:,:3]
-    return cmap.from_list(name, colors, cmap.N)
+    return _LSC.from_list(name, colors, cmap.N)
 
 
-def _make_STMView_colormap(fileName, name='my_cmap'):
-    if fileName.endswith('.mat'):
-        matFile = _loadmat(_path + fileName)
-        for key in matFile:
-            if key not in ['__version__', '__header__', '__globals__']:
-                return _LSC.from_list(name, matFile[key])
-    elif fileName.endswith('.txt'):
-        txtFile = _np.loadtxt(_path + fileName)
-        return _LSC.from_list(name, txtFile)
+def _make_STMView_colormap(name):
+    '''
+    ListedColormap from the precompiled lookup table of an STMView colormap.
+    Names ending in '_r' give the reversed colormap.
+    '''
+    return _LC(_lut.get_lut(name), name=name)
 
 def _write_cmap_to_file(fileName, cmap):
     with open(fileName, 'w') as fileID:
@@ -93,26 +94,24 @@ def _make_diverging_colormap(i, f, m=[1,1,1], name='my_cmap'):
               'blue':  ((0.0, i[2], i[2]), (0.5, m[2], m[2]), (1.0, f[2], f[2]))}
     return _LSC(name, _cdict)
 
-cm.BuGy = _make_diverging_colormap(cm.RdGy(0.99), cm.RdBu(0.99), name='BuGy')
-cm.GnGy = _make_diverging_colormap(cm.RdGy(0.99), cm.BuGn(0.99), name='GnGy')
-cm.redblue = _make_diverging_colormap(i=(0.230, 0.299, 0.754), f=(0.706, 0.016,0.150), 
-                                      m=(0.865, 0.865, 0.865), name='redblue')
-cm.autumn = _make_STMView_colormap('Autumn.mat', name='autumn')
-cm.blue1 = _make_STMView_colormap('Blue1.mat', name='blue1')
-cm.blue2 = _make_STMView_colormap('Blue2.mat', name='blue2')
-cm.blue3 = _make_STMView_colormap('Blue3.mat', name='blue3')
-cm.defect0 = _make_STMView_colormap('Defect0.mat', name='defect0')
-cm.defect1 = _make_STMView_colormap('Defect1.mat', name='defect1')
-cm.defect2 = _make_STMView_colormap('Defect2.mat', name='defect2')
-cm.defect4 = _make_STMView_colormap('Defect4.mat', name='defect4')
-cm.gray = _make_STMView_colormap('Gray.mat', name='gray')
-cm.sailingMod2 = _make_STMView_colormap('SailingMod2.mat', name='sailingMod2')
-cm.jackyYRK = _make_diverging_colormap([1, 1, 0], [0, 0, 0.5], 
-                                        m=[0.7, 0.2, 0], name='jackyYRK')
-cm.jackyCopper = _make_diverging_colormap([0.2, 0.1, 0], [1, 0.95, 0.6],
-                                        m=[1, 0.65, 0.25], name='jackyCopper')
-cm.jackyRdGy = _make_diverging_colormap([0.2, 0.2, 0.2], [0.7, 0, 0],
-                                        m=[0.95,0.95, 0.95], name='jackyRdGy')
+class _LazyColormaps(object):
+    '''
+    Namespace holding the stmpy colormaps, which are built on first access.
+    Any other attribute is looked up in matplotlib.cm, so that e.g.
+    cm.viridis works as well.
+    '''
+    def __getattr__(self, name):
+        if name in _colormaps:
+            cmap = _colormaps[name]()
+            setattr(self, name, cmap)
+            return cmap
+        return getattr(_mplcm, name)
+
+    def __dir__(self):
+        return sorted(set(dir(_mplcm)) | set(_colormaps) | set(self.__dict__))
+
+cm = _LazyColormaps()
+
 _cdictPSD = {'red':   ((0.00, 0.00, 0.06),
                        (0.25, 0.21, 0.21),
                        (0.45, 0.31, 0.31),
@@ -131,41 +130,50 @@ _cdictPSD = {'red':   ((0.00, 0.00, 0.06),
                        (0.75, 0.27, 0.27),
                        (1.00, 0.95, 1.00))}
 
-cm.jackyPSD = _LSC('jackyPSD', _cdictPSD)
-cm.jason = _make_STMView_colormap('Red_Blue.txt', name='jason')
-cm.yanghe = invert_cmap(cm.defect0, name='yanghe')
-cm.helix = invert_cmap(cm.cubehelix_r, name='helix')
-cm.gold = invert_cmap(cm.bone_r, name='gold')
-cm.als = _make_STMView_colormap('ALS.txt', name='als')
-cm.hpblue = _make_diverging_colormap([0,0,0],
-        [0.14901960784313725, 0.5450980392156862, 0.9176470588235294])
-cm.mhblue = _make_STMView_colormap('mhblue.mat', name='mhblue')
-
+_colormaps = {
+    'BuGy' : lambda: _make_diverging_colormap(cm.RdGy(0.99), cm.RdBu(0.99), name='BuGy'),
+    'GnGy' : lambda: _make_diverging_colormap(cm.RdGy(0.99), cm.BuGn(0.99), name='GnGy'),
+    'redblue' : lambda: _make_diverging_colormap(i=(0.230, 0.299, 0.754), f=(0.706, 0.016,0.150), 
+                                      m=(0.865, 0.865, 0.865), name='redblue'),
+    'autumn' : lambda: _make_STMView_colormap('autumn'),
+    'blue1' : lambda: _make_STMView_colormap('blue1'),
+    'blue2' : lambda: _make_STMView_colormap('blue2'),
+    'blue3' : lambda: _make_STMView_colormap('blue3'),
+    'defect0' : lambda: _make_STMView_colormap('defect0'),
+    'defect1' : lambda: _make_STMView_colormap('defect1'),
+    'defect2' : lambda: _make_STMView_colormap('defect2'),
+    'defect4' : lambda: _make_STMView_colormap('defect4'),
+    'gray' : lambda: _make_STMView_colormap('gray'),
+    'sailingMod2' : lambda: _make_STMView_colormap('sailingMod2'),
+    'jackyYRK' : lambda: _make_diverging_colormap([1, 1, 0], [0, 0, 0.5], 
+                                        m=[0.7, 0.2, 0], name='jackyYRK'),
+    'jackyCopper' : lambda: _make_diverging_colormap([0.2, 0.1, 0], [1, 0.95, 0.6],
+                                        m=[1, 0.65, 0.25], name='jackyCopper'),
+    'jackyRdGy' : lambda: _make_diverging_colormap([0.2, 0.2, 0.2], [0.7, 0, 0],
+                                        m=[0.95,0.95, 0.95], name='jackyRdGy'),
+    'jackyPSD' : lambda: _LSC('jackyPSD', _cdictPSD),
+    'jason' : lambda: _make_STMView_colormap('jason'),
+    'yanghe' : lambda: invert_cmap(cm.defect0, name='yanghe'),
+    'helix' : lambda: invert_cmap(cm.cubehelix_r, name='helix'),
+    'gold' : lambda: invert_cmap(cm.bone_r, name='gold'),
+    'als' : lambda: _make_STMView_colormap('als'),
+    'hpblue' : lambda: _make_diverging_colormap([0,0,0],
+        [0.14901960784313725, 0.5450980392156862, 0.9176470588235294]),
+    'mhblue' : lambda: _make_STMView_colormap('mhblue'),
+    }
 
 
 # Reverse Cmaps: Add new cmap name to the list. 
-cmaps = [cm.BuGy, cm.GnGy, cm.redblue, cm.autumn, cm.blue1, cm.blue2, cm.blue3,
-         cm.defect0, cm.defect1, cm.defect2, cm.defect4, cm.gray,
-         cm.sailingMod2, cm.jackyYRK, cm.jackyCopper, cm.jackyRdGy,
-         cm.jackyPSD, cm.jason, cm.helix, cm.yanghe, cm.gold, cm.als,
-         cm.hpblue, cm.mhblue]
-
-for cmap in cmaps:
-    rev = _reverse_LSC(cmap)
-    setattr(cm, cmap.name + '_r', rev)
-
-
-# Remove non-cmap attributes and methods from cm
-removeall = ['colors', 'absolute_import', 'cmaps_listed', 'cmapname', 'cmap_d', 'datad', 
-          'division', 'get_cmap', 'LUTSIZE', 'ma', 'mpl', 'np', 'print_function', 'os', 
-          'register_cmap', 'revcmap', 'ScalarMappable', 'six', 'unicode_literals', 'cbook']
-
-remove = ['colors', 'absolute_import', 'cmaps_listed', 'cmapname', 'cmap_d', 'datad', 
-          'division', 'get_cmap', 'LUTSIZE', 'ma', 'mpl', 'np', 'print_function', 'os', 
-          'register_cmap', 'revcmap', 'six', 'unicode_literals', 'cbook']
-
-#for name in remove:
-#    delattr(cm, name)
-
-
-
+_reversible = ['BuGy', 'GnGy', 'redblue', 'autumn', 'blue1', 'blue2', 'blue3',
+               'defect0', 'defect1', 'defect2', 'defect4', 'gray',
+               'sailingMod2', 'jackyYRK', 'jackyCopper', 'jackyRdGy',
+               'jackyPSD', 'jason', 'helix', 'yanghe', 'gold', 'als',
+               'hpblue', 'mhblue']
+
+for _name in _reversible:
+    if _name in _lut._SOURCES:
+        _colormaps[_name + '_r'] = (lambda name:
+                lambda: _make_STMView_colormap(name + '_r'))(_name)
+    else:
+        _colormaps[_name + '_r'] = (lambda name: 
+                lambda: _reverse_LSC(getattr(cm, name)))(_name)
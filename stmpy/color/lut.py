@@ -0,0 +1,229 @@
+'''
+Precompiled lookup tables (LUTs) for the STMView colormaps in color/maps.
+
+The colormap files are read once and compiled into a single binary file
+holding an N x 256 x 4 float32 array of RGBA values, which is rebuilt
+automatically when any of the map files change.  The file is kept in the
+stmpy cache directory ($STMPY_CACHE_DIR or ~/.cache/stmpy).  A prebuilt file
+in color/maps is also used if it is up to date, but color/maps is never
+written to.  The LUTs are used by
+stmpy.cm to build ListedColormaps, and by apply() to convert arrays to RGBA
+images without importing matplotlib, e.g. for headless rendering.
+
+Contents:
+    names()         -   Names of the compiled colormaps.
+    get_lut()       -   256 x 4 RGBA table of a colormap.
+    apply()         -   Map an array to RGBA colors.
+    compile_luts()  -   (Re)build the LUT file.
+
+Usage:
+    from stmpy.color import lut
+    rgba = lut.apply(data.LIY[:,:,10], 'blue2', bytes=True)
+'''
+
+import os
+import hashlib
+import numpy as np
+
+
+_path = os.path.join(os.path.dirname(__file__), 'maps')
+_LUT_FILE = 'stmview.lut.npz'
+_LUT_VERSION = 1
+_N = 256
+
+# Colormap name: source file in color/maps.
+_SOURCES = {'autumn'      : 'Autumn.mat',
+            'blue1'       : 'Blue1.mat',
+            'blue2'       : 'Blue2.mat',
+            'blue3'       : 'Blue3.mat',
+            'defect0'     : 'Defect0.mat',
+            'defect1'     : 'Defect1.mat',
+            'defect2'     : 'Defect2.mat',
+            'defect4'     : 'Defect4.mat',
+            'gray'        : 'Gray.mat',
+            'sailingMod2' : 'SailingMod2.mat',
+            'jason'       : 'Red_Blue.txt',
+            'als'         : 'ALS.txt',
+            'mhblue'      : 'mhblue.mat',
+            }
+
+_luts = None
+
+
+def names():
+    '''Names of the compiled colormaps (add '_r' for the reversed ones).'''
+    return sorted(_SOURCES)
+
+
+def get_lut(name):
+    '''
+    Return the lookup table of a compiled colormap.
+
+    Inputs:
+        name    - Required : Name of the colormap, e.g. 'blue2'.  Names
+                             ending in '_r' give the reversed colormap.
+
+    Returns:
+        lut     - 256 x 4 float32 array of RGBA values in [0, 1].  This is
+                  a read-only view into the shared table.
+    '''
+    luts = _load()
+    if name in luts:
+        return luts[name]
+    if name.endswith('_r') and name[:-2] in luts:
+        return luts[name[:-2]][::-1]
+    raise KeyError('No compiled colormap named {:}. Options are: {:}'.format(
+                   name, ', '.join(names())))
+
+
+def apply(data, cmap, vmin=None, vmax=None, bytes=False):
+    '''
+    Map an array to RGBA colors using a compiled colormap, without
+    matplotlib.  The result matches matplotlib's cmap(Normalize(vmin,
+    vmax)(data)): values outside [vmin, vmax] get the end colors and NaNs
+    are transparent.
+
+    Inputs:
+        data    - Required : Array of any shape.
+        cmap    - Required : Colormap name (see names()) or an M x 3 or
+                             M x 4 array of colors in [0, 1].
+        vmin    - Optional : Value mapped to the first color. Default is
+                             the smallest finite value of data.
+        vmax    - Optional : Value mapped to the last color. Default is the
+                             largest finite value of data.
+        bytes   - Optional : Boolean. If True return uint8 values in
+                             [0, 255] instead of floats in [0, 1].
+
+    Returns:
+        rgba    - Array of shape data.shape + (4,).
+
+    Usage:
+        rgba = apply(image, 'defect0', vmin=-1, vmax=1, bytes=True)
+    '''
+    if isinstance(cmap, str):
+        table = get_lut(cmap)
+    else:
+        table = np.asarray(cmap, dtype=np.float32)
+        if table.shape[-1] == 3:
+            table = np.column_stack([table, np.ones(len(table), np.float32)])
+    if bytes:
+        table = (table * 255).astype(np.uint8)
+    data = np.asarray(data)
+    finite = np.isfinite(data)
+    if vmin is None or vmax is None:
+        values = data[finite] if not finite.all() else data
+        if values.size:
+            vmin = values.min() if vmin is None else vmin
+            vmax = values.max() if vmax is None else vmax
+        else:
+            vmin, vmax = 0, 1
+    N = len(table)
+    scale = N / float(vmax - vmin) if vmax != vmin else 0.0
+    ix = np.asarray((data - vmin) * scale, dtype=np.float64)
+    np.clip(ix, 0, N - 1, out=ix)
+    allFinite = finite.all()
+    if not allFinite:
+        ix[~finite] = 0
+    rgba = table.take(ix.astype(np.intp), axis=0)
+    if not allFinite:
+        rgba[~finite] = 0
+    return rgba
+
+
+def compile_luts(filePath=None):
+    '''
+    Read the colormap files in color/maps and save them as a single LUT
+    file.  This is done automatically the first time a compiled colormap is
+    used and whenever the map files change.
+
+    Inputs:
+        filePath    - Optional : Where to save the LUT file.  Default is
+                                 the stmpy cache directory ($STMPY_CACHE_DIR
+                                 or ~/.cache/stmpy).  Pass a path in
+                                 color/maps to ship a prebuilt file.
+
+    Returns:
+        filePath    - Path of the saved file, or None if it could not be
+                      written.
+    '''
+    global _luts
+    keys = names()
+    table = np.stack([_read_source(_SOURCES[key]) for key in keys])
+    _luts = _as_dict(keys, table)
+    path = filePath if filePath is not None else _lut_paths()[0]
+    tmpPath = '{:}.{:}.tmp'.format(path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(tmpPath, 'wb') as fileObj:
+            np.savez(fileObj, names=np.array(keys), lut=table,
+                     signature=np.array(_signature()))
+        os.replace(tmpPath, path)
+        return path
+    except OSError:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+    print('WARNING: Could not save the colormap LUT file.')
+    return None
+
+
+def _load():
+    '''Return the LUTs, reading or compiling the LUT file if needed.'''
+    global _luts
+    if _luts is not None:
+        return _luts
+    signature = _signature()
+    for path in _lut_paths():
+        try:
+            with np.load(path) as npz:
+                if str(npz['signature']) != signature:
+                    continue
+                _luts = _as_dict(list(npz['names']), npz['lut'])
+                return _luts
+        except (OSError, KeyError, ValueError):
+            continue
+    compile_luts()
+    return _luts
+
+
+def _as_dict(keys, table):
+    table = np.ascontiguousarray(table, dtype=np.float32)
+    table.flags.writeable = False
+    return {str(key): lut for key, lut in zip(keys, table)}
+
+
+def _lut_paths():
+    '''Where to look for the LUT file: the user cache, which compile_luts
+    writes to, then a prebuilt file in color/maps, which is only read.'''
+    cacheDir = (os.environ.get('STMPY_CACHE_DIR') or
+                os.path.join(os.path.expanduser('~'), '.cache', 'stmpy'))
+    return [os.path.join(os.path.expanduser(cacheDir), _LUT_FILE),
+            os.path.join(_path, _LUT_FILE)]
+
+
+def _signature():
+    '''Hash of the names, sizes and modification times of the map files.'''
+    items = [_LUT_VERSION, _N]
+    for key in names():
+        stat = os.stat(os.path.join(_path, _SOURCES[key]))
+        items.append((key, _SOURCES[key], stat.st_size, stat.st_mtime_ns))
+    return hashlib.sha1(repr(items).encode('utf-8')).hexdigest()
+
+
+def _read_source(fileName):
+    '''
+    Read a colormap file and sample it at 256 points, interpolating linearly
+    between the colors as LinearSegmentedColormap.from_list does.
+    '''
+    if fileName.endswith('.mat'):
+        from scipy.io import loadmat
+        matFile = loadmat(os.path.join(_path, fileName))
+        colors = [matFile[key] for key in matFile if not key.startswith('__')][0]
+    else:
+        colors = np.loadtxt(os.path.join(_path, fileName))
+    colors = np.asarray(colors, dtype=np.float64)
+    x = np.linspace(0, 1, len(colors))
+    xi = np.linspace(0, 1, _N)
+    lut = np.ones((_N, 4))
+    for ic in range(colors.shape[1]):
+        lut[:, ic] = np.interp(xi, x, colors[:, ic])
+    return np.clip(lut, 0, 1)
@@ -0,0 +1,103 @@
+'''
+STMPY global settings.
+
+Contents:
+    set_dtype()     -   Set the floating point type used for new arrays.
+    get_dtype()     -   Return the floating point type used for new arrays.
+    precision()     -   Context manager to temporarily change the type.
+    as_working()    -   Convert data to the working floating point type.
+
+The working dtype is used by the loaders (e.g. load_3ds, load_sxm) and the
+heavy array tools (e.g. tools.fft, tools.symmetrize, tools.lineSubtract,
+driftcorr.driftcorr) for the arrays they allocate.  It is float64 by default.
+Setting it to float32 halves the memory used by large DOS maps.  Fits and
+other accuracy sensitive steps still compute in float64 internally.
+
+Usage:
+    stmpy.set_dtype('float32')
+    with stmpy.precision('float32'):
+        data = stmpy.load('map.3ds')
+'''
+
+import threading
+import contextlib
+import numpy as np
+
+
+_DTYPE = np.dtype(np.float64)
+_local = threading.local()
+
+
+def set_dtype(dtype):
+    '''
+    Set the working floating point type globally.
+
+    Inputs:
+        dtype   - Required : 'float32', 'float64' or the numpy equivalent.
+
+    Returns:
+        None
+    '''
+    global _DTYPE
+    _DTYPE = _check(dtype)
+
+
+def get_dtype():
+    '''
+    Return the working floating point type, taking into account any
+    precision() context active in the current thread.
+    '''
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        return stack[-1]
+    return _DTYPE
+
+
+@contextlib.contextmanager
+def precision(dtype):
+    '''
+    Context manager that sets the working floating point type for the
+    current thread.  Contexts can be nested.
+
+    Usage:
+        with stmpy.precision('float32'):
+            ft = stmpy.tools.fft(data.LIY)
+    '''
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    _local.stack.append(_check(dtype))
+    try:
+        yield
+    finally:
+        _local.stack.pop()
+
+
+def as_working(data, copy=False):
+    '''
+    Convert data to the working floating point type.  Complex data is
+    converted to the complex type of the same precision.
+
+    Inputs:
+        data    - Required : Array-like.
+        copy    - Optional : Boolean. If True always return a new array.
+
+    Returns:
+        array   - numpy array of the working (or matching complex) type.
+    '''
+    data = np.asarray(data)
+    dtype = get_dtype()
+    if np.iscomplexobj(data):
+        dtype = complex_dtype()
+    return data.astype(dtype, copy=copy)
+
+
+def complex_dtype():
+    '''Complex type with the same precision as the working type.'''
+    return np.result_type(get_dtype(), np.complex64)
+
+
+def _check(dtype):
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError('dtype must be float32 or float64.')
+    return dtype
@@ -5,12 +5,13 @@ except ModuleNotFoundError:
     print("Please install opencv-python module using following command:\npip3 install opencv-python")
 import stmpy
 import numpy as np
+from stmpy import config
 import scipy as sp
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import scipy.optimize as opt
 import scipy.ndimage as snd
-from scipy.interpolate import interp1d, interp2d
+from scipy.interpolate import interp1d
 from skimage import transform as tf
 from skimage.feature import peak_local_max
 #import stmpy.driftcorr as dfc
@@ -292,8 +293,8 @@ def phasemap(A, bp, obj=None, sigma=10, method="lockin", update_obj=True):
             xcoords, ycoords = np.meshgrid(t_x, t_y)
             exponent_x = (Q1[0] * xcoords + Q1[1] * ycoords)#(2.* np.pi/s)*(Q1[0] * xcoords + Q1[1] * ycoords)
             exponent_y = (Q2[0] * xcoords + Q2[1] * ycoords)#(2.* np.pi/s)*(Q2[0] * xcoords + Q2[1] * ycoords)
-            A_x = A * np.exp(np.complex(0,-1)*exponent_x)
-            A_y = A * np.exp(np.complex(0,-1)*exponent_y)
+            A_x = A * np.exp(-1j*exponent_x)
+            A_y = A * np.exp(-1j*exponent_y)
             sx = sigma
             sy = sigma
             Amp = 1/(4*np.pi*sx*sy)
@@ -471,7 +472,8 @@ def driftcorr(A, ux=None, uy=None, obj=None, method="lockin", interpolation='cub
         interpolation - Optional : Specifying which method to use for interpolating
 
     Returns:
-        A_corr      - 2D or 3D array of topo with drift corrected
+        A_corr      - 2D or 3D array of topo with drift corrected, in the
+                      working dtype (see stmpy.set_dtype)
 
     Usage:
         import stmpy.driftcorr as dfc
@@ -481,28 +483,13 @@ def driftcorr(A, ux=None, uy=None, obj=None, method="lockin", interpolation='cub
         04/28/2017      JG : Initial commit.
         04/29/2019      RL : Add "invfft" method, and add documents.
     '''
+    A = config.as_working(A)
     if method is "lockin":
-        A_corr = np.zeros_like(A)
         s = np.shape(A)[-1]
         t = np.arange(s, dtype='float')
         x, y = np.meshgrid(t, t)
-        xnew = (x - ux).ravel()
-        ynew = (y - uy).ravel()
-        tmp = np.zeros(s**2)
-        if len(A.shape) is 2:
-            tmp_f = interp2d(t, t, A, kind=interpolation)
-            for ix in range(tmp.size):
-                tmp[ix] = tmp_f(xnew[ix], ynew[ix])
-            A_corr = tmp.reshape(s, s)
-            return A_corr
-        elif len(A.shape) is 3:
-            for iz, layer in enumerate(A):
-                tmp_f = interp2d(t, t, layer, kind=interpolation)
-                for ix in range(tmp.size):
-                    tmp[ix] = tmp_f(xnew[ix], ynew[ix])
-                A_corr[iz] = tmp.reshape(s, s)
-                print('Processing slice %d/%d...'%(iz+1, A.shape[0]), end='\r')
-            return A_corr
+        if len(A.shape) in (2, 3):
+            return stmpy.tools.sample(A, x - ux, y - uy, order=interpolation)
         else:
             print('ERR: Input must be 2D or 3D numpy array!')
     elif method is "convolution":
@@ -520,7 +507,7 @@ def driftcorr(A, ux=None, uy=None, obj=None, method="lockin", interpolation='cub
 def _apply_drift_field(A, ux, uy, zeroOut=True):
     A_corr = np.copy(A)
     s = A.shape[-1]
-    t = np.arange(s, dtype='float')
+    t = np.arange(s, dtype=A.dtype)
     x, y = np.meshgrid(t, t)
     xshifted = x - ux
     yshifted = y - uy
@@ -529,22 +516,22 @@ def _apply_drift_field(A, ux, uy, zeroOut=True):
         A_corr[np.where(yshifted < 0)] = 0
         A_corr[np.where(xshifted > s)] = 0
         A_corr[np.where(yshifted > s)] = 0
-    qcoord = (2*np.pi/s)*(np.arange(s)-int(s/2))
+    qcoord = ((2*np.pi/s)*(np.arange(s)-int(s/2))).astype(A.dtype)
     #qcoord = (2*np.pi/s)*(np.arange(s)-(s/2))
-    xshifted = np.reshape(xshifted, [1, s**2])
-    yshifted = np.reshape(yshifted, [1, s**2])
+    xshifted = np.reshape(xshifted, [1, s**2]).astype(A.dtype)
+    yshifted = np.reshape(yshifted, [1, s**2]).astype(A.dtype)
     qcoord = np.reshape(qcoord, [s, 1])
     xphase = np.exp(-1j*(np.matmul(xshifted.T, qcoord.T).T))
     yphase = np.exp(-1j*(np.matmul(yshifted.T, qcoord.T).T))
     avgData = np.mean(A_corr)
     A_corr -= avgData
     A_corr = np.reshape(A_corr, s**2)
-    data_temp = np.zeros([s, s**2])
+    data_temp = np.zeros([s, s**2], dtype=A.dtype)
     for i in range(s):
         data_temp[i] = A_corr
     FT = np.matmul(data_temp * xphase, yphase.T).T
     invFT = np.fft.ifft2(np.fft.fftshift(FT)) + avgData
-    return np.real(invFT)
+    return np.real(invFT).astype(A.dtype)
 
 ##################################################################################
 ####################### Useful functions in the processing #######################
@@ -639,20 +626,16 @@ def cropedge(A, n, obj=None, bp=None, corner='0', c1=2,c2=2, a1=None, a2=None, f
         L_new2 = a2 * ((L-offset)//(a2))
         delta1 = (L - offset - L_new1) / 2
         delta2 = (L - offset - L_new2) / 2
-        t = np.arange(L - offset)
-        #t = np.arange(L)
         if len(np.shape(A)) == 2:
-            f = interp2d(t, t, B, kind='cubic')
             t_new1 = np.linspace(delta1, L_new1+delta1, num=L-offset+1)
             t_new2 = np.linspace(delta2, L_new2+delta2, num=L-offset+1)
-            z_new = f(t_new1[:-1], t_new2[:-1])
+            x, y = np.meshgrid(t_new1[:-1], t_new2[:-1])
+            z_new = stmpy.tools.sample(B, x, y, order='cubic')
         elif len(np.shape(A)) == 3:
-            z_new = np.zeros([np.shape(A)[0], L-offset, L-offset])
-            for i in range(len(A)):
-                f = interp2d(t, t, B[i], kind='cubic')
-                t_new1 = np.linspace(0, L_new1, num=L-offset+1)
-                t_new2 = np.linspace(0, L_new2, num=L-offset+1)
-                z_new[i] = f(t_new1[:-1], t_new2[:-1])
+            t_new1 = np.linspace(0, L_new1, num=L-offset+1)
+            t_new2 = np.linspace(0, L_new2, num=L-offset+1)
+            x, y = np.meshgrid(t_new1[:-1], t_new2[:-1])
+            z_new = stmpy.tools.sample(B, x, y, order='cubic')
         else:
             print('ERR: Input must be 2D or 3D numpy array!')
         if obj is not None:
@@ -720,7 +703,7 @@ def FTDCfilter(A, sigma):
     else:
         n = A.shape[1]
         m = np.arange(n, dtype='float')
-        c = np.float((n-1)/2)
+        c = float((n-1)/2)
     g = Gaussian2d(m, m, sigma, sigma, 0, c, c, 1)
     ft_A = np.fft.fftshift(np.fft.fft2(A))
     ft_Af = ft_A * g
@@ -901,7 +884,7 @@ def apply_dfc_3d(data, ux, uy, matrix, bp=None, obj=None, n1=None, crop1=None, n
     History:
         04/29/2019      RL : Initial commit.
     """
-    data_c = np.zeros_like(data)
+    data_c = np.zeros_like(config.as_working(data))
     for i in range(len(data)):
         _, data_c[i]  = gshearcorr(data[i], matrix=matrix, obj=obj, rspace=True, update_obj=update_obj)
     if crop1 is None:
@@ -5,36 +5,56 @@ STMPY I/O Version 1.0
 Read and write common file types.
 
 Contents:
-    load()  -   Load supported data into python
-    save()  -   Save python data to disk. 
+    load()      -   Load supported data into python
+    load_many() -   Load many files concurrently.
+    load_dat_stack() - Load many .dat spectra into one array.
+    clear_cache() - Empty the on-disk cache used by load(..., cache=True).
+    GridFollower -  Read a .3ds file while it is being acquired.
+    scan_headers() - Index the headers of all files in a directory.
+    bias_offset() - Bias where the current changes sign, for many spectra.
+    save()      -   Save python data to disk. 
 
 Version history:
     1.0     2018-03-02  - HP : Initial release.  
-
-TO DO: 
-    - Add support for .mat files
-    - Rewrite load_3ds() to buffer data and improve efficiency.
 '''
 
 __version__ = 1.0
 
 
 import stmpy
-from stmpy import matio
+from stmpy import config
 import numpy as np
-import scipy.io as sio
 import os
 import re
-
+import sys
+import glob
+import json
+import hashlib
+import zlib
+import lzma
+import bz2
+import threading
+import contextlib
+import warnings
+import concurrent.futures as futures
+
+from io import IOBase, BytesIO
+from ast import literal_eval
+from itertools import islice
+from collections import OrderedDict, deque
 from struct import pack, unpack, calcsize
 from datetime import datetime, timedelta
-from scipy.optimize import minimize
 
 
 
-def load(filePath, biasOffset=True, niceUnits=False):
+def load(filePath, biasOffset=True, niceUnits=False, cache=None, mmap=None,
+         fileType=None, **kwargs):
     '''
-    Loads data into python. Please include the file extension in the path.
+    Loads data into python.
+
+    The file type is found from the start of the file (e.g. the
+    ':NANONIS_VERSION:' tag of .sxm files), and from the extension if that is
+    not conclusive.  New file types can be added with register_format().
 
     Supported extensions: 
         .spy    -   STMPY generic data format. 
@@ -45,6 +65,7 @@ def load(filePath, biasOffset=True, niceUnits=False):
         .nvi    -   NISTview image data, used for topography data.  
         .nvl    -   NISTview layer data, used for 3D DOS maps. 
         .asc    -   ASCII file type. 
+        .mat    -   STMView structures (matlab -v6 and -v7). 
 
 
     For .3ds and .dat file types there is an optional flag to correct for bias offset
@@ -53,11 +74,43 @@ def load(filePath, biasOffset=True, niceUnits=False):
     Note: .mat files are supported as exports from STMView only.
 
     Inputs:
-        filePath    - Required : Path to file including extension.
+        filePath    - Required : Path to file, or an open binary file for
+                                 types that support streams (.3ds, .sxm,
+                                 .dat, .nsp).
         baisOffset  - Optional : Corrects didv data for bias offset by looking
-                                 for where the current is zero.
+                                 for where the current is zero.  For .3ds
+                                 files biasOffset='pixel' also finds the
+                                 offset of every pixel and stores it,
+                                 relative to the corrected en, as
+                                 data.biasOffsetMap.  Use
+                                 tools.shift_DOS_en(data.en, data.LIY,
+                                 data.biasOffsetMap) to correct each pixel.
         niceUnits   - Optional : Put lock-in channel units as nS (in future
                                  will switch Z to pm, etc.)
+        cache       - Optional : Keep a copy of the parsed data in an on-disk
+                                 cache, so the next load of the same file
+                                 with the same options is a memory map of the
+                                 cached copy.  True uses the directory in
+                                 the STMPY_CACHE_DIR environment variable
+                                 or ~/.cache/stmpy, a string sets the
+                                 directory and False disables the cache.  By
+                                 default the cache is only used if
+                                 STMPY_CACHE_DIR is set.  The cache is
+                                 limited to STMPY_CACHE_SIZE bytes (default
+                                 10 GB), evicting the least recently used
+                                 files first.
+        mmap        - Optional : Boolean. Memory map the data instead of
+                                 reading it, for types that support it
+                                 (.spy, .3ds, .sxm, .nsp).  By default files
+                                 larger than STMPY_MMAP_SIZE bytes (default
+                                 4 GB) are memory mapped.
+        fileType    - Optional : Name of the file type, e.g. '3ds', to skip
+                                 the detection.
+        **kwargs    - Optional : Passed to the loader for the file type, e.g.
+                                 lazy=True to memory map the channels of a
+                                 .3ds file, or channels, energies and roi to
+                                 load part of it (see help(stmpy.io.load_3ds)),
+                                 or fields=['info'] for .mat files.
     Returns:
         spyObject  - Custom object with attributes appropriate to the type of
                       data and containing experiment parameters in a header.
@@ -80,53 +133,62 @@ def load(filePath, biasOffset=True, niceUnits=False):
         2017-10-03  - HP : Improved reading of DAT files
         2018-03-02  - HP : VERSION  1.0 - Unified to a single SPY class. 
     '''
-    try:
-        extension = filePath.split('.')[1]
-    except IndexError:
-        raise IOError('Please include file extension in path.')
-    loadFn = 'load_' + extension
-
-    if extension in ['3ds', 'dat']:
-        dataObject = eval(loadFn)(filePath)
+    fmt = find_format(filePath, fileType)
+    if fmt is None or fmt.loader is None:
+        raise IOError('ERR - File type of {:} not supported.'.format(
+                      _file_name(filePath)))
+    stream = hasattr(filePath, 'read')
+    if stream:
+        if not fmt.supports_stream:
+            raise IOError('{:} files can only be loaded from a path.'.format(fmt.name))
+        if not (hasattr(filePath, 'seekable') and filePath.seekable()):
+            filePath = BytesIO(filePath.read())
+    if mmap is None:
+        mmap = (fmt.supports_mmap and not stream and 
+                os.path.getsize(filePath) >= _mmap_size())
+    if mmap:
+        if fmt.supports_mmap and not stream:
+            kwargs.setdefault(fmt.mmapKeyword, mmap)
+        else:
+            print('WARNING: {:} can not be memory mapped, loading into memory.'.format(
+                  _file_name(filePath)))
+    for key in list(kwargs):
+        if key in _PARTIAL_KEYWORDS and key not in fmt.partialKeywords:
+            print('WARNING: {:} files do not support {:}, loading everything.'.format(
+                  fmt.name, key))
+            del kwargs[key]
+    mapped = fmt.mmapKeyword is not None and kwargs.get(fmt.mmapKeyword, False)
+    cacheDir = _cache_dir(cache)
+    if cacheDir is not None and fmt.name != 'spy' and not mapped and not stream:
+        return _cached_load(cacheDir, filePath, biasOffset, niceUnits, kwargs)
+
+    dataObject = fmt.loader(filePath, **kwargs)
+    if fmt.name in ['3ds', 'dat']:
         if biasOffset:
-            dataObject = _correct_bias_offset(dataObject, extension)
+            dataObject = _correct_bias_offset(dataObject, fmt.name,
+                                              perPixel=biasOffset == 'pixel')
         if niceUnits:
             dataObject = _nice_units(dataObject)
-        return dataObject
-    
-    elif extension in ['spy', 'sxm', 'nvi', 'nvl', 'nsp', 'asc']:
-        return eval(loadFn)(filePath)
-    
-  #  elif filePath.endswith('.mat'):
-  #      raw_mat = matio.loadmat(filePath)
-  #      mappy_dict = {}
-  #      for key in raw_mat:
-  #          try:
-  #              mappy_dict[key] = matio.Mappy()
-  #              mappy_dict[key].mat2mappy(raw_mat[key])
-  #              print('Created channel: {:}'.format(key))
-  #          except:
-  #              del mappy_dict[key]
-  #              print('Could not convert: {:}'.format(key))
-  #      if len(mappy_dict) == 1: return mappy_dict[mappy_dict.keys()[0]]
-  #      else: return mappy_dict
-
-    else: 
-        raise IOError('ERR - File type {:} not supported.'.format(extension))
+    return dataObject
 
 
-def save(data, filePath, objects=[]):
+def save(data, filePath, objects=[], **kwargs):
     '''
-    Save python data to file. Please include the file extension in the path.
+    Save python data to file. The file type is set by the extension.
 
     Currently supports: 
         .spy    -   STMPY generic data format. 
+        .mat    -   STMView structure, for matio.Mappy objects and
+                    dictionaries. 
 
     Inputs: 
         data        - Required : Any python data/object/list/...
         filePath    - Required : str. Path where the file will be saved.
         objects     - Optional : lst. Only objects with a __class__ in this 
                                  list (and Spy objects) can be saved.  
+        **kwargs    - Optional : Passed to the writer, e.g. compression='zlib'
+                                 and chunks for .spy files (see
+                                 help(stmpy.io.save_spy)).
 
     Returns: 
         None
@@ -135,34 +197,461 @@ def save(data, filePath, objects=[]):
         2018-03-02  - HP : Initial commit. 
         2018-03-08  - HP : Added support for multi-line strings. 
     '''
-    try:
-        extension = filePath.split('.')[1]
-    except IndexError:
-        raise IOError('Please include file extension in path.')
-    saveFn = 'save_' + extension
-    if extension in ['spy']:
-        eval(saveFn)(data, filePath, objects)        
-    else: 
-        raise IOError('ERR - File type {:} not supported.'.format(extension))
+    extension = os.path.splitext(filePath)[1][1:].lower()
+    for fmt in _FORMATS.values():
+        if fmt.saver is not None and extension in fmt.extensions:
+            return fmt.saver(data, filePath, objects, **kwargs)
+    raise IOError('ERR - File type {:} not supported.'.format(extension))
 
 
 
+def clear_cache(cacheDir=None):
+    '''
+    Delete all files from the on-disk cache used by load(..., cache=True).
+
+    Inputs:
+        cacheDir    - Optional : Cache directory. Uses STMPY_CACHE_DIR or
+                                 ~/.cache/stmpy by default.
+
+    Returns:
+        None
+    '''
+    cacheDir = _cache_dir(cacheDir or True)
+    if os.path.isdir(cacheDir):
+        for name in os.listdir(cacheDir):
+            if name.endswith('.spy'):
+                os.remove(os.path.join(cacheDir, name))
+
+
+def load_many(paths, workers=None, backend='thread', as_completed=False,
+              quiet=True, **kwargs):
+    '''
+    Load a batch of files concurrently, e.g. every file from a session.
+
+    Inputs:
+        paths       - Required : List of file paths, a glob pattern such as
+                                 'session/*.3ds', or a directory in which case
+                                 all supported files inside it are loaded.
+        workers     - Optional : Maximum number of files being loaded at any
+                                 time (default: number of CPUs).
+        backend     - Optional : 'thread' or 'process'.  Threads share memory
+                                 and suit I/O bound loads, processes avoid the
+                                 GIL for parsing heavy formats but have to
+                                 pickle the results back.
+        as_completed - Optional : Boolean. If True, return an iterator that
+                                 yields (filePath, result) pairs as soon as
+                                 each file is loaded, so processing can start
+                                 before the whole batch has been read.
+        quiet       - Optional : Boolean. Suppress messages printed by the
+                                 loaders (default: True).
+        **kwargs    - Optional : Passed to stmpy.io.load() for every file,
+                                 e.g. biasOffset=False or lazy=True.
+
+    Files are loaded with the working dtype of the calling thread, including
+    any enclosing stmpy.precision() context.
+
+    Returns:
+        results - OrderedDict mapping each path to its Spy object, in the
+                  order the paths were given.  A file that fails to load maps
+                  to the exception it raised, so one bad file does not abort
+                  the batch.
+
+    Usage:
+        results = load_many('session/*.sxm', workers=8)
+        for filePath, data in load_many(paths, as_completed=True):
+            if isinstance(data, Exception): continue
+            ...
+    '''
+    if isinstance(paths, str):
+        if os.path.isdir(paths):
+            paths = [os.path.join(paths, name) for name in sorted(os.listdir(paths))
+                     if _extension_format(name) is not None]
+        else:
+            paths = sorted(glob.glob(paths))
+    paths = list(paths)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if backend == 'thread':
+        Executor = futures.ThreadPoolExecutor
+    elif backend == 'process':
+        Executor = futures.ProcessPoolExecutor
+    else:
+        raise ValueError('backend must be \'thread\' or \'process\'.')
+    results = _load_many(paths, Executor, max(1, int(workers)), quiet, kwargs)
+    if as_completed:
+        return results
+    loaded = OrderedDict((filePath, None) for filePath in paths)
+    for filePath, result in results:
+        loaded[filePath] = result
+    return loaded
+
+
+def scan_headers(directory, index=None, recursive=False):
+    '''
+    Build a catalog of the .sxm, .3ds, .dat and .nsp files in a directory by
+    reading only their headers.  
+
+    The catalog is stored as JSON lines (one record per file) and is updated
+    incrementally: a file is only parsed again if its size or modification
+    time changed, so repeated scans of a large directory are fast.
+
+    Inputs:
+        directory   - Required : Path of the directory to index.
+        index       - Optional : Path of the index file. Defaults to
+                                 '.stmpy_index.jsonl' inside directory. Set
+                                 to False to not read or write an index.
+        recursive   - Optional : Boolean. If True, also index subdirectories.
+
+    Returns:
+        records - List of dictionaries, one per file, sorted by path. Every
+                  record contains 'path', 'type', 'size', 'mtime' and the
+                  full 'header', along with the normalized fields 'date' (ISO
+                  string), 'bias' (V), 'setpoint', 'temperature' (K),
+                  'pixels', 'scan_range' (m) and 'points'.  Fields that are
+                  not available for a file type are None.  Files that could
+                  not be parsed have an 'error' field instead.
+
+    Usage:
+        records = scan_headers('/data/2018-05')
+        maps = [rec['path'] for rec in records if rec['type'] == '3ds'
+                and (rec['temperature'] or 0) < 0.35 and rec['bias'] > 0.05]
+    '''
+    if index is None:
+        index = os.path.join(directory, '.stmpy_index.jsonl')
+    cached = {}
+    if index and os.path.exists(index):
+        with open(index, 'r') as fileObj:
+            for line in fileObj:
+                try:
+                    record = json.loads(line)
+                    cached[record['path']] = record
+                except (ValueError, KeyError):
+                    continue
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in files:
+            if _extension_format(name, header=True) is not None:
+                paths.append(os.path.join(root, name))
+        if not recursive:
+            break
+    records = []
+    changed = len(cached) != len(paths)
+    for filePath in sorted(paths):
+        stat = os.stat(filePath)
+        key = os.path.relpath(filePath, directory)
+        record = cached.get(key)
+        if (record is None or record.get('size') != stat.st_size
+                or record.get('mtime') != stat.st_mtime):
+            record = _header_record(filePath)
+            record.update(path=key, size=stat.st_size, mtime=stat.st_mtime)
+            changed = True
+        records.append(record)
+    if index and changed:
+        tmpPath = index + '.tmp'
+        with open(tmpPath, 'w') as fileObj:
+            for record in records:
+                fileObj.write(json.dumps(record) + '\n')
+        os.replace(tmpPath, index)
+    return records
+
+
+class Format(object):
+    '''
+    A file type known to load() and save().  Use register_format() to add
+    new types.
+
+    Attributes:
+        name            - Short name of the type, e.g. '3ds'.
+        loader          - Function loader(filePath, **kwargs) returning the
+                          loaded data, or None.
+        saver           - Function saver(data, filePath, objects, **kwargs),
+                          or None.
+        extensions      - List of file extensions, without the dot.
+        magic           - List of byte strings that files of this type start
+                          with.
+        sniff           - Function sniff(head) that returns True if the
+                          first bytes of a file (head) belong to this type.
+                          If both magic and sniff are given both must match.
+        header          - Function header(fileObj) that reads only the
+                          header of an open file (used by scan_headers).
+        supports_mmap   - True if loader can memory map the data.
+        mmapKeyword     - Keyword argument of loader that turns memory
+                          mapping on, e.g. 'lazy'.
+        supports_partial - True if loader can read part of a file.
+        partialKeywords - Keyword arguments of loader that select part of a
+                          file, e.g. ('channels', 'roi').
+        supports_stream - True if loader accepts an open binary file in
+                          place of a path.
+    '''
+    def __init__(self, name, loader=None, saver=None, extensions=(), magic=(),
+                 sniff=None, header=None, supports_mmap=False,
+                 supports_partial=(), supports_stream=False):
+        self.name = name
+        self.loader = loader
+        self.saver = saver
+        self.extensions = [ext.lower().lstrip('.') for ext in extensions]
+        self.magic = list(magic)
+        self.sniff = sniff
+        self.header = header
+        if supports_mmap is True:
+            supports_mmap = 'mmap'
+        self.mmapKeyword = supports_mmap or None
+        self.supports_mmap = self.mmapKeyword is not None
+        self.partialKeywords = tuple(supports_partial or ())
+        self.supports_partial = bool(self.partialKeywords)
+        self.supports_stream = bool(supports_stream)
+
+    def matches(self, head):
+        '''True if head, the first bytes of a file, belong to this type.'''
+        if not self.magic and self.sniff is None:
+            return False
+        if self.magic and not any(head.startswith(m) for m in self.magic):
+            return False
+        return self.sniff is None or bool(self.sniff(head))
+
+    def __repr__(self):
+        return 'Format({:})'.format(self.name)
+
+
+def register_format(name, loader=None, saver=None, extensions=(), magic=(),
+                    sniff=None, header=None, supports_mmap=False,
+                    supports_partial=(), supports_stream=False):
+    '''
+    Add a file type to load(), save(), load_many() and scan_headers(), or
+    replace the handler of an existing type.
+
+    Inputs:
+        name        - Required : Short name of the type, e.g. 'ibw'.
+        loader      - Optional : Function loader(filePath, **kwargs).
+        saver       - Optional : Function saver(data, filePath, objects,
+                                 **kwargs).
+        extensions  - Optional : List of extensions, e.g. ['ibw'].  Used
+                                 when the content does not identify the file.
+        magic       - Optional : List of byte strings files start with.
+        sniff       - Optional : Function sniff(head) returning True if the
+                                 first bytes of a file belong to this type.
+        header      - Optional : Function header(fileObj) reading only the
+                                 header of an open binary file.
+        supports_mmap - Optional : True if loader takes mmap=True, or the
+                                 name of its memory mapping keyword.
+        supports_partial - Optional : List of keywords of loader that load
+                                 part of a file, e.g. ['channels'].
+        supports_stream - Optional : True if loader accepts an open binary
+                                 file in place of a path.
+
+    Returns:
+        fmt - The registered Format.
+
+    Usage:
+        register_format('xyz', loader=load_xyz, extensions=['xyz'],
+                        magic=[b'XYZ-DATA'])
+        data = stmpy.load('scan.xyz')
+    '''
+    fmt = Format(name, loader, saver, extensions, magic, sniff, header,
+                 supports_mmap, supports_partial, supports_stream)
+    _FORMATS[name] = fmt
+    _PARTIAL_KEYWORDS.update(fmt.partialKeywords)
+    return fmt
+
+
+def find_format(filePath, fileType=None):
+    '''
+    Find the Format of a file from its first bytes, falling back on the
+    extension.
+
+    Inputs:
+        filePath    - Required : Path or open binary file.
+        fileType    - Optional : Name of a registered type to use instead.
+
+    Returns:
+        fmt - Format, or None if the file type is not known.
+    '''
+    if fileType is not None:
+        try:
+            return _FORMATS[fileType]
+        except KeyError:
+            raise IOError('ERR - File type {:} not supported.'.format(fileType))
+    extension = os.path.splitext(_file_name(filePath))[1][1:].lower()
+    head = _read_head(filePath)
+    matches = [fmt for fmt in _FORMATS.values() if fmt.matches(head)]
+    for fmt in matches:
+        if extension in fmt.extensions:
+            return fmt
+    if matches:
+        return matches[0]
+    for fmt in _FORMATS.values():
+        if extension in fmt.extensions:
+            return fmt
+    return None
+
+
+def bias_offset(en, I, axis=0):
+    '''
+    Find the bias at which the current first changes sign, by linear
+    interpolation between the two points around the zero crossing.  Works on
+    any number of spectra at once, e.g. a stack of .dat spectra or every
+    pixel of a DOS map.
+
+    Inputs:
+        en      - Required : 1D array of bias values.
+        I       - Required : Array of currents with len(en) points along
+                             axis.
+        axis    - Optional : Axis of I that corresponds to en.
+
+    Returns:
+        offset  - Array with the shape of I without axis (a float for a
+                  single spectrum).  NaN where the current does not change
+                  sign.
+
+    Usage:
+        offsetMap = bias_offset(data.en, data.I, axis=0)
+        offsets = bias_offset(stack.en, stack.I, axis=1)
+    '''
+    I = np.moveaxis(np.asarray(I), axis, 0)
+    en = np.asarray(en, dtype=np.float64)
+    crossing = np.diff(np.sign(I), axis=0) != 0
+    ix = np.argmax(crossing, axis=0)
+    I_low = np.take_along_axis(I, ix[None], axis=0)[0].astype(np.float64)
+    I_high = np.take_along_axis(I, ix[None]+1, axis=0)[0].astype(np.float64)
+    en_low, en_high = en[ix], en[ix+1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = en_high - I_high * (en_high-en_low) / (I_high - I_low)
+    offset = np.where(crossing.any(axis=0), offset, np.nan)
+    return offset[()]
+
+
 ####    ____HIDDEN METHODS____    ####
-def _correct_bias_offset(data, fileType):
+def _file_name(filePath):
+    '''Path of a file, or the name of an open file (if any).'''
+    if hasattr(filePath, 'read'):
+        return str(getattr(filePath, 'name', ''))
+    return filePath
+
+def _read_head(filePath):
+    '''First bytes of a file, without moving an open file.'''
+    if hasattr(filePath, 'read'):
+        if not (hasattr(filePath, 'seekable') and filePath.seekable()):
+            return b''
+        position = filePath.tell()
+        head = filePath.read(_SNIFF_SIZE)
+        filePath.seek(position)
+        return head if isinstance(head, bytes) else b''
+    try:
+        with open(filePath, 'rb') as fileObj:
+            return fileObj.read(_SNIFF_SIZE)
+    except (IOError, OSError):
+        return b''
+
+def _extension_format(filePath, header=False):
+    '''Format registered for the extension of filePath (with a header
+    reader if header is True), or None.'''
+    extension = os.path.splitext(filePath)[1][1:].lower()
+    for fmt in _FORMATS.values():
+        if extension in fmt.extensions and (fmt.header or not header):
+            return fmt
+    return None
+
+def _mmap_size():
+    '''Size in bytes above which load() memory maps files by default.'''
+    return int(float(os.environ.get('STMPY_MMAP_SIZE', 2**32)))
+
+def _open_file(filePath):
+    '''Open a file for binary reading.  Open files are wrapped so that the
+    loaders do not close them.'''
+    if hasattr(filePath, 'read'):
+        return _Unclosed(filePath)
+    try: 
+        return open(filePath, 'rb')
+    except:  
+        raise NameError('File not found.')
+
+class _Unclosed(object):
+    '''An open file owned by the caller, which close() leaves open.'''
+    def __init__(self, fileObj):
+        self._fileObj = fileObj
+
+    def __getattr__(self, name):
+        return getattr(self._fileObj, name)
+
+    def close(self):
+        pass
+
+# NISTview info entries: (key, attribute, read from the header).
+_NV_INFO = [('FILENAME', 'filename', False),
+            ('FILSIZE', 'filesize', True),
+            ('CHANNELS', 'scan_channels', True),
+            ('XSIZE', 'xsize', False),
+            ('YSIZE', 'ysize', False),
+            ('TEMPERATURE', 'temperature', True),
+            ('LOCKIN_AMPLITUDE', 'lockin_amplitude', True),
+            ('LOCKIN_FREQUENCY', 'lockin_frequency', True),
+            ('DATE', 'date', True),
+            ('TIME', 'time', True),
+            ('BIAS_SETPOINT', 'bias_setpoint', True),
+            ('BIAS_OFFSET', 'bias_offset', True),
+            ('BFIELD', 'bfield', True),
+            ]
+
+
+def _nv_info(raw, extra=[]):
+    '''Collect the NISTview info entries that exist in the raw structure.'''
+    info = {}
+    for key, attr, inHeader in _NV_INFO + extra:
+        try:
+            source = raw.header[0] if inHeader else raw
+            info[key] = getattr(source, attr)[0]
+        except (AttributeError, IndexError, ValueError):
+            continue
+    if 'FILSIZE' in info:
+        info['FILSIZE'] = int(info['FILSIZE'])
+    return info
+
+
+def _nvi_from_sav(nviData):
+    '''Build an nvi Spy object from the output of scipy.io.readsav.'''
+    self = Spy()
+    self._raw = nviData['imagetosave']
+    self.map = self._raw.currentdata[0]
+    self.header = {name:self._raw.header[0][name][0] for name in self._raw.header[0].dtype.names}
+    self.info = _nv_info(self._raw, [('ZUNITS', 'zunits', False)])
+    return self
+
+
+def _nvl_from_sav(nvlData):
+    '''Build an nvl Spy object from the output of scipy.io.readsav.'''
+    self = Spy()
+    self._raw = nvlData['savestructure']
+    self.en = self._raw.energies[0]
+    self.map = self._raw.fwddata[0]
+    self.ave = [np.mean(layer) for layer in self.map]
+    self.header = {name:self._raw.header[0][name][0] for name in self._raw.header[0].dtype.names}
+    for name in self._raw.dtype.names:
+        if name not in self.header.keys():
+            self.header[name] = self._raw[name][0]
+    self.info = _nv_info(self._raw, [('WINDOWTITLE', 'windowtitle', False),
+                                     ('XYUNITS', 'xyunits', False),
+                                     ('EUNITS', 'eunits', False)])
+    return self
+
+
+def _correct_bias_offset(data, fileType, perPixel=False):
     try:
         if fileType == 'dat':
             I = data.I
         elif fileType == '3ds':
-            I = [np.mean(data.I[ix]) for ix, __ in enumerate(data.en)]
+            I = np.mean(data.I, axis=(1,2), dtype=np.float64)
         else:
             print('ERR: Bias offset for {:} not yet implemented'.format(fileType))
             return data
-        for ix, (I_low, I_high) in enumerate(zip(I[:-1], I[1:])):
-            if np.sign(I_low) != np.sign(I_high):
-                en_low, en_high = data.en[ix], data.en[ix+1]
-                biasOffset = en_high - I_high * (en_high-en_low) / (I_high - I_low)
-                data.en -= biasOffset
-                break
+        biasOffset = float(bias_offset(data.en, I))
+        if np.isnan(biasOffset):
+            print('ERR: No zero crossing in current, bias offset not corrected')
+            return data
+        if perPixel and fileType == '3ds':
+            data.biasOffsetMap = bias_offset(data.en, data.I, axis=0) - biasOffset
+        data.en -= biasOffset
+        data.biasOffset = biasOffset
         print('Corrected for a bias offset of {:2.2f} meV'.format(biasOffset*1000))
         return data
     except:
@@ -179,19 +668,19 @@ def _nice_units(data):
                            justified 
     '''
     def use_nS(data):
-        def chi(X):
-            gFit = X * data.didv / lockInMod
-            err = np.absolute(gFit - didv)
-            return np.log(np.sum(err**2))
         lockInMod = float(data.header['Lock-in>Amplitude'])
-        current = np.mean(data.I, axis=(1,2))
+        current = np.mean(data.I, axis=(1,2), dtype=np.float64)
         didv = np.gradient(current) / np.gradient(data.en)
-        result = minimize(chi, 1)
-        data.to_nS = result.x / lockInMod * 1e9 
+        # Least squares scale factor X minimizing |X * didv_lockin - didv|^2.
+        gLockIn = np.asarray(data.didv, dtype=np.float64) / lockInMod
+        X = np.dot(gLockIn, didv) / np.dot(gLockIn, gLockIn)
+        data.to_nS = X / lockInMod * 1e9 
         data.didv *= data.to_nS
-        data.LIY *= data.to_nS
+        if data.LIY.flags.writeable:
+            data.LIY *= data.to_nS
+        else:
+            data.LIY = data.LIY * data.to_nS
         data.didvStd *= data.to_nS
-        phi = np.arccos(1.0/result.x)
     
     def use_nm(data):
         fov = [float(val) for val in data.header['Scan>Scanfield'].split(';')]
@@ -231,103 +720,509 @@ def _make_attr(self, attr, names, data):
     dat = getattr(self, data)
     for name in names:
        if name in dat.keys():
-            setattr(self, attr, dat[name])
+            setattr(self, attr, _peek(dat, name))
             return 1
     return 0
 
+def _peek(channels, name):
+    '''Get a channel without loading it into memory if it is memory mapped.'''
+    if isinstance(channels, _LazyChannels):
+        return channels.view(name)
+    return channels[name]
 
 
-####    ____SAVE FUNCTIONS____    ####
+def _read_3ds_header(fileObj):
+    '''Read the header of an open .3ds file, leaving fileObj at the start of
+    the data.'''
+    header = {}
+    while True:
+        line = fileObj.readline()
+        if line == b'':
+            raise IOError('Reached end of file before :HEADER_END:.')
+        line = line.strip().decode('utf-8')
+        if line == ':HEADER_END:': 
+            break
+        splitLine = line.split('=')
+        header[splitLine[0]] = splitLine[1]
+    return header
+
+def _cache_dir(cache):
+    '''Directory of the load() cache, or None if the cache is not used.'''
+    if cache is None:
+        cache = os.environ.get('STMPY_CACHE_DIR') or False
+    if cache is False:
+        return None
+    if cache is True:
+        cache = (os.environ.get('STMPY_CACHE_DIR') or 
+                 os.path.join(os.path.expanduser('~'), '.cache', 'stmpy'))
+    return os.path.expanduser(cache)
+
+def _cached_load(cacheDir, filePath, biasOffset, niceUnits, kwargs):
+    '''
+    Load a file through the cache.  The cache file name is a hash of the
+    absolute path, size and modification time of the file, the load
+    options and the working dtype, so a changed file, different options or
+    a different precision give a new entry.
+    '''
+    stat = os.stat(filePath)
+    key = repr([_CACHE_VERSION, os.path.abspath(filePath), stat.st_size,
+                stat.st_mtime_ns, biasOffset, niceUnits, sorted(kwargs.items()),
+                str(config.get_dtype())])
+    cachePath = os.path.join(cacheDir, 
+                             hashlib.sha1(key.encode('utf-8')).hexdigest() + '.spy')
+    if os.path.exists(cachePath):
+        try:
+            data = load_spy(cachePath, mmap='c')
+            os.utime(cachePath)
+            return data
+        except Exception as err:
+            print('WARNING: Could not read cache file {:}: {:}'.format(
+                  cachePath, err))
+    data = load(filePath, biasOffset=biasOffset, niceUnits=niceUnits,
+                cache=False, mmap=False, **kwargs)
+    try:
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+        tmpPath = '{:}.{:}.tmp'.format(cachePath, os.getpid())
+        save_spy(data, tmpPath)
+        os.replace(tmpPath, cachePath)
+        _cache_evict(cacheDir, keep=cachePath)
+    except Exception as err:
+        print('WARNING: Could not write cache file {:}: {:}'.format(
+              cachePath, err))
+    return data
+
+def _cache_evict(cacheDir, keep=None):
+    '''Delete least recently used cache files until the cache fits within
+    STMPY_CACHE_SIZE bytes.'''
+    maxSize = int(float(os.environ.get('STMPY_CACHE_SIZE', 10e9)))
+    files = []
+    for name in os.listdir(cacheDir):
+        if name.endswith('.spy'):
+            path = os.path.join(cacheDir, name)
+            stat = os.stat(path)
+            files.append((stat.st_mtime, stat.st_size, path))
+    total = sum([size for __, size, __ in files])
+    for __, size, path in sorted(files):
+        if total <= maxSize:
+            break
+        if path != keep:
+            os.remove(path)
+            total -= size
 
-def save_spy(data, filePath, objects=[]):
-    '''Save python data to file'''
-    def write_npy(name, npy):
-        if npy.dtype.name == 'object':
-            fileObj.write('OAR=' + name + '\n')
-            fileObj.write(str(npy.shape) + '\n')
-            for obj in npy:
-                write_obj('unnamed', obj)
+def _read_sxm_header(fileObj, filePath):
+    '''Read the header of an open .sxm file, stopping at :SCANIT_END:.'''
+    header = {}
+    s1 = fileObj.readline().decode('utf-8')
+    if not re.match(':NANONIS_VERSION:', s1):
+        raise NameError('The file {:} does not have the Nanonis SXM'.format(filePath))
+    header['version'] = int(fileObj.readline())
+    while True:
+        line = fileObj.readline()
+        if line == b'':
+            raise IOError('Reached end of file before :SCANIT_END:.')
+        line = line.strip().decode('utf-8')
+        if re.match('^:.*:$', line):
+            tagname = line[1:-1]
         else:
-            fileObj.write('NPY=' + name + '\n')
-            np.save(fileObj, npy)
+            if 'Z-CONTROLLER' == tagname:
+                keys = line.split('\t')
+                values = fileObj.readline().strip().decode('utf-8').split('\t')
+                header['z-controller'] = dict(zip(keys, values))
+            elif tagname in ('BIAS', 'REC_TEMP', 'ACQ_TIME', 'SCAN_ANGLE'):
+                header[tagname.lower()] = float(line)
+            elif tagname in ('SCAN_PIXELS', 'SCAN_TIME', 'SCAN_RANGE', 'SCAN_OFFSET'):
+                header[tagname.lower()] = [ float(i) for i in re.split('\s+', line) ]
+            elif 'DATA_INFO' == tagname:
+                if 1 == header['version']:
+                    keys = re.split('\s\s+',line)
+                else:
+                    keys = line.split('\t')
+                header['data_info'] = []
+                while True:
+                    line = fileObj.readline().strip().decode('utf-8')
+                    if not line:
+                        break
+                    values = line.strip().split('\t')
+                    header['data_info'].append(dict(zip(keys, values)))
+            elif tagname in ('SCANIT_TYPE','REC_DATE', 'REC_TIME', 'SCAN_FILE', 'SCAN_DIR'):
+                header[tagname.lower()] = line
+            elif 'SCANIT_END' == tagname:
+                break
+            else:
+                if tagname.lower() not in header:
+                    header[tagname.lower()] = line
+                else:
+                    header[tagname.lower()] += '\n' + line
+    if 1 == header['version']:
+        header['scan_pixels'].reverse()
+    return header
+
+def _read_dat_header(fileObj):
+    '''Read the header of an open .dat file, stopping at [DATA].'''
+    header = {}
+    while True:
+        line = fileObj.readline().decode('utf-8')
+        splitLine = line.split('\t')
+        if line[0:6] == '[DATA]' or line == '': 
+            break
+        elif line.rstrip() != '': 
+            header[splitLine[0]] = splitLine[1]
+    return header
 
-    def write_obj(name, obj):
-        fileObj.write('OBJ=' + name + '\n')
-        for name, item in obj.__dict__.items():
-            write_item(name, item)
-        fileObj.write(':OBJ_END:\n')
+def _read_dat(fileObj):
+    '''Read the header, channel names and data block of an open .dat file.'''
+    header = _read_dat_header(fileObj)
+    channels = fileObj.readline().decode('utf-8').rstrip().split('\t')
+    dataStart = fileObj.tell()
+    block = fileObj.read().decode('utf-8')
+    fileObj.seek(0)
+    lineNumber = fileObj.read(dataStart).count(b'\n') + 1
+    allData = _parse_numbers(block, lineNumber)
+    if allData.size % len(channels):
+        print('ERR: Data set is not complete')
+        allData = allData[:allData.size - allData.size % len(channels)]
+    allData = allData.astype(config.get_dtype(), copy=False)
+    return header, channels, allData.reshape(-1, len(channels))
 
-    def write_dic(name, dic):
-        fileObj.write('DIC=' + name + '\n')
-        for name, item in dic.items():        
-            write_item(name, item)
-        fileObj.write(':DIC_END:\n')
-
-    def write_lst(name, lst):
-        fileObj.write('LST=' + name + '\n')
-        for ix, item in enumerate(lst):
-            write_item(str(ix), item)
-        fileObj.write(':LST_END:\n')
-
-    def write_str(name, val):
-        fileObj.write('STR=' + name + '\n')
-        fileObj.write(bytearray(val.encode('utf-8')) + '\n')
-        fileObj.write(':STR_END:\n')
-    
-    def write_num(name, val):
-        fileObj.write('NUM=' + name + '\n')
-        if isinstance(val, int):
-            fmt = '>i'
-        elif isinstance(val, float):
-            fmt = '>d'
-        elif isinstance(val, long):
-            fmt = '>l'
-        fileObj.write(fmt + pack(fmt, val))
-
-    def write_cpx(name, val):
-        fileObj.write('CPX=' + name + '\n')
-        fileObj.write(pack('>f', val.real) + pack('>f', val.imag))
-
-    def write_bol(name, val):
-        fileObj.write('BOL=' + name + '\n')
-        fileObj.write('NOTWORKING')
-
-    def write_item(name, item):        
-        if type(item).__module__ == np.__name__:
-            write_npy(name, item)
-        elif isinstance(item, dict):
-            write_dic(name, item)
-        elif isinstance(item, list):
-            write_lst(name, item)
-        elif isinstance(item, tuple):
-            print('Tuples present...')
-        elif isinstance(item, file): 
-            pass
-        elif isinstance(item, str) or isinstance(item, unicode):
-            write_str(name, item)
-        elif type(item) in [int, float, long]:
-            write_num(name, item)
-        elif isinstance(item, complex):
-            write_cpx(name, item)
-        elif callable(item):
-            print('WARING: Callable item not saved: {:}.'.format(name))
-        elif any([isinstance(item, obj) for obj in objects]):
-            write_obj(name, item)
-        else:
-            raise(TypeError('Item {:} {:} not supported.'.format(name, type(item))))
-    
-    fileObj = open(filePath, 'wb')
-    fileObj.write('SPY: Stmpy I/O, Version=' + str(__version__) + '\n')
-    objects.append(Spy)
-    write_item('MAIN', data)
-    fileObj.close()
+def _parse_numbers(block, lineNumber=1):
+    '''
+    Convert a block of whitespace separated numbers to a 1D array with a
+    single np.fromstring call.  np.fromstring silently stops at the first
+    token it can not parse (newer numpy raises instead), so the number of
+    values is checked against the number of tokens and a ValueError naming
+    the offending line (counting the first line of block as lineNumber) is
+    raised if they differ.
+    '''
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            values = np.fromstring(block, sep=' ')
+        if values.size == len(block.split()):
+            return values
+    except ValueError:
+        pass
+    for ix, line in enumerate(block.splitlines()):
+        for token in line.split():
+            try:
+                float(token)
+            except ValueError:
+                raise ValueError('Could not convert {!r} on line {:} to a '
+                                 'number.'.format(token, lineNumber + ix))
+    raise ValueError('Could not parse the numbers starting on line {:}.'
+                     .format(lineNumber))
+
+def _read_numeric_lines(fileObj, firstLine, delimiter=None, isData=None,
+                        chunkLines=None, lineNumber=1):
+    '''
+    Parse a block of numeric text lines starting with firstLine and
+    continuing with the next lines of the open text file fileObj.  The lines
+    are read in chunks of chunkLines and each chunk is converted with a
+    single np.fromstring call.  The block ends at the end of the file or at
+    the first line for which isData(line) is False.
 
+    The number of columns is taken from firstLine.  Rows with more columns
+    are truncated, rows with fewer columns or values that are not numbers
+    raise a ValueError giving the line number, where firstLine is line
+    lineNumber of the file.
 
+    Returns:
+        data    - Array (rows x columns).
+        rest    - List of the lines read after the end of the block.
+    '''
+    chunkLines = chunkLines or _TEXT_CHUNK
+    cols = len(firstLine.strip().split(delimiter))
+    chunks = []
+    lines = [firstLine] if firstLine else []
+    rest = []
+    while True:
+        lines += list(islice(fileObj, chunkLines))
+        if not lines:
+            break
+        n = len(lines)
+        if isData is not None:
+            n = next((ix for ix, line in enumerate(lines) if not isData(line)), n)
+        block = ''.join(lines[:n])
+        if delimiter is not None and delimiter.strip():
+            block = block.replace(delimiter, ' ')
+        values = _parse_numbers(block, lineNumber)
+        if values.size == n * cols:
+            chunks.append(values.reshape(-1, cols))
+        else:
+            chunks.append(_ragged_rows(block, cols, lineNumber))
+        lineNumber += n
+        if n < len(lines):
+            rest = lines[n:]
+            break
+        lines = []
+    if not chunks:
+        return np.zeros((0, cols)), rest
+    return np.concatenate(chunks), rest
+
+def _ragged_rows(block, cols, lineNumber):
+    '''Slow path of _read_numeric_lines for blocks whose rows do not all
+    have cols values: keep the first cols values of each row.'''
+    rows = []
+    for ix, line in enumerate(block.splitlines()):
+        values = line.split()
+        if len(values) < cols:
+            raise ValueError('Line {:} has {:} columns, expected {:}.'.format(
+                             lineNumber + ix, len(values), cols))
+        rows.append(values[:cols])
+    return np.array(rows, dtype=np.float64).reshape(-1, cols)
+
+def _read_nsp_header(fileObj):
+    '''Read the header of an open .nsp file, stopping at :HEADER_END:.'''
+    header = {}
+    while True:
+        line = fileObj.readline()
+        if line == b'' or line.strip() == b':HEADER_END:':
+            break
+        line = line.strip().decode('utf-8')
+        if re.match('^:.*:$', line):
+            tagname = line[1:-1]
+        else:
+            try:
+                header[tagname] = int(line.split('\t')[0])
+            except:
+                header[tagname] = line.split('\t')[0]
+    return header
+
+def _header_record(filePath):
+    '''Read the header of a single file and extract the normalized fields
+    used by scan_headers().'''
+    fmt = _extension_format(filePath, header=True)
+    extension = fmt.name
+    record = {'type': extension}
+    try:
+        with open(filePath, 'rb') as fileObj:
+            header = fmt.header(fileObj)
+    except Exception as err:
+        record['error'] = '{:}: {:}'.format(type(err).__name__, err)
+        return record
+    get = lambda *names: next((header[name] for name in names
+                               if name in header), None)
+    if extension == 'sxm':
+        zc = header.get('z-controller', {})
+        record.update(
+            date=_iso_date(get('rec_date'), get('rec_time')),
+            bias=get('bias'),
+            setpoint=_to_float(zc.get('Setpoint')),
+            temperature=get('rec_temp'),
+            pixels=[int(n) for n in header.get('scan_pixels', [])] or None,
+            scan_range=get('scan_range'),
+            points=None)
+    elif extension == 'nsp':
+        record.update(
+            date=_iso_date(get('START_DATE'), get('START_TIME')),
+            bias=None, setpoint=None, temperature=None,
+            pixels=[get('DATASIZECOLS'), get('DATASIZEROWS')],
+            scan_range=None, points=get('DATASIZECOLS'))
+    else:
+        temperature = [key for key in header
+                       if 'Temperature' in key and key.endswith('(K)')]
+        date = _to_str(get('Start time', 'Saved Date', 'Date'))
+        record.update(
+            date=_iso_date(*date.split(' ', 1)) if date else None,
+            bias=_to_float(get('Bias>Bias (V)')),
+            setpoint=_to_float(get('Z-Controller>Setpoint',
+                                   'Current>Current (A)')),
+            temperature=_to_float(header[temperature[0]])
+                        if temperature else None,
+            pixels=None, scan_range=None, points=None)
+        if extension == '3ds':
+            settings = _to_str(get('Grid settings')) or ''
+            settings = [_to_float(val) for val in settings.split(';')]
+            dims = _to_str(get('Grid dim')).split(' x ')
+            record.update(
+                pixels=[int(dims[0]), int(dims[1])],
+                scan_range=settings[2:4] if len(settings) > 3 else None,
+                points=int(get('Points')))
+    record['header'] = header
+    return record
+
+def _to_str(value):
+    '''Strip whitespace and quotes from a header value.'''
+    if value is None:
+        return None
+    return str(value).strip().strip('"')
+
+def _to_float(value):
+    '''Convert a header value such as '1.0E-10 A' to a float, or None.'''
+    value = _to_str(value)
+    if not value:
+        return None
+    try:
+        return float(value.split()[0])
+    except ValueError:
+        return None
 
-####    ____LOAD FUNCTIONS____    ####
+def _iso_date(date, time=None):
+    '''Convert a Nanonis date ('dd.mm.yyyy', 'HH:MM:SS') to an ISO string.'''
+    try:
+        stamp = datetime.strptime(_to_str(date), '%d.%m.%Y')
+        if time:
+            clock = datetime.strptime(_to_str(time), '%H:%M:%S')
+            stamp = stamp.replace(hour=clock.hour, minute=clock.minute,
+                                  second=clock.second)
+        return stamp.isoformat()
+    except (TypeError, ValueError):
+        return None
+
+def _spy_toc(entries):
+    '''Pack the entries collected by save_spy() into the table of contents.'''
+    width = lambda strings: max([1] + [len(st) for st in strings])
+    maxDim = max([1] + [len(entry[4]) for entry in entries])
+    toc = np.zeros(len(entries), dtype=[
+            ('name', 'U{:}'.format(width([entry[0] for entry in entries]))),
+            ('type', 'U3'),
+            ('parent', '<i8'),
+            ('dtype', 'U{:}'.format(width([entry[3] for entry in entries]))),
+            ('ndim', '<i8'),
+            ('shape', '<i8', (maxDim,)),
+            ('offset', '<u8'),
+            ('nbytes', '<u8'),
+            ('codec', 'U4')])
+    for ix, (name, kind, parent, dtype, shape, offset, nbytes, codec) in \
+            enumerate(entries):
+        toc[ix] = (name, kind, parent, dtype, len(shape),
+                   tuple(shape) + (0,) * (maxDim - len(shape)), offset, nbytes,
+                   codec)
+    return toc
+
+def _load_spy_v2(fileObj, filePath, keys, mmap, layers, executor, workers):
+    '''Read items from a version 2 .spy file using its table of contents.'''
+    tocStart, tocSize = unpack('>QQ', fileObj.read(16))
+    fileObj.seek(tocStart)
+    toc = np.load(fileObj, allow_pickle=False)
+    if mmap is True:
+        mmap = 'r'
+    children = [[] for entry in toc]
+    paths = [''] * len(toc)
+    for ix, entry in enumerate(toc):
+        parent = int(entry['parent'])
+        if parent >= 0:
+            children[parent].append(ix)
+            paths[ix] = (paths[parent] + '/' if toc[parent]['parent'] >= 0
+                         else '') + str(entry['name'])
+    if keys is not None:
+        keys = [key.strip('/') for key in keys]
+        for key in keys:
+            if key not in paths:
+                print('WARNING: Key {:} not found.'.format(key))
+
+    def wanted(ix):
+        if keys is None or toc[ix]['parent'] < 0:
+            return True
+        path = paths[ix]
+        return any([path == key or path.startswith(key + '/') or
+                    key.startswith(path + '/') for key in keys])
+
+    def read_payload(entry):
+        fileObj.seek(int(entry['offset']))
+        return fileObj.read(int(entry['nbytes']))
+
+    def read_npy(ix):
+        entry = toc[ix]
+        dtype = _spy_dtype(entry['dtype'])
+        shape = tuple(int(n) for n in entry['shape'][:entry['ndim']])
+        rows = None
+        if layers is not None and len(shape) == 3:
+            rows = np.atleast_1d(np.arange(shape[0])[layers])
+        if 'codec' in toc.dtype.names and entry['codec']:
+            return read_chunks(ix, dtype, shape, rows)
+        if rows is not None or (mmap and len(shape) > 0 and entry['nbytes'] > 0):
+            npy = np.memmap(filePath, dtype=dtype, mode=mmap or 'r',
+                            shape=shape, offset=int(entry['offset']))
+            if rows is None:
+                return npy
+            npy = npy[layers] if isinstance(layers, slice) else npy[rows]
+            return npy if mmap else np.array(npy)
+        npy = np.frombuffer(bytearray(read_payload(entry)), dtype=dtype)
+        return npy.reshape(shape)[()]
+
+    def read_chunks(ix, dtype, shape, rows):
+        if rows is None:
+            rows = np.arange(shape[0])
+        npy = np.empty((len(rows),) + shape[1:], dtype=dtype)
+        decompress = _SPY_CODECS[str(toc[ix]['codec'])][1]
+        chunks = []
+        for jx in children[ix]:
+            start = int(toc[jx]['name'])
+            stop = start + int(toc[jx]['shape'][0])
+            select = np.nonzero((rows >= start) & (rows < stop))[0]
+            if len(select):
+                chunks.append((jx, start, select))
+        payloads = (read_payload(toc[jx]) for jx, __, __ in chunks)
+        for (jx, start, select), raw in zip(chunks, 
+                _imap(executor, decompress, payloads, 2 * workers)):
+            chunk = np.frombuffer(raw, dtype=dtype).reshape((-1,) + shape[1:])
+            npy[select] = chunk[rows[select] - start]
+        return npy
 
-def load_spy(filePath):
-    ''' Load .spy files into python''' 
+    def read_item(ix):
+        entry = toc[ix]
+        kind = entry['type']
+        if kind == 'NPY':
+            return read_npy(ix)
+        items = [(str(toc[jx]['name']), read_item(jx))
+                 for jx in children[ix] if wanted(jx)]
+        if kind == 'OAR':
+            shape = tuple(int(n) for n in entry['shape'][:entry['ndim']])
+            oar = np.empty(len(children[ix]), dtype=object)
+            for jx, (__, item) in enumerate(items):
+                oar[jx] = item
+            return oar.reshape(shape)
+        elif kind == 'OBJ':
+            obj = Spy()
+            for name, item in items:
+                setattr(obj, name, item)
+            return obj
+        elif kind == 'DIC':
+            return dict(items)
+        elif kind == 'LST':
+            return [item for __, item in items]
+        elif kind == 'TUP':
+            return tuple(item for __, item in items)
+        elif kind == 'STR':
+            return read_payload(entry).decode('utf-8')
+        elif kind == 'BYT':
+            return read_payload(entry)
+        elif kind == 'DTM':
+            return datetime.fromisoformat(read_payload(entry).decode('utf-8'))
+        elif kind == 'INT':
+            return int(read_payload(entry).decode('utf-8'))
+        elif kind in ['NUM', 'BOL']:
+            return read_npy(ix).item()
+        elif kind == 'NON':
+            return None
+        else:
+            raise(TypeError(
+                'File contains unsupported format: {:}'.format(kind)))
+
+    roots = [ix for ix, entry in enumerate(toc) if entry['parent'] < 0]
+    return read_item(roots[0])
+
+def _imap(executor, fn, items, window):
+    '''Like executor.map(fn, items), but with at most window tasks pending so
+    that items can be read from, or written to, a file as they are used.'''
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def _spy_dtype(descr):
+    '''Inverse of numpy.lib.format.dtype_to_descr for a stored descr.'''
+    descr = str(descr)
+    if descr.startswith('['):
+        descr = literal_eval(descr)
+    return np.lib.format.descr_to_dtype(descr)
+
+def _load_spy_v1(fileObj):
+    '''Read a version 1 .spy file, which is a sequential tagged stream.'''
     def read_npy(fileObj):
         npy = np.load(fileObj)
         if npy.shape == ():
@@ -377,11 +1272,11 @@ def load_spy(filePath):
     def read_str(fileObj):
         st = ''
         while True:
-            line = fileObj.readline()
-            if line.strip().decode('utf-8') == ':STR_END:':
+            line = fileObj.readline().decode('utf-8')
+            if line.strip() == ':STR_END:':
                 break
             st += line
-        return st
+        return st[:-1] if st.endswith('\n') else st
 
     #def read_str(fileObj):
     #    return fileObj.readline().strip().decode('utf-8')
@@ -418,257 +1313,709 @@ def load_spy(filePath):
                 'File contains unsupported format: {:}'.format(key)))
         return item
 
-    fileObj = open(filePath, 'rb')
+    start = fileObj.tell()
     fileObj.seek(0,2)
     fileSize = fileObj.tell()
-    fileObj.seek(0)
-    name, version = fileObj.readline().strip().decode('utf-8').split('=')
-    if float(version) < 1.0:
-        raise(TypeError('Version {:} files not supported'.format(version)))
+    fileObj.seek(start)
     while fileObj.tell() < fileSize:
         line = fileObj.readline().strip().decode('utf-8')
         key, val = line.split('=')
         item = read_item(fileObj, key)
-    fileObj.close()
     return item
 
+def _3ds_info(header):
+    '''Extract the layout of the data block from a .3ds header.'''
+    return {'params'    : int(header['# Parameters (4 byte)']),
+            'paramName' : header['Fixed parameters'][1:-1].split(';') +
+                          header['Experiment parameters'][1:-1].split(';'),
+            'channels'  : header['Channels'][1:-1].split(';'),
+            'points'    : int(header['Points']),
+            'sizex'     : int(header['Grid dim'][1:-1].split(' x ')[0]),
+            'sizey'     : int(header['Grid dim'][1:-1].split(' x ')[1]),
+            }
+
+def _3ds_roi(roi, shape):
+    '''Normalize a region of interest (y0, y1, x0, x1) to in-range indices.'''
+    if roi is None:
+        roi = (None, None, None, None)
+    y0, y1, __ = slice(roi[0], roi[1]).indices(shape[0])
+    x0, x1, __ = slice(roi[2], roi[3]).indices(shape[1])
+    return y0, max(y0, y1), x0, max(x0, x1)
+
+def _3ds_dtype(info):
+    '''
+    Structured dtype for a single pixel of a .3ds file: the parameters followed
+    by one sweep for each channel, all stored as big-endian float32.
+    '''
+    return np.dtype([('params', '>f4', (info['params'],)),
+                     ('data', '>f4', (len(info['channels']), info['points']))])
+
+
+_SPY_VERSION = 2.0
+_CACHE_VERSION = 1
+_SPY_ALIGN = 64
+_SPY_CHUNK = 2**20
+_SPY_CODECS = {'zlib' : (zlib.compress, zlib.decompress),
+               'lzma' : (lzma.compress, lzma.decompress),
+               'bz2'  : (bz2.compress, bz2.decompress),
+               }
+
+_TEXT_CHUNK = 2**16
+_DAT_SWEEP = re.compile(r'^LIY 1 omega \[(\d+)\] \(A\)$')
+
+_SNIFF_SIZE = 1024
+_FORMATS = OrderedDict()
+_PARTIAL_KEYWORDS = set()
+
+def _load_many(paths, Executor, workers, quiet, kwargs):
+    '''Generator behind load_many(). Keeps at most workers files in flight.'''
+    dtype = config.get_dtype()
+    threads = Executor is futures.ThreadPoolExecutor
+    with Executor(max_workers=workers) as executor:
+        pending = {}
+        queue = iter(paths)
+        while True:
+            for filePath in queue:
+                future = executor.submit(_load_one, filePath, quiet, kwargs,
+                                         dtype, threads)
+                pending[future] = filePath
+                if len(pending) >= workers:
+                    break
+            if not pending:
+                break
+            done, __ = futures.wait(pending,
+                                    return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                filePath = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as err:
+                    result = err
+                yield filePath, result
+
+def _load_one(filePath, quiet, kwargs, dtype, threads=False):
+    '''Load a single file for load_many(), optionally without printing.  The
+    working dtype of the calling thread is passed in, since precision()
+    contexts do not reach worker threads or processes.  Worker threads share
+    sys.stdout with the caller, so only their own writes are discarded.'''
+    with config.precision(dtype):
+        if not quiet:
+            return load(filePath, **kwargs)
+        if threads:
+            with _ThreadStdout.quiet():
+                return load(filePath, **kwargs)
+        with open(os.devnull, 'w') as devnull:
+            with contextlib.redirect_stdout(devnull):
+                return load(filePath, **kwargs)
 
-def load_3ds(filePath):
-    '''Load Nanonis 3ds into python.'''
-    try: 
-        fileObj = open(filePath, 'rb')
-    except:  
-        raise NameError('File not found.')
-    self = Spy()
-    self.header={}
-    while True:
-        line = fileObj.readline().strip().decode('utf-8')
-        if line == ':HEADER_END:': 
-            break
-        splitLine = line.split('=')
-        self.header[splitLine[0]] = splitLine[1]
-    self._info = {'params'	: int(self.header['# Parameters (4 byte)']),
-                'paramName'	: self.header['Fixed parameters'][1:-1].split(';') +
-                              self.header['Experiment parameters'][1:-1].split(';'),
-                'channels'	: self.header['Channels'][1:-1].split(';'),
-                'points'	: int(self.header['Points']),
-                'sizex' 	: int(self.header['Grid dim'][1:-1].split(' x ')[0]),
-                'sizey'	: int(self.header['Grid dim'][1:-1].split(' x ')[1]),
-                'dataStart'	: fileObj.tell()
-                 }
-    self.grid = {}; self.scan = {}
-    for channel in self._info['channels']:
-        self.grid[channel] = np.zeros(
-                [self._info['points'], self._info['sizey'], self._info['sizex']])
-    for channel in self._info['paramName']:
-        self.scan[channel] = np.zeros([self._info['sizey'], self._info['sizex']])
 
-    try:
-        for iy in range(self._info['sizey']):
-            for ix in range(self._info['sizex']):
-                for channel in self._info['paramName']:
-                    value = unpack('>f',fileObj.read(4))[0]
-                    self.scan[channel][iy,ix] = value
-
-                for channel in self._info['channels']:
-                    for ie in range(self._info['points']):
-                        value = unpack('>f',fileObj.read(4))[0]
-                        self.grid[channel][ie,iy,ix] = value
-    except:
-        print('WARNING: Data set is not complete.')
+####    ____SAVE FUNCTIONS____    ####
 
-    dataRead = fileObj.tell()
-    fileObj.read()
-    allData = fileObj.tell()
-    if dataRead == allData: 
-        print('File import successful.')
-    else: 
+def save_mat(data, filePath, objects=[], varname='mappy'):
+    '''
+    Save an STMView structure to a matlab (-v6) .mat file.  The map is
+    written one energy layer at a time, with energy as the last axis.
+
+    Inputs:
+        data        - Required : matio.Mappy object, or a dictionary of
+                                 fields with the map as [e,i,j] in 'map'.
+        filePath    - Required : str. Path where the file will be saved.
+        objects     - Optional : Not used, for compatibility with save().
+        varname     - Optional : Name of the matlab variable.
+
+    Returns:
+        None
+    '''
+    from stmpy import matio
+    if isinstance(data, matio.Mappy):
+        data.savemat(filePath, varname)
+    elif isinstance(data, dict):
+        mhh = {'e' if key == 'en' else key: value for key, value in data.items()}
+        with open(filePath, 'wb') as fileObj:
+            matio._MatWriter(fileObj).write(varname, mhh, energyLast=['map'])
+    else:
+        raise TypeError('Only matio.Mappy objects and dictionaries can be '
+                        'saved to .mat files.')
+
+
+def save_spy(data, filePath, objects=[], compression=None, chunks=None,
+             workers=None):
+    '''
+    Save python data to a .spy file (version 2). 
+
+    The file starts with a line identifying the format and version, followed
+    by the offset and length of the table of contents (two big-endian
+    uint64).  Then come the payloads of all arrays and strings, each aligned
+    to 64 bytes, and finally the table of contents: a numpy structured array
+    with one entry per item that records its name, type, parent entry,
+    dtype, shape and the offset and size of its payload.  Single items can
+    therefore be read, or memory mapped, without parsing the rest of the
+    file (see load_spy).
+
+    Arrays can optionally be compressed.  They are then split along their
+    first axis into chunks that are compressed independently, so that loading
+    a few layers of a map only decompresses the chunks holding them.
+
+    Inputs: 
+        data        - Required : Any python data/object/list/...
+        filePath    - Required : str. Path where the file will be saved.
+        objects     - Optional : lst. Only objects with a __class__ in this 
+                                 list (and Spy objects) can be saved.  
+        compression - Optional : None, 'zlib', 'lzma' or 'bz2'. Codec used
+                                 to compress arrays.
+        chunks      - Optional : int or tuple (layers, ...). Number of entries
+                                 along the first axis of an array in each
+                                 compressed chunk. Only the first axis is
+                                 chunked.  Defaults to chunks of about 1 MB.
+        workers     - Optional : Number of threads used for compression
+                                 (default: number of CPUs).
+
+    Returns: 
+        None
+
+    Usage:
+        save_spy(data, 'map.spy', compression='zlib', chunks=(1,))
+    '''
+    if compression is not None and compression not in _SPY_CODECS:
+        raise ValueError('compression must be one of {:}.'.format(
+                         sorted(_SPY_CODECS)))
+    if isinstance(chunks, (tuple, list)):
+        chunks = chunks[0]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    objects = list(objects) + [Spy]
+    entries = []
+    arrays = {}
+
+    def add_entry(name, kind, parent, payload=None, dtype='', shape=(),
+                  codec=''):
+        offset = 0
+        nbytes = 0
+        if payload is not None:
+            fileObj.write(bytes(-fileObj.tell() % _SPY_ALIGN))
+            offset = fileObj.tell()
+            fileObj.write(payload)
+            nbytes = fileObj.tell() - offset
+        entries.append((name, kind, parent, dtype, shape, offset, nbytes,
+                        codec))
+        return len(entries) - 1
+
+    def link_npy(name, ix, parent):
+        # The same array appears more than once, e.g. data.LIY and a channel
+        # in data.grid: point the new entries at the payload already written.
+        entries.append((name,) + entries[ix][1:2] + (parent,) + entries[ix][3:])
+        jx = len(entries) - 1
+        for chunk in [entry for entry in entries[ix+1:] if entry[2] == ix]:
+            entries.append(chunk[:2] + (jx,) + chunk[3:])
+
+    def write_npy(name, npy, parent):
+        if id(npy) in arrays:
+            return link_npy(name, arrays[id(npy)][1], parent)
+        if isinstance(npy, np.ndarray) and not npy.dtype.hasobject:
+            arrays[id(npy)] = (npy, len(entries))
+        npy = np.asarray(npy)
+        if npy.dtype.hasobject:
+            ix = add_entry(name, 'OAR', parent, shape=npy.shape)
+            for obj in npy.flat:
+                write_item('', obj, ix)
+        else:
+            npy = np.require(npy, requirements='C')
+            descr = np.lib.format.dtype_to_descr(npy.dtype)
+            descr = descr if isinstance(descr, str) else repr(descr)
+            if compression is None or npy.size == 0 or npy.ndim == 0:
+                add_entry(name, 'NPY', parent,
+                          memoryview(npy.reshape(-1)).cast('B'),
+                          descr, npy.shape)
+                return
+            ix = add_entry(name, 'NPY', parent, dtype=descr, shape=npy.shape,
+                           codec=compression)
+            rows = chunks or max(1, _SPY_CHUNK // max(1, npy[0].nbytes))
+            starts = range(0, npy.shape[0], rows)
+            blocks = (memoryview(npy[start:start+rows].reshape(-1)).cast('B')
+                      for start in starts)
+            compress = _SPY_CODECS[compression][0]
+            payloads = _imap(executor, compress, blocks, 2 * workers)
+            for start, payload in zip(starts, payloads):
+                add_entry(str(start), 'CHK', ix, payload,
+                          shape=(min(rows, npy.shape[0] - start),))
+
+    def write_obj(name, obj, parent):
+        ix = add_entry(name, 'OBJ', parent)
+        for name, item in obj.__dict__.items():
+            write_item(name, item, ix)
+
+    def write_dic(name, dic, parent):
+        ix = add_entry(name, 'DIC', parent)
+        for name, item in dic.items():        
+            write_item(str(name), item, ix)
+
+    def write_lst(name, lst, parent, kind='LST'):
+        ix = add_entry(name, kind, parent)
+        for jx, item in enumerate(lst):
+            write_item(str(jx), item, ix)
+
+    def write_num(name, val, parent):
+        if isinstance(val, bool):
+            add_entry(name, 'BOL', parent, pack('?', val), '|b1')
+        elif isinstance(val, int) and not -2**63 <= val < 2**63:
+            add_entry(name, 'INT', parent, str(val).encode('utf-8'))
+        else:
+            npy = np.array(val)
+            add_entry(name, 'NUM', parent, npy.tobytes(), npy.dtype.str)
+
+    def write_item(name, item, parent):        
+        if isinstance(item, (np.ndarray, np.generic)):
+            write_npy(name, item, parent)
+        elif isinstance(item, dict):
+            write_dic(name, item, parent)
+        elif isinstance(item, list):
+            write_lst(name, item, parent)
+        elif isinstance(item, tuple):
+            write_lst(name, item, parent, kind='TUP')
+        elif isinstance(item, IOBase): 
+            pass
+        elif isinstance(item, str):
+            add_entry(name, 'STR', parent, item.encode('utf-8'))
+        elif isinstance(item, bytes):
+            add_entry(name, 'BYT', parent, item)
+        elif isinstance(item, datetime):
+            add_entry(name, 'DTM', parent, item.isoformat().encode('utf-8'))
+        elif item is None:
+            add_entry(name, 'NON', parent)
+        elif isinstance(item, (bool, int, float, complex)):
+            write_num(name, item, parent)
+        elif callable(item):
+            print('WARNING: Callable item not saved: {:}.'.format(name))
+        elif any([isinstance(item, obj) for obj in objects]):
+            write_obj(name, item, parent)
+        else:
+            raise(TypeError('Item {:} {:} not supported.'.format(name, type(item))))
+    
+    with open(filePath, 'wb') as fileObj, \
+            futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        fileObj.write('SPY: Stmpy I/O, Version={:}\n'.format(
+                      _SPY_VERSION).encode('utf-8'))
+        tocPointer = fileObj.tell()
+        fileObj.write(bytes(16))
+        write_item('MAIN', data, -1)
+        fileObj.write(bytes(-fileObj.tell() % _SPY_ALIGN))
+        tocStart = fileObj.tell()
+        np.save(fileObj, _spy_toc(entries), allow_pickle=False)
+        tocSize = fileObj.tell() - tocStart
+        fileObj.seek(tocPointer)
+        fileObj.write(pack('>QQ', tocStart, tocSize))
+
+
+
+####    ____LOAD FUNCTIONS____    ####
+
+def load_spy(filePath, keys=None, mmap=False, layers=None, workers=None):
+    '''
+    Load .spy files into python.
+
+    Inputs:
+        filePath    - Required : Path to .spy file.
+        keys        - Optional : List of items to load, e.g. ['Z', 'en'] to
+                                 only read those attributes of a saved Spy
+                                 object.  Nested items are selected with '/',
+                                 e.g. 'grid/LIY 1 omega (A)'.  Loads
+                                 everything by default.
+        mmap        - Optional : If True, arrays are memory mapped read-only
+                                 from the file instead of being read into
+                                 memory.  Can also be a numpy.memmap mode,
+                                 e.g. 'c' for copy-on-write arrays.
+                                 Compressed arrays are always decompressed
+                                 into memory.
+        layers      - Optional : Slice or list of indices along the first
+                                 axis to load from 3D arrays, e.g. a few
+                                 energy layers of a DOS map.  For compressed
+                                 arrays only the chunks holding these layers
+                                 are decompressed.
+        workers     - Optional : Number of threads used for decompression
+                                 (default: number of CPUs).
+
+    Only version 2 files support keys, mmap and layers; version 1 files are
+    always read completely.
+
+    Returns:
+        item    - The saved python data.
+
+    Usage:
+        data = load_spy('map.spy', keys=['Z', 'en'])
+        data = load_spy('map.spy', mmap=True)
+        data = load_spy('map.spy', keys=['LIY'], layers=slice(90, 110))
+    '''
+    with open(filePath, 'rb') as fileObj:
+        name, version = fileObj.readline().strip().decode('utf-8').split('=')
+        if float(version) < 1.0:
+            raise(TypeError('Version {:} files not supported'.format(version)))
+        elif float(version) < 2.0:
+            if keys is not None or mmap or layers is not None:
+                print('WARNING: keys, mmap and layers need a version 2 ' +
+                      'file, loading everything.')
+            return _load_spy_v1(fileObj)
+        else:
+            if workers is None:
+                workers = os.cpu_count() or 1
+            with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                return _load_spy_v2(fileObj, filePath, keys, mmap, layers,
+                                    executor, workers)
+
+
+def load_3ds(filePath, lazy=False, dtype=None, channels=None,
+              energies=None, roi=None):
+    '''Load Nanonis 3ds into python.
+
+    The payload is a sequence of fixed size big-endian float32 records, one per
+    pixel, containing the parameters followed by each channel sweep.  It is
+    decoded in one pass using a structured dtype built from the header.
+
+    Inputs:
+        filePath    - Required : Path to .3ds file, or an open binary
+                                 file.
+        lazy        - Optional : Boolean. If True the grid channels are memory
+                                 mapped and each one is only copied into
+                                 memory the first time it is looked up in
+                                 self.grid.  The LIY and I attributes remain
+                                 read-only views of the file until
+                                 self.materialize() is called, and
+                                 self.release() frees the loaded copies.
+        dtype       - Optional : Data type of the grid channels once loaded
+                                 into memory, e.g. np.float32 to halve memory.
+                                 Defaults to the working dtype (see
+                                 stmpy.set_dtype).
+        channels    - Optional : List of channel names to load into self.grid.
+                                 Loads all channels by default.
+        energies    - Optional : Slice or list of indices of the energy
+                                 layers to load, e.g. slice(90, 110).
+        roi         - Optional : Tuple (y0, y1, x0, x1) of the spatial region
+                                 to load, using slice conventions.
+
+    Partial loads (channels, energies or roi) memory map the payload and use
+    the fixed record size to only touch the bytes of the selected pixels and
+    layers, so their cost scales with the selection and not the file.
+
+    Usage:
+        data = load_3ds(filePath, channels=['LIY 1 omega (A)'],
+                        energies=slice(90, 110), roi=(0, 64, 0, 64))
+    '''
+    fileObj = _open_file(filePath)
+    if dtype is None:
+        dtype = config.get_dtype()
+    self = Spy()
+    self.header = _read_3ds_header(fileObj)
+    self._info = _3ds_info(self.header)
+    self._info['dataStart'] = fileObj.tell()
+    recordType = _3ds_dtype(self._info)
+    shape = (self._info['sizey'], self._info['sizex'])
+    expected = shape[0] * shape[1] * recordType.itemsize
+    partial = channels is not None or energies is not None or roi is not None
+    fileObj.seek(0, 2)
+    available = fileObj.tell() - self._info['dataStart']
+    if available < expected:
+        print('WARNING: Data set is not complete.')
+        if lazy:
+            print('WARNING: Incomplete data sets can not be memory mapped.')
+            lazy = False
+    canMap = not hasattr(filePath, 'read')
+    if lazy and not canMap:
+        print('WARNING: Open files can not be memory mapped.')
+        lazy = False
+
+    if lazy or (partial and available >= expected and canMap):
+        fileObj.close()
+        records = np.memmap(filePath, dtype=recordType, mode='r',
+                            offset=self._info['dataStart'], shape=shape)
+    else:
+        fileObj.seek(self._info['dataStart'])
+        raw = fileObj.read(expected)
+        fileObj.close()
+        raw = raw[:len(raw) - len(raw) % 4]
+        raw += bytes(expected - len(raw))
+        records = np.frombuffer(raw, dtype=recordType).reshape(shape)
+    if available > expected:
         print('ERR: Did not reach end of file.')
-    fileObj.close()
+    else:
+        print('File import successful.')
+    if partial:
+        y0, y1, x0, x1 = _3ds_roi(roi, shape)
+        records = records[y0:y1, x0:x1]
+        layers = np.arange(self._info['points'])[
+                slice(None) if energies is None else energies]
+        layers = np.atleast_1d(layers)
+        self._info['roi'] = [y0, y1, x0, x1]
+        self._info['energyIndex'] = layers
+        if not isinstance(energies, slice):
+            energies = layers
+    else:
+        energies = slice(None)
+    if channels is None:
+        channels = self._info['channels']
+    views = {}
+    for channel in channels:
+        if channel not in self._info['channels']:
+            raise ValueError('Channel {:} not found. Available channels:\n {:}'
+                             .format(channel, self._info['channels']))
+        ix = self._info['channels'].index(channel)
+        views[channel] = np.moveaxis(records['data'][:, :, ix][..., energies],
+                                     -1, 0)
+    if lazy:
+        self.grid = _LazyChannels(views, dtype=dtype)
+    else:
+        self.grid = {}
+        for channel, view in views.items():
+            self.grid[channel] = np.array(view, dtype=dtype, order='C')
+    self.scan = {}
+    for ix, channel in enumerate(self._info['paramName']):
+        self.scan[channel] = np.array(records['params'][:, :, ix],
+                                      dtype=np.float64, order='C')
+    del records, views
     
     LIYNames =  ['LIY 1 omega (A)', 'LIY 1 omega [AVG] (A)']
     if _make_attr(self, 'LIY', LIYNames, 'grid'):
-        self.didv = np.mean(self.LIY, axis=(1,2))
-        self.didvStd = np.std(self.LIY, axis=(1,2))
+        self.didv = np.mean(self.LIY, axis=(1,2), dtype=np.float64)
+        self.didvStd = np.std(self.LIY, axis=(1,2), dtype=np.float64)
     else:
         print('ERR: LIY AVG channel not found, resort to manual ' + 
-              'definitions.  Found channels:\n {:}'.format(self.data.keys()))
+              'definitions.  Found channels:\n {:}'.format(self.grid.keys()))
     
     _make_attr(self, 'I',  ['Current (A)', 'Current [AVG] (A)'], 'grid')
     if _make_attr(self, 'Z',  ['Z (m)', 'Z [AVG] (m)'], 'grid'):
-        self.Z = self.Z[0]
+        self.Z = np.asarray(self.Z[0], dtype=dtype)
     else:
         _make_attr(self, 'Z', ['Scan:Z (m)'], 'scan')
         print('WARNING: Using scan channel for Z attribute.')
     try:     
-        self.en = np.mean(self.grid['Bias [AVG] (V)'], axis=(1,2))
+        self.en = np.mean(_peek(self.grid, 'Bias [AVG] (V)'), axis=(1,2),
+                          dtype=np.float64)
     except KeyError:
         print('WARNING: Assuming energy layers are evenly spaced.')
         self.en = np.linspace(self.scan['Sweep Start'].flatten()[0],
                               self.scan['Sweep End'].flatten()[0],
                               self._info['points'])
+        if partial:
+            self.en = self.en[self._info['energyIndex']]
 
     return self
 
 
-def load_sxm(filePath):
-    ''' Load Nanonis SXM files into python. '''
-    try: 
-        fileObj = open(filePath, 'rb')
-    except:  
-        raise NameError('File not found.')
+def load_sxm(filePath, lazy=False, dtype=None):
+    '''
+    Load Nanonis SXM files into python. 
+
+    Inputs:
+        filePath    - Required : Path to .sxm file, or an open binary
+                                 file.
+        lazy        - Optional : Boolean. If True the channels are memory
+                                 mapped and each one is only copied into
+                                 memory the first time it is looked up in
+                                 self.channels.  The Z, I and LIY attributes
+                                 remain read-only views of the file until
+                                 self.materialize() is called.
+        dtype       - Optional : Data type of the channels once loaded into
+                                 memory.  The file stores big-endian float32,
+                                 which is converted once to this native type.
+                                 Defaults to the working dtype (see
+                                 stmpy.set_dtype).
+
+    Usage:
+        data = load_sxm(filePath, lazy=True)
+        topo = data.channels['Z_Fwd']
+    '''
+    fileObj = _open_file(filePath)
+    if dtype is None:
+        dtype = config.get_dtype()
     self = Spy()
-    self.header={}
-    s1 = fileObj.readline().decode('utf-8')
-    if not re.match(':NANONIS_VERSION:', s1):
-        raise NameError('The file %s does not have the Nanonis SXM'.format(filePath))
-    self.header['version'] = int(fileObj.readline())
-    while True:
-        line = fileObj.readline().strip().decode('utf-8')
-        if re.match('^:.*:$', line):
-            tagname = line[1:-1]
-        else:
-            if 'Z-CONTROLLER' == tagname:
-                keys = line.split('\t')
-                values = fileObj.readline().strip().decode('utf-8').split('\t')
-                self.header['z-controller'] = dict(zip(keys, values))
-            elif tagname in ('BIAS', 'REC_TEMP', 'ACQ_TIME', 'SCAN_ANGLE'):
-                self.header[tagname.lower()] = float(line)
-            elif tagname in ('SCAN_PIXELS', 'SCAN_TIME', 'SCAN_RANGE', 'SCAN_OFFSET'):
-                self.header[tagname.lower()] = [ float(i) for i in re.split('\s+', line) ]
-            elif 'DATA_INFO' == tagname:
-                if 1 == self.header['version']:
-                    keys = re.split('\s\s+',line)
-                else:
-                    keys = line.split('\t')
-                self.header['data_info'] = []
-                while True:
-                    line = fileObj.readline().strip().decode('utf-8')
-                    if not line:
-                        break
-                    values = line.strip().split('\t')
-                    self.header['data_info'].append(dict(zip(keys, values)))
-            elif tagname in ('SCANIT_TYPE','REC_DATE', 'REC_TIME', 'SCAN_FILE', 'SCAN_DIR'):
-                self.header[tagname.lower()] = line
-            elif 'SCANIT_END' == tagname:
-                break
-            else:
-                if tagname.lower() not in self.header:
-                    self.header[tagname.lower()] = line
-                else:
-                    self.header[tagname.lower()] += '\n' + line
-    if 1 == self.header['version']:
-        self.header['scan_pixels'].reverse()
+    self.header = _read_sxm_header(fileObj, _file_name(filePath))
     fileObj.readline()
     fileObj.read(2) # Need to read the byte \x1A\x04, before reading data
-    size = int(self.header['scan_pixels'][0] * self.header['scan_pixels'][1] * 4)
-    shape = [int(val) for val in self.header['scan_pixels']]
-    self.channels = {}
+    dataStart = fileObj.tell()
+    shape = [int(val) for val in self.header['scan_pixels']][::-1]
+    names = []
     for channel in self.header['data_info']:
         if channel['Direction'] == 'both':
-            self.channels[channel['Name'] + '_Fwd'] = np.ndarray(
-                    shape=shape[::-1], dtype='>f', buffer=fileObj.read(size))
-            self.channels[channel['Name'] + '_Bkd'] = np.ndarray(
-                    shape=shape[::-1], dtype='>f', buffer=fileObj.read(size))
+            names += [channel['Name'] + '_Fwd', channel['Name'] + '_Bkd']
         else:
-            self.channels[channel['Name'] + channel['Direction']] = np.ndarray(
-                    shape=shape, dtype='>f', buffer=fileObj.read(size))
-    try:
-        self.Z = self.channels['Z_Fwd']
-        self.I = self.channels['Current_Fwd']
-        self.LIY = self.channels['LIY_1_omega_Fwd']
-    except KeyError: print('WARNING:  Could not create standard attributes, look in channels instead.')
-    fileObj.close()
+            names += [channel['Name'] + channel['Direction']]
+    expected = len(names) * shape[0] * shape[1] * 4
+    fileObj.seek(0, 2)
+    if fileObj.tell() - dataStart < expected:
+        print('WARNING: Data set is not complete.')
+        if lazy:
+            print('WARNING: Incomplete data sets can not be memory mapped.')
+            lazy = False
+    if lazy and hasattr(filePath, 'read'):
+        print('WARNING: Open files can not be memory mapped.')
+        lazy = False
+    if lazy:
+        fileObj.close()
+        data = np.memmap(filePath, dtype='>f4', mode='r', offset=dataStart,
+                         shape=(len(names),) + tuple(shape))
+        self.channels = _LazyChannels(dict(zip(names, data)), dtype=dtype)
+    else:
+        # Read straight into the array and swap the bytes in place, so
+        # float32 channels need no memory beyond the array itself.
+        data = np.zeros((len(names),) + tuple(shape), dtype='>f4')
+        fileObj.seek(dataStart)
+        fileObj.readinto(memoryview(data).cast('B'))
+        fileObj.close()
+        data = data.byteswap(inplace=True).view(data.dtype.newbyteorder())
+        data = data.astype(dtype, copy=False)
+        self.channels = dict(zip(names, data))
+    if not all([_make_attr(self, 'Z', ['Z_Fwd'], 'channels'),
+                _make_attr(self, 'I', ['Current_Fwd'], 'channels'),
+                _make_attr(self, 'LIY', ['LIY_1_omega_Fwd'], 'channels')]):
+        print('WARNING:  Could not create standard attributes, look in channels instead.')
     return self
 
 
 def load_dat(filePath):
-    ''' Load Nanonis SXM files into python. '''
-    try: 
-        fileObj = open(filePath, 'rb')
-    except:  
-        raise NameError('File not found.')
+    '''
+    Load Nanonis DAT files into python. 
+
+    The tab separated [DATA] block is parsed in a single pass. For
+    multi-sweep spectra the LIY 1 omega [0000n] columns are stacked into
+    self.LIY (energies x sweeps) and didvStd is their standard deviation.
+    '''
+    fileObj = _open_file(filePath)
     self = Spy()
-    self.header={}
+    self.header, channels, allData = _read_dat(fileObj)
+    fileObj.close()
+    print('File import successful.')
     self.channels = {}
-    while True:
-        line = fileObj.readline().decode('utf-8')
-        splitLine = line.split('\t')
-        if line[0:6] == '[DATA]': 
-            break
-        elif line.rstrip() != '': 
-            self.header[splitLine[0]] = splitLine[1]
-    channels = fileObj.readline().decode('utf-8').rstrip().split('\t')
-    allData = []
-    for line in fileObj:
-        line = line.decode('utf-8').rstrip().split('\t')
-        allData.append(np.array(line, dtype=float))
-    allData = np.array(allData)
     for ix, channel in enumerate(channels):
         self.channels[channel] = allData[:,ix]
-    dataRead = fileObj.tell()
-    fileObj.read()
-    finalRead = fileObj.tell()
-    if dataRead == finalRead: 
-        print('File import successful.')
-    else: 
-        print('ERR: Did not reach end of file.')
-    fileObj.close()
     _make_attr(self, 'didv', 
             ['LIY 1 omega (A)', 'LIY 1 omega [AVG] (A)'], 'channels')
     _make_attr(self, 'I', ['Current (A)', 'Current [AVG] (A)'],
     'channels')
     _make_attr(self, 'en', ['Bias (V)', 'Bias calc (V)'], 'channels')
-    if 'LIY 1 omega [00001] (A)' in self.channels.keys():
-        sweeps = int(self.header['Bias Spectroscopy>Number of sweeps'])
-        self.LIY = np.zeros([len(self.en), sweeps])
-        for ix in range(1, sweeps+1):
-            s = str(ix).zfill(5)
-            self.LIY[:,ix-1] = self.channels['LIY 1 omega [' + s + '] (A)']
+    sweeps = sorted([(int(match.group(1)), ix) for ix, match in 
+                     enumerate([_DAT_SWEEP.match(ch) for ch in channels]) if match])
+    if sweeps:
+        self.LIY = allData[:, [ix for __, ix in sweeps]]
         self.didvStd = np.std(self.LIY, axis=1)
     return self
 
 
-def load_nsp(filePath):
-    '''UNTESTED - Load Nanonis Long Term Specturm into python.'''
-    try: 
-        fileObj = open(filePath, 'rb')
-    except:  
-        raise NameError('File not found.')
+def load_dat_stack(paths, biasOffset=True):
+    '''
+    Load many DAT files taken with the same sweep settings into one array.
+
+    Inputs:
+        paths   - Required : List of .dat file paths or a glob pattern.  All
+                             files must have the same channels and number
+                             of points.
+        biasOffset - Optional : Boolean. If True find the bias offset of
+                                each spectrum (see bias_offset) and store
+                                it in self.biasOffset.  The en attribute is
+                                shared by all spectra and is not changed.
+
+    Returns:
+        self    - Spy object with attributes:
+                    data     - Array (files x energies x channels).
+                    channels - List of channel names, in the order of the
+                               last axis of data.
+                    en       - Bias of the first file.
+                    headers  - List of the header of each file.
+                    paths    - List of the files in the order of data.
+                  As well as didv and I (files x energies) when those
+                  channels are present.
+
+    Usage:
+        stack = load_dat_stack('session/*.dat')
+        pcolormesh(stack.en, range(len(stack.paths)), stack.didv)
+    '''
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(paths))
     self = Spy()
-    self.header={}
-    while True:
-        line = fileObj.readline().strip().decode('utf-8')
-        if line == ':HEADER_END:': 
-            break
-        elif re.match('^:.*:$', line):
-            tagname = line[1:-1]
-        else:
-            try:
-                self.header[tagname] = int(line.split('\t')[0])
-            except:
-                self.header[tagname] = line.split('\t')[0]
+    self.paths = list(paths)
+    self.headers = []
+    self.data = None
+    for ix, filePath in enumerate(self.paths):
+        with open(filePath, 'rb') as fileObj:
+            header, channels, allData = _read_dat(fileObj)
+        if self.data is None:
+            self.channels = channels
+            self.data = np.empty((len(self.paths),) + allData.shape,
+                                 dtype=allData.dtype)
+        elif channels != self.channels or allData.shape != self.data.shape[1:]:
+            raise ValueError('{:} does not have the same channels and number '
+                             'of points as {:}.'.format(filePath, self.paths[0]))
+        self.headers.append(header)
+        self.data[ix] = allData
+    if self.data is None:
+        raise IOError('No files to load.')
+    names = {'didv' : ['LIY 1 omega (A)', 'LIY 1 omega [AVG] (A)'],
+             'I'    : ['Current (A)', 'Current [AVG] (A)'],
+             'en'   : ['Bias (V)', 'Bias calc (V)']}
+    for attr, options in names.items():
+        for name in options:
+            if name in self.channels:
+                setattr(self, attr, self.data[..., self.channels.index(name)])
+                break
+    if hasattr(self, 'en'):
+        self.en = self.en[0]
+        if biasOffset and hasattr(self, 'I'):
+            self.biasOffset = bias_offset(self.en, self.I, axis=1)
+    return self
 
+
+def load_nsp(filePath, mmap=False, dtype=None):
+    '''
+    Load Nanonis Long Term Specturm into python.
+
+    Inputs:
+        filePath    - Required : Path to .nsp file, or an open binary
+                                 file.
+        mmap        - Optional : Boolean. If True the spectra are memory
+                                 mapped read-only (big-endian float32)
+                                 instead of being read into memory.  Use
+                                 self.waterfall() to look at a decimated
+                                 copy of a long measurement.
+        dtype       - Optional : Data type of the spectra if not memory
+                                 mapped.  Defaults to the working dtype (see
+                                 stmpy.set_dtype).
+
+    Returns:
+        self    - Spy object with data (time x frequency), time, freq, start
+                  and end, and fftI, fftV or fftSignal (frequency x time).
+    '''
+    fileObj = _open_file(filePath)
+    self = Spy()
+    self.header = _read_nsp_header(fileObj)
+    rows = int(self.header['DATASIZEROWS'])
+    cols = int(self.header['DATASIZECOLS'])
     self.freq = np.linspace(0, 
-            np.round(float(self.header['DATASIZECOLS'])*float(self.header['DELTA_f'])),
-            float(self.header['DATASIZECOLS']))
+            np.round(cols * float(self.header['DELTA_f'])), cols)
     
     self.start = datetime.strptime(self.header['START_DATE'] + 
             self.header['START_TIME'],'%d.%m.%Y%H:%M:%S')
     self.end = datetime.strptime(self.header['END_DATE'] + 
             self.header['END_TIME'],'%d.%m.%Y%H:%M:%S')
-    self.time = np.linspace(0, (self.end - self.start).total_seconds(), 
-            int(self.header['DATASIZEROWS']))
-    self.data = np.zeros([int(self.header['DATASIZEROWS']), int(self.header['DATASIZECOLS'])])
+    self.time = np.linspace(0, (self.end - self.start).total_seconds(), rows)
     fileObj.read(2) #first two bytes are not data
-    try:
-        for ix in range(int(self.header['DATASIZEROWS'])):
-            for iy in range(int(self.header['DATASIZECOLS'])):
-                value = unpack('>f',fileObj.read(4))[0]
-                self.data[ix,iy] = value
-    except:
+    dataStart = fileObj.tell()
+    expected = rows * cols * 4
+    fileObj.seek(0, 2)
+    if fileObj.tell() - dataStart < expected:
         print('ERR: Data set is not complete')
-    fileObj.close()
+        mmap = False
+    if mmap and hasattr(filePath, 'read'):
+        print('WARNING: Open files can not be memory mapped.')
+        mmap = False
+    if mmap:
+        fileObj.close()
+        self.data = np.memmap(filePath, dtype='>f4', mode='r',
+                              offset=dataStart, shape=(rows, cols))
+    else:
+        fileObj.seek(dataStart)
+        raw = fileObj.read(expected)
+        fileObj.close()
+        raw = raw[:len(raw) - len(raw) % 4]
+        self.data = np.zeros(rows * cols, dtype=dtype or config.get_dtype())
+        self.data[:len(raw) // 4] = np.frombuffer(raw, dtype='>f4')
+        self.data = self.data.reshape(rows, cols)
     if self.header['SIGNAL'] == 'Current (A)':
         self.fftI = self.data.T
     elif self.header['SIGNAL'] == 'InternalGeophone (V)':
@@ -680,70 +2027,70 @@ def load_nsp(filePath):
 
 def load_nvi(filePath):
     '''UNTESTED - Load NISTview image data into python. '''
-    nviData = sio.readsav(filePath)
-    self = Spy()
-    self._raw = nviData['imagetosave']
-    self.map = self._raw.currentdata[0]
-    self.header = {name:self._raw.header[0][name][0] for name in self._raw.header[0].dtype.names}
-    self.info = {'FILENAME'    : self._raw.filename[0],
-                 'FILSIZE'     : int(self._raw.header[0].filesize[0]),
-                 'CHANNELS'    : self._raw.header[0].scan_channels[0],
-                 'XSIZE'       : self._raw.xsize[0],
-                 'YSIZE'       : self._raw.ysize[0],
-                 'TEMPERATURE' : self._raw.header[0].temperature[0],
-                 'LOCKIN_AMPLITUDE' : self._raw.header[0].lockin_amplitude[0],
-                 'LOCKIN_FREQUENCY' : self._raw.header[0].lockin_frequency[0],
-                 'DATE'        : self._raw.header[0].date[0],
-                 'TIME'        : self._raw.header[0].time[0],
-                 'BIAS_SETPOINT'    : self._raw.header[0].bias_setpoint[0],
-                 'BIAS_OFFSET' : self._raw.header[0].bias_offset[0],
-                 'BFIELD'      : self._raw.header[0].bfield[0],
-                 'ZUNITS'      : self._raw.zunits[0],
-					}
-    return self
+    import scipy.io as sio
+    return _nvi_from_sav(sio.readsav(filePath))
+
+
+def load_mat(filePath, fields=None):
+    '''
+    Load STMView structures from a .mat file (matlab -v6 or -v7).
+
+    The file is read by a streaming reader (see stmpy.matio.load_stmview):
+    the map is copied one energy layer at a time into a C contiguous
+    [e,i,j] array and fields that are not requested are skipped.
+
+    Inputs:
+        filePath    - Required : Path to .mat file.
+        fields      - Optional : List of structure fields to load, e.g.
+                                 ['info'] to read only the header of a large
+                                 map.  Default is all fields.
+
+    Returns:
+        mappy       - matio.Mappy object with the structure fields as
+                      attributes (en for the energies), or a dictionary of
+                      them if the file holds several structures.
+    '''
+    from stmpy import matio
+    return matio.load_stmview(filePath, fields=fields)
 
 
 def load_nvl(filePath):
     '''UNTESTED - Load NISTview layer data into python. '''
-    nvlData = sio.readsav(filePath)
-    self = Spy()
-    self._raw = nvlData['savestructure']
-    self.en = self._raw.energies[0]
-    self.map = self._raw.fwddata[0]
-    self.ave = [np.mean(layer) for layer in self.map]
-    self.header = {name:self._raw.header[0][name][0] for name in self._raw.header[0].dtype.names}
-    for name in self._raw.dtype.names:
-        if name not in self.header.keys():
-            self.header[name] = self._raw[name][0]
-    return self
+    import scipy.io as sio
+    return _nvl_from_sav(sio.readsav(filePath))
 
 
 def load_asc(filePath):
-    '''UNTESTED - Load ASCII files into python.'''
+    '''
+    Load ASCII files into python. 
+
+    The file has 'key:value' header lines ending with an empty line, a line
+    of channel names and columns of numbers.  The numbers are parsed in
+    chunks of lines, so memory use while reading is set by the chunk size.
+    '''
     try: 
-        fileObj = open(filePath, 'rb')
+        fileObj = open(filePath, 'r')
     except:  
         raise NameError('File not found.')
     self = Spy()
     header= {}
     channels = {}
+    headerLines = 0
     while True:
         line = fileObj.readline().rstrip()
-        if line is '':
+        headerLines += 1
+        if line == '':
             break
-        splitLine = line.split(':')
+        splitLine = line.split(':', 1)
         header[splitLine[0]] = splitLine[1]
     channelNames = fileObj.readline().rstrip().split('      ')
-    for chn in channelNames:
-        channels[chn] = []
-    for data in fileObj.readlines():
-        dsplit = data.rstrip().split('   ')
-        dfloat = [float(val) for val in dsplit]
-        for chn, val in zip(channelNames, dfloat):
-            channels[chn] += [val]
-    for chn in channelNames:
-        channels[chn] = np.array(channels[chn])
-    if len(channelNames) is 2:
+    data, __ = _read_numeric_lines(fileObj, fileObj.readline(),
+                                   isData=lambda line: line.strip() != '',
+                                   lineNumber=headerLines + 2)
+    data = config.as_working(data)
+    for ix, chn in enumerate(channelNames):
+        channels[chn] = data[:, ix]
+    if len(channelNames) == 2:
         self.x = channels[channelNames[0]]
         self.y = channels[channelNames[1]]
     self.header = header
@@ -757,3 +2104,332 @@ def load_asc(filePath):
 class Spy(object):
     def __init__(self):
         pass
+
+    def materialize(self, dtype=None):
+        '''
+        Load all memory-mapped channels (see load(..., lazy=True)) into memory.
+        Attributes that refer to a mapped view, such as LIY, are replaced by
+        the loaded copy.
+
+        Inputs:
+            dtype   - Optional : Data type to convert the channels to.  Uses
+                                 the dtype given when loading by default.
+
+        Returns:
+            self
+        '''
+        for channels in self._lazy_channels():
+            channels.materialize(dtype=dtype)
+            for attr, value in list(self.__dict__.items()):
+                for key in channels:
+                    if value is channels.view(key):
+                        setattr(self, attr, channels[key])
+        return self
+
+    def release(self):
+        '''
+        Free the in-memory copies of memory-mapped channels.  Attributes that
+        refer to a released copy fall back to the read-only mapped view.
+
+        Returns:
+            self
+        '''
+        for channels in self._lazy_channels():
+            for attr, value in list(self.__dict__.items()):
+                for key in channels:
+                    if channels.is_loaded(key) and value is channels[key]:
+                        setattr(self, attr, channels.view(key))
+            channels.release()
+        return self
+
+    def waterfall(self, max_rows=2000, dtype=None):
+        '''
+        Decimated view of a long term spectrum (see load_nsp) for browsing
+        measurements that are too long to plot at full resolution.  The
+        spectra are averaged in blocks of 2, 4, 8, ... consecutive rows,
+        using the smallest block size that gives at most max_rows rows.  
+        Works on memory-mapped data in a single pass.
+
+        Inputs:
+            max_rows    - Optional : Maximum number of rows in the output.
+            dtype       - Optional : Data type of the averaged spectra. 
+                                     Defaults to the working dtype (see
+                                     stmpy.set_dtype); the sums are always
+                                     accumulated in float64.
+
+        Returns:
+            time    - Average time of each block (s).
+            data    - Array (blocks x freq) of block averaged spectra.
+
+        Usage:
+            time, data = spy.waterfall(max_rows=1000)
+            pcolormesh(spy.freq, time, data)
+        '''
+        rows = self.data.shape[0]
+        factor = 1
+        while -(-rows // factor) > max_rows:
+            factor *= 2
+        starts = np.arange(0, rows, factor)
+        counts = np.diff(np.append(starts, rows))
+        data = np.add.reduceat(self.data, starts, axis=0, dtype=np.float64)
+        data /= counts[:, None]
+        time = np.add.reduceat(self.time, starts) / counts
+        return time, data.astype(dtype or config.get_dtype(), copy=False)
+
+    def _lazy_channels(self):
+        return [value for value in self.__dict__.values()
+                if isinstance(value, _LazyChannels)]
+
+
+class GridFollower(object):
+    '''
+    Follow a .3ds grid that is still being acquired.  The follower remembers
+    how far into the file it has read, and each call to update() only reads
+    the pixels that were completed since the last call.  The average
+    spectrum (didv) and its standard deviation (didvStd) are updated
+    incrementally from the new pixels, so the file is never read twice.
+
+    Inputs:
+        filePath    - Required : Path to .3ds file.
+        channels    - Optional : List of channel names to keep in self.grid.
+                                 Keeps all channels by default, [] keeps none
+                                 (the running averages are still updated).
+        dtype       - Optional : Data type of the channels kept in memory.
+                                 Defaults to the working dtype (see
+                                 stmpy.set_dtype).  The running averages are
+                                 always computed in float64.
+
+    Attributes:
+        grid        - Dictionary of channels with shape (points, sizey,
+                      sizex).  Pixels not yet acquired are NaN.
+        LIY, I      - The lock-in and current channels in grid, if kept.
+        didv        - Average LIY spectrum over the pixels read so far.
+        didvStd     - Standard deviation of LIY over the pixels read so far.
+        en          - Bias of each energy layer.
+        count       - Number of pixels read so far.
+        complete    - True once every pixel has been read.
+
+    Usage:
+        follower = GridFollower('map.3ds')
+        while not follower.complete:
+            iy, ix, new = follower.update()
+            plot(follower.en, follower.didv)
+            time.sleep(300)
+    '''
+    def __init__(self, filePath, channels=None, dtype=None):
+        self.filePath = filePath
+        with open(filePath, 'rb') as fileObj:
+            self.header = _read_3ds_header(fileObj)
+            self.offset = fileObj.tell()
+        self._info = _3ds_info(self.header)
+        self._info['dataStart'] = self.offset
+        self._record = _3ds_dtype(self._info)
+        self.shape = (self._info['sizey'], self._info['sizex'])
+        if channels is None:
+            channels = self._info['channels']
+        for channel in channels:
+            if channel not in self._info['channels']:
+                raise ValueError('Channel {:} not found. Available channels:\n {:}'
+                                 .format(channel, self._info['channels']))
+        points = self._info['points']
+        dtype = dtype or config.get_dtype()
+        self.grid = {channel: np.full((points,) + self.shape, np.nan, dtype=dtype)
+                     for channel in channels}
+        self.scan = {name: np.full(self.shape, np.nan) 
+                     for name in self._info['paramName']}
+        _make_attr(self, 'LIY', ['LIY 1 omega (A)', 'LIY 1 omega [AVG] (A)'], 'grid')
+        _make_attr(self, 'I', ['Current (A)', 'Current [AVG] (A)'], 'grid')
+        self._LIYIndex = self._channel_index(['LIY 1 omega (A)',
+                                              'LIY 1 omega [AVG] (A)'])
+        self._biasIndex = self._channel_index(['Bias [AVG] (V)'])
+        self.count = 0
+        self.didv = np.zeros(points)
+        self.didvStd = np.zeros(points)
+        self._M2 = np.zeros(points)
+        self.en = np.zeros(points)
+        self.update()
+
+    @property
+    def complete(self):
+        return self.count == self.shape[0] * self.shape[1]
+
+    def update(self):
+        '''
+        Read the pixels completed since the last update.
+
+        Returns:
+            iy, ix  - Row and column indices of the new pixels.
+            new     - Dictionary of the new spectra, each channel with shape
+                      (points, number of new pixels).
+        '''
+        size = self._record.itemsize
+        remaining = self.shape[0] * self.shape[1] - self.count
+        with open(self.filePath, 'rb') as fileObj:
+            fileObj.seek(0, 2)
+            n = min(remaining, (fileObj.tell() - self.offset) // size)
+            fileObj.seek(self.offset)
+            raw = fileObj.read(n * size)
+        n = len(raw) // size
+        records = np.frombuffer(raw[:n * size], dtype=self._record)
+        pixels = np.arange(self.count, self.count + n)
+        iy, ix = np.unravel_index(pixels, self.shape)
+        new = {}
+        for channel in self.grid:
+            jx = self._info['channels'].index(channel)
+            new[channel] = records['data'][:, jx].T
+            self.grid[channel][:, iy, ix] = new[channel]
+        for jx, name in enumerate(self._info['paramName']):
+            self.scan[name][iy, ix] = records['params'][:, jx]
+        if n > 0:
+            self._merge(records, n)
+        self.offset += n * size
+        self.count += n
+        return iy, ix, new
+
+    def _merge(self, records, n):
+        '''Combine the statistics of the new pixels with the running ones
+        (Chan et al. parallel variance).'''
+        if self._LIYIndex is not None:
+            LIY = records['data'][:, self._LIYIndex].astype(np.float64)
+            mean = LIY.mean(axis=0)
+            M2 = ((LIY - mean)**2).sum(axis=0)
+            total = self.count + n
+            delta = mean - self.didv
+            self.didv = self.didv + delta * n / total
+            self._M2 = self._M2 + M2 + delta**2 * self.count * n / total
+            self.didvStd = np.sqrt(self._M2 / total)
+        if self._biasIndex is not None:
+            bias = records['data'][:, self._biasIndex].astype(np.float64)
+            self.en = self.en + (bias.mean(axis=0) - self.en) * n / (self.count + n)
+        elif self.count == 0:
+            names = self._info['paramName']
+            params = records['params'][0].astype(np.float64)
+            self.en = np.linspace(params[names.index('Sweep Start')],
+                                  params[names.index('Sweep End')],
+                                  self._info['points'])
+
+    def _channel_index(self, names):
+        for name in names:
+            if name in self._info['channels']:
+                return self._info['channels'].index(name)
+        return None
+
+
+class _ThreadStdout(object):
+    '''
+    Wraps sys.stdout, discarding writes from threads inside quiet().  The
+    wrapper is installed when the first thread enters quiet() and removed
+    when the last one leaves, so sys.stdout is only swapped while a quiet
+    load is running.
+    '''
+    _lock = threading.Lock()
+    _local = threading.local()
+    _active = None
+    _users = 0
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        if getattr(self._local, 'quiet', False):
+            return len(text)
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    @classmethod
+    @contextlib.contextmanager
+    def quiet(cls):
+        with cls._lock:
+            if cls._users == 0:
+                cls._active = cls(sys.stdout)
+                sys.stdout = cls._active
+            cls._users += 1
+        cls._local.quiet = True
+        try:
+            yield
+        finally:
+            cls._local.quiet = False
+            with cls._lock:
+                cls._users -= 1
+                if cls._users == 0:
+                    # Leave sys.stdout alone if it was replaced meanwhile.
+                    if sys.stdout is cls._active:
+                        sys.stdout = cls._active.stream
+                    cls._active = None
+
+
+class _LazyChannels(dict):
+    '''
+    Dictionary of channels backed by read-only memory-mapped views of a file.
+    A channel is copied into memory (native byte order, C-contiguous) the
+    first time it is looked up and the copy is kept until release() is
+    called.  Iterating over items() or values() does not load anything.
+    '''
+    def __init__(self, views, dtype=np.float64):
+        dict.__init__(self, views)
+        self._views = dict(views)
+        self.dtype = dtype
+
+    def __getitem__(self, key):
+        if not self.is_loaded(key):
+            self.materialize([key])
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def view(self, key):
+        '''Return the read-only mapped view of a channel.'''
+        return self._views[key]
+
+    def is_loaded(self, key):
+        return dict.__getitem__(self, key) is not self._views[key]
+
+    def materialize(self, keys=None, dtype=None):
+        '''Load channels (default: all) into memory.'''
+        if dtype is None:
+            dtype = self.dtype
+        for key in (self._views if keys is None else keys):
+            value = dict.__getitem__(self, key)
+            if not self.is_loaded(key) or value.dtype != dtype:
+                dict.__setitem__(self, key,
+                        np.array(self._views[key], dtype=dtype, order='C'))
+        return self
+
+    def release(self, keys=None):
+        '''Drop the in-memory copies of channels (default: all).'''
+        for key in (self._views if keys is None else keys):
+            dict.__setitem__(self, key, self._views[key])
+        return self
+
+
+####    ____FILE FORMATS____    ####
+
+register_format('spy', load_spy, save_spy, extensions=['spy'],
+                magic=[b'SPY: Stmpy I/O'], supports_mmap=True,
+                supports_partial=['keys', 'layers'])
+register_format('3ds', load_3ds, extensions=['3ds'], magic=[b'Grid dim='],
+                header=_read_3ds_header, supports_mmap='lazy',
+                supports_partial=['channels', 'energies', 'roi'],
+                supports_stream=True)
+register_format('sxm', load_sxm, extensions=['sxm'],
+                magic=[b':NANONIS_VERSION:'],
+                sniff=lambda head: b':SCANIT_TYPE:' in head or b':SCAN_PIXELS:' in head,
+                header=lambda fileObj: _read_sxm_header(fileObj, _file_name(fileObj)),
+                supports_mmap='lazy', supports_stream=True)
+register_format('dat', load_dat, extensions=['dat'], magic=[b'Experiment\t'],
+                header=_read_dat_header, supports_stream=True)
+register_format('nsp', load_nsp, extensions=['nsp'],
+                magic=[b':NANONIS_VERSION:'],
+                sniff=lambda head: b':DATASIZEROWS:' in head,
+                header=_read_nsp_header, supports_mmap=True,
+                supports_stream=True)
+register_format('mat', load_mat, save_mat, extensions=['mat'],
+                magic=[b'MATLAB 5.0 MAT-file'], supports_partial=['fields'])
+register_format('nvi', load_nvi, extensions=['nvi'], magic=[b'SR\x00\x04'])
+register_format('nvl', load_nvl, extensions=['nvl'], magic=[b'SR\x00\x04'])
+register_format('asc', load_asc, extensions=['asc'])
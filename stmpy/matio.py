@@ -1,213 +1,635 @@
-import numpy as np
-import scipy.io as sio
-import stmpy
-
-def loadmat(filePath):
-    '''
-Load in all variables from a .mat file.
-If you want to list all the variables in the file, use
-    >>> fo = sio.loadmat(filename)
-    >>> list(fo)
-
-STM_View structures will be stored as dictionaries.
-Ignore any variables starting with '__', to avoid __header__, etc...
-Return the variables imported in a dictionary.
-
-Usage:
-    >>> data_dict = loadmat(filename)
-       '''
-    fileObject = sio.loadmat(filePath)
-    data = {}
-    for x in fileObject:
-        if not x.startswith('__'):
-#			print('Importing ', x)
-            mat_raw = fileObject[x]
-            try:
-                mat = {}
-                for key in mat_raw.dtype.names:
-                    mat[key] = mat_raw[key][0][0]
-                data[x] = mat
-            except:
-                data[x] = mat_raw
-#		else:
-#			print('Skip ',x)
-    return data
-
-def nvl2mat(nvlfile, matfile, varname='nvlfile'):
-    '''
-Convert an NVL file to a .mat file containing an (almost) STM_View compatible data structure.
-Returns the NVL file data in a mappy object.
-
-Useage:
-    >>> nvl2mat('infile.NVL', 'outfile.mat')
-        '''
-    nvl = stmpy.load(nvlfile)		# Load NVL data from file
-    mappy_dat = Mappy()				# Create a mappy data structure
-    mappy_dat.nvl2mappy(nvl)		# Convert from NVL object to mappy object
-    mappy_dat.savemat(matfile, varname)	# Save the data in the .mat file
-    return mappy_dat
-
-
-class Mappy():
-    def __init__(self):
-        self.ops = []
-#		print('Created mappy')
-
-    def nvl2mappy(self,nvl):
-        '''
-Example usage:
-    >>> nvl_data = stmpy.load('filename.NVL')
-    >>> mappy_data = Mappy()
-    >>> mappy_data.nvl2mappy(nvl_data)
-            '''
-        self.map = np.copy(nvl.map)
-        self.en = np.copy(nvl.en)
-        self.ave = np.copy(nvl.ave)
-        self.add_op('nvl2mappy')
-
-        # Handle dictionaries properly
-        for key in ['info', 'header']:
-            tmp = getattr(nvl, key).copy()
-            nvlred = {}
-
-            # Get rid of Nonetypes and recarrays
-            for ikey in tmp:
-                x = tmp[ikey]
-                if x is None:
-                    tmp[ikey] = 'No value'
-                elif type(x) is np.recarray:
-                    tmp[ikey] = 'Recarray deleted in NVL to MAT conversion'
-                    print(ikey, 'Deleted because of recarray type')
-                nvlred[ikey] = tmp[ikey]
-            setattr(self, key, nvlred)
-
-        # Additional attributes that are not in NVL file
-        self.coord_type = 'r'
-        print('Assumed this is in r.  If in k, change coord_type to k')
-        self.name = self.info['FILENAME']
-        self.var = self.name
-
-#		return self
-
-    def mat2mappy(self,mhh):
-        '''
-Example usage:
-    >>> rawmat = loadmat('filename.mat')
-    >>> mat_data = rawmat['varname']
-    >>> mappy_data = Mappy()
-    >>> mappy_data = mat2mappy(mat_data)
-            '''
-        # HP: I think this only works for Mo's DOS-map type
-        # files.  I think he has other file types too, like
-        # topography.  They might be distinguishable by his
-        # type attribute, which is a number:
-        # 0 - for DOS map (works fine)
-        # 2 - for topography (error)
-        
-        for key in mhh:
-        # HP: Accessing zeroth element throws an error for
-        # None-type.  If any key has no entry then this prevents
-        # the file from opening.
-        # FIX: Check length of the element first.
-            if len(mhh[key]) != 0:
-                if type(mhh[key][0]) is np.str_:
-                    print(key, ' is a string')
-                    setattr(self, key, mhh[key][0])
-                elif key == 'info':
-                    self.info = {}
-                    x = mhh[key]
-                    for ikey in x.dtype.names:
-                        self.info[ikey] = x[ikey][0][0][0]
-                elif key == 'ops':
-                    self.ops = []
-                    x = mhh[key][0]
-                    for i, obj in enumerate(x):
-                        self.ops.append(obj[0])
-                elif key == 'e':
-                    self.en = mhh[key]
-                else:
-                    setattr(self, key, mhh[key])
-
-        # Make the energy axis the first index
-        # start with [i,j,e]
-        self.map = np.swapaxes(self.map, 1, 2)		# [i,e,j]
-        self.map = np.swapaxes(self.map, 0, 1)		# [e,i,j]
-
-#		return self
-
-    def mappy2mat(self):
-        '''
-Converts data in a mappy object to a dictionary with fields formatted for writing to a .mat file using the scipy.io module.  The mappy object will be (mostly) compatible with STM_View in Matlab.
-
-Conversion:
-- strings are nested in an np.array (will be strings in Matlab)
-- dictionaries will become structures in Matlab
-- lists will become cell arrays in Matlab
-
-Input: mappy data structure.
-Output: dictionary which can be written to a matlab file.
-            '''
-        pydct = vars(self)
-        mhh = {}
-        for key in pydct:
-            obj = pydct[key]
-
-            if type(obj) == np.str_:
-                mhh[key] = np.array([obj])
-            elif type(obj) == dict:
-                mhh[key] = format_mat_struct(obj)
-            elif type(obj) == list:
-                mhh[key] = format_mat_cell(obj)
-            elif key == 'en':
-                mhh['e'] = np.copy(obj)
-            else:
-                mhh[key] = np.copy(obj)
-
-        # Make the energy axis the last index
-        # start with [e,i,j]
-        mhh['map'] = np.swapaxes(mhh['map'], 0, 1)		# [i,e,j]
-        mhh['map'] = np.swapaxes(mhh['map'], 1, 2)		# [i,j,e]
-        
-        return mhh
-
-    def savemat(self, filename, varname='mappy'):
-        mhh = {varname: self.mappy2mat()}
-        sio.savemat(filename, mhh)
-
-    def add_op(self, new_op_string):
-        self.ops.append(new_op_string)
-
-#######################################################################
-
-def format_mat_struct(matred):
-# Input: dictionary of strings and arrays
-# Output: .mat structure format
-    # First make get the dtype list
-    dtype_ar = []
-    
-    for ikey in matred:
-        dtype_ar.append((ikey, np.object))
-        
-    # Want a np.ndarray of size (1,1)
-    matstruct = np.ndarray(shape=(1,1), dtype=dtype_ar)
-    
-    for i,entry in enumerate(dtype_ar):
-        ikey = entry[0]     # key for the dictionary
-        # print('format_mat_struct: ', i, ikey, entry)
-        x = np.copy(matred[ikey])
-        matstruct[0,0][ikey] = [x]
-    
-    return matstruct
-
-def format_mat_cell(matred):
-# Input: list of objects
-# Outupt: .mat file format for cell array
-    sz = len(matred)
-    matcell = np.ndarray(shape=(1,sz),dtype=np.object)
-    
-    for i,obj in enumerate(matred):
-        x = np.copy(matred[i])
-        matcell[0][i] = np.array([x])
-        
-    return matcell
-
+import numpy as np
+import stmpy
+import os
+import time
+import zlib
+from struct import pack, unpack
+
+def loadmat(filePath, fields=None, variables=None):
+    '''
+Load in all variables from a .mat file.
+If you want to list all the variables in the file, use
+    >>> fo = sio.loadmat(filename)
+    >>> list(fo)
+
+STM_View structures will be stored as dictionaries.
+Ignore any variables starting with '__', to avoid __header__, etc...
+Return the variables imported in a dictionary.
+
+To read only part of a large file give fields and/or variables.  The file
+is then read by a streaming MAT5 reader that skips everything else, and
+the values are plain python types: structures are dictionaries (lists of
+dictionaries for structure arrays), cell arrays are lists, strings are str
+and numeric arrays are numpy arrays with the matlab shape.
+
+Inputs:
+    filePath    - Required : Path to a MAT5 (-v6 or -v7) file.
+    fields      - Optional : List of structure fields to load, e.g. ['info'].
+    variables   - Optional : List of variables to load.
+
+Usage:
+    >>> data_dict = loadmat(filename)
+    >>> info = loadmat(filename, fields=['info'])['mappy']['info']
+       '''
+    if fields is not None or variables is not None:
+        return _read_mat(filePath, fields=fields, variables=variables)
+    import scipy.io as sio
+    fileObject = sio.loadmat(filePath)
+    data = {}
+    for x in fileObject:
+        if not x.startswith('__'):
+#			print('Importing ', x)
+            mat_raw = fileObject[x]
+            try:
+                mat = {}
+                for key in mat_raw.dtype.names:
+                    mat[key] = mat_raw[key][0][0]
+                data[x] = mat
+            except:
+                data[x] = mat_raw
+#		else:
+#			print('Skip ',x)
+    return data
+
+def load_stmview(filePath, fields=None):
+    '''
+Load STM_View structures from a .mat file into Mappy objects, without
+loading the whole file with scipy.io first.  The map is read one energy
+layer at a time straight into a C contiguous [e,i,j] array, and only the
+requested fields are read, so e.g. the info of a large DOS map can be
+looked at without reading the map.
+
+Inputs:
+    filePath    - Required : Path to a MAT5 (-v6 or -v7) file.
+    fields      - Optional : List of structure fields to load, e.g. ['map',
+                             'e'] or ['info'].  Default is all fields.
+
+Returns:
+    mappy       - Mappy object, or a dictionary of them if the file holds
+                  several structures.
+
+Usage:
+    >>> dos = load_stmview('map.mat')
+    >>> info = load_stmview('map.mat', fields=['info']).info
+        '''
+    raw = _read_mat(filePath, fields=fields, energyFirst=['map'])
+    mappy_dict = {}
+    for key, value in raw.items():
+        if not isinstance(value, dict):
+            print('Could not convert: {:}'.format(key))
+            continue
+        mappy = Mappy()
+        for ikey, x in value.items():
+            if ikey == 'e':
+                mappy.en = np.ravel(x)
+            elif ikey == 'ops' and isinstance(x, list):
+                mappy.ops = x
+            else:
+                setattr(mappy, ikey, x)
+        mappy_dict[key] = mappy
+    if len(mappy_dict) == 1:
+        return list(mappy_dict.values())[0]
+    return mappy_dict
+
+def nvl2mat(nvlfile, matfile, varname='nvlfile'):
+    '''
+Convert an NVL file to a .mat file containing an (almost) STM_View compatible data structure.
+Returns the NVL file data in a mappy object.
+
+Useage:
+    >>> nvl2mat('infile.NVL', 'outfile.mat')
+        '''
+    nvl = stmpy.load(nvlfile)		# Load NVL data from file
+    mappy_dat = Mappy()				# Create a mappy data structure
+    mappy_dat.nvl2mappy(nvl)		# Convert from NVL object to mappy object
+    mappy_dat.savemat(matfile, varname)	# Save the data in the .mat file
+    return mappy_dat
+
+
+class Mappy():
+    def __init__(self):
+        self.ops = []
+#		print('Created mappy')
+
+    def nvl2mappy(self,nvl):
+        '''
+Example usage:
+    >>> nvl_data = stmpy.load('filename.NVL')
+    >>> mappy_data = Mappy()
+    >>> mappy_data.nvl2mappy(nvl_data)
+            '''
+        self.map = np.copy(nvl.map)
+        self.en = np.copy(nvl.en)
+        self.ave = np.copy(nvl.ave)
+        self.add_op('nvl2mappy')
+
+        # Handle dictionaries properly
+        for key in ['info', 'header']:
+            tmp = getattr(nvl, key).copy()
+            nvlred = {}
+
+            # Get rid of Nonetypes and recarrays
+            for ikey in tmp:
+                x = tmp[ikey]
+                if x is None:
+                    tmp[ikey] = 'No value'
+                elif type(x) is np.recarray:
+                    tmp[ikey] = 'Recarray deleted in NVL to MAT conversion'
+                    print(ikey, 'Deleted because of recarray type')
+                nvlred[ikey] = tmp[ikey]
+            setattr(self, key, nvlred)
+
+        # Additional attributes that are not in NVL file
+        self.coord_type = 'r'
+        print('Assumed this is in r.  If in k, change coord_type to k')
+        self.name = self.info['FILENAME']
+        self.var = self.name
+
+#		return self
+
+    def mat2mappy(self,mhh):
+        '''
+Example usage:
+    >>> rawmat = loadmat('filename.mat')
+    >>> mat_data = rawmat['varname']
+    >>> mappy_data = Mappy()
+    >>> mappy_data = mat2mappy(mat_data)
+            '''
+        # HP: I think this only works for Mo's DOS-map type
+        # files.  I think he has other file types too, like
+        # topography.  They might be distinguishable by his
+        # type attribute, which is a number:
+        # 0 - for DOS map (works fine)
+        # 2 - for topography (error)
+        
+        for key in mhh:
+        # HP: Accessing zeroth element throws an error for
+        # None-type.  If any key has no entry then this prevents
+        # the file from opening.
+        # FIX: Check length of the element first.
+            if len(mhh[key]) != 0:
+                if type(mhh[key][0]) is np.str_:
+                    print(key, ' is a string')
+                    setattr(self, key, mhh[key][0])
+                elif key == 'info':
+                    self.info = {}
+                    x = mhh[key]
+                    for ikey in x.dtype.names:
+                        self.info[ikey] = x[ikey][0][0][0]
+                elif key == 'ops':
+                    self.ops = []
+                    x = mhh[key][0]
+                    for i, obj in enumerate(x):
+                        self.ops.append(obj[0])
+                elif key == 'e':
+                    self.en = mhh[key]
+                else:
+                    setattr(self, key, mhh[key])
+
+        # Make the energy axis the first index, [i,j,e] -> [e,i,j], in a
+        # single copy to a C contiguous array.
+        self.map = np.ascontiguousarray(np.moveaxis(self.map, -1, 0))
+
+#		return self
+
+    def mappy2mat(self):
+        '''
+Converts data in a mappy object to a dictionary with fields formatted for writing to a .mat file using the scipy.io module.  The mappy object will be (mostly) compatible with STM_View in Matlab.
+
+Conversion:
+- strings are nested in an np.array (will be strings in Matlab)
+- dictionaries will become structures in Matlab
+- lists will become cell arrays in Matlab
+
+Input: mappy data structure.
+Output: dictionary which can be written to a matlab file.
+            '''
+        pydct = vars(self)
+        mhh = {}
+        for key in pydct:
+            obj = pydct[key]
+
+            if type(obj) == np.str_:
+                mhh[key] = np.array([obj])
+            elif type(obj) == dict:
+                mhh[key] = format_mat_struct(obj)
+            elif type(obj) == list:
+                mhh[key] = format_mat_cell(obj)
+            elif key == 'en':
+                mhh['e'] = obj
+            else:
+                mhh[key] = obj
+
+        # Make the energy axis the last index, [e,i,j] -> [i,j,e].  This is
+        # a view, the data is only copied when it is written.
+        mhh['map'] = np.moveaxis(mhh['map'], 0, -1)
+        
+        return mhh
+
+    def savemat(self, filename, varname='mappy'):
+        '''
+Save the mappy object as an STM_View structure in a .mat file.  The file
+is written directly, one energy layer of the map at a time, so no copy of
+the whole map is made.
+
+Usage:
+    >>> mappy_data.savemat('outfile.mat', 'varname')
+        '''
+        mhh = {}
+        for key, obj in vars(self).items():
+            mhh['e' if key == 'en' else key] = obj
+        with open(filename, 'wb') as fileObj:
+            writer = _MatWriter(fileObj)
+            writer.write(varname, mhh, energyLast=['map'])
+
+    def add_op(self, new_op_string):
+        self.ops.append(new_op_string)
+
+#######################################################################
+
+def format_mat_struct(matred):
+# Input: dictionary of strings and arrays
+# Output: .mat structure format
+    # First make get the dtype list
+    dtype_ar = []
+    
+    for ikey in matred:
+        dtype_ar.append((ikey, object))
+        
+    # Want a np.ndarray of size (1,1)
+    matstruct = np.ndarray(shape=(1,1), dtype=dtype_ar)
+    
+    for i,entry in enumerate(dtype_ar):
+        ikey = entry[0]     # key for the dictionary
+        # print('format_mat_struct: ', i, ikey, entry)
+        matstruct[0,0][ikey] = [matred[ikey]]
+    
+    return matstruct
+
+def format_mat_cell(matred):
+# Input: list of objects
+# Outupt: .mat file format for cell array
+    sz = len(matred)
+    matcell = np.ndarray(shape=(1,sz),dtype=object)
+    
+    for i,obj in enumerate(matred):
+        matcell[0][i] = np.array([obj])
+        
+    return matcell
+
+
+#######################################################################
+# Streaming MAT5 (matlab -v6 and -v7) reader and writer.
+
+_miINT8, _miUINT8, _miINT16, _miUINT16, _miINT32, _miUINT32 = 1, 2, 3, 4, 5, 6
+_miSINGLE, _miDOUBLE, _miINT64, _miUINT64 = 7, 9, 12, 13
+_miMATRIX, _miCOMPRESSED, _miUTF8, _miUTF16, _miUTF32 = 14, 15, 16, 17, 18
+_mxCELL, _mxSTRUCT, _mxOBJECT, _mxCHAR = 1, 2, 3, 4
+
+_MI_TYPES = {_miINT8 : 'i1', _miUINT8 : 'u1', _miINT16 : 'i2',
+             _miUINT16 : 'u2', _miINT32 : 'i4', _miUINT32 : 'u4',
+             _miSINGLE : 'f4', _miDOUBLE : 'f8', _miINT64 : 'i8',
+             _miUINT64 : 'u8', _miUTF8 : 'u1', _miUTF16 : 'u2',
+             _miUTF32 : 'u4'}
+# Numeric matlab classes: numpy type and the matching miTYPE.
+_MX_CLASSES = {6 : ('f8', _miDOUBLE), 7 : ('f4', _miSINGLE),
+               8 : ('i1', _miINT8), 9 : ('u1', _miUINT8),
+               10 : ('i2', _miINT16), 11 : ('u2', _miUINT16),
+               12 : ('i4', _miINT32), 13 : ('u4', _miUINT32),
+               14 : ('i8', _miINT64), 15 : ('u8', _miUINT64)}
+_COMPLEX, _LOGICAL = 0x0800, 0x0200
+_BLOCK = 2**20
+
+
+class _FileStream(object):
+    '''Uncompressed part of a .mat file, keeping count of the bytes read.'''
+    def __init__(self, fileObj):
+        self.fileObj = fileObj
+        self.pos = 0
+
+    def read(self, n):
+        buf = bytearray(n)
+        if self.fileObj.readinto(buf) != n:
+            raise IOError('Unexpected end of .mat file.')
+        self.pos += n
+        return buf
+
+    def skip(self, n):
+        self.fileObj.seek(n, 1)
+        self.pos += n
+
+
+class _InflateStream(_FileStream):
+    '''miCOMPRESSED element, decompressed as it is read.'''
+    def __init__(self, fileObj, nbytes):
+        _FileStream.__init__(self, fileObj)
+        self.remaining = nbytes
+        self.zobj = zlib.decompressobj()
+        self.buf = bytearray()
+
+    def read(self, n):
+        while len(self.buf) < n:
+            if self.zobj.unconsumed_tail:
+                chunk = self.zobj.unconsumed_tail
+            elif self.remaining > 0:
+                chunk = self.fileObj.read(min(self.remaining, _BLOCK))
+                self.remaining -= len(chunk)
+                if not chunk:
+                    self.remaining = 0
+            else:
+                raise IOError('Unexpected end of compressed .mat data.')
+            self.buf += self.zobj.decompress(chunk, max(n - len(self.buf), _BLOCK))
+        out = self.buf[:n]
+        del self.buf[:n]
+        self.pos += n
+        return out
+
+    def skip(self, n):
+        while n > 0:
+            step = min(n, _BLOCK)
+            self.read(step)
+            n -= step
+
+
+def _read_mat(filePath, fields=None, variables=None, energyFirst=()):
+    '''
+    Read the variables of a MAT5 file, skipping unwanted variables and
+    structure fields without decoding them.  Fields in energyFirst (3D
+    numeric arrays) are returned with the last axis first, as a C contiguous
+    array filled one layer at a time.
+    '''
+    data = {}
+    with open(filePath, 'rb') as fileObj:
+        header = fileObj.read(128)
+        if len(header) < 128 or header[:6] != b'MATLAB':
+            raise IOError('{:} is not a MAT5 file.'.format(filePath))
+        if header[124:126] not in (b'\x00\x01', b'\x01\x00'):
+            raise IOError('Only matlab -v6 and -v7 .mat files are supported, '
+                          'use h5py for -v7.3 files.')
+        order = '<' if header[126:128] == b'IM' else '>'
+        while True:
+            start = fileObj.tell()
+            tag = fileObj.read(8)
+            if len(tag) < 8:
+                break
+            mtype, nbytes = unpack(order + 'II', tag)
+            end = start + 8 + nbytes
+            if mtype == _miCOMPRESSED:
+                stream = _InflateStream(fileObj, nbytes)
+                mtype, nbytes = unpack(order + 'II', stream.read(8))
+            else:
+                stream = _FileStream(fileObj)
+                end += -nbytes % 8
+            if mtype == _miMATRIX:
+                name, value = _read_matrix(stream, order, nbytes, fields,
+                                           variables, energyFirst)
+                if name is not None:
+                    data[name] = value
+            fileObj.seek(end)
+    return data
+
+def _read_element(stream, order):
+    '''Read a data element, returning its miTYPE and bytes.'''
+    tag = stream.read(8)
+    mtype, nbytes = unpack(order + 'II', bytes(tag))
+    if mtype >> 16:
+        # Small data element: type and size in the first 4 bytes of the
+        # tag, data in the last 4.
+        return mtype & 0xffff, tag[4:4 + (mtype >> 16)]
+    data = stream.read(nbytes)
+    stream.skip(-nbytes % 8)
+    return mtype, data
+
+def _read_matrix(stream, order, nbytes, fields=None, variables=None,
+                 energyFirst=(), layered=False):
+    '''
+    Read the body of a miMATRIX element.  Returns (name, value), with a name
+    of None if the variable was skipped.  fields, variables and energyFirst
+    only apply to this matrix and its fields, not to deeper levels.  If
+    layered is True a numeric array is returned with its last axis first.
+    '''
+    start = stream.pos
+    if nbytes == 0:
+        return '', np.empty((0, 0))
+    mtype, flags = _read_element(stream, order)
+    flags = unpack(order + 'I', bytes(flags[:4]))[0]
+    mclass = flags & 0xff
+    mtype, dims = _read_element(stream, order)
+    dims = tuple(np.frombuffer(dims, order + 'i4'))
+    mtype, name = _read_element(stream, order)
+    name = bytes(name).decode('ascii')
+    if variables is not None and name not in variables:
+        stream.skip(nbytes - (stream.pos - start))
+        return None, None
+    if mclass in _MX_CLASSES:
+        value = _read_numeric(stream, order, mclass, flags, dims,
+                              layered or name in energyFirst)
+    elif mclass == _mxCHAR:
+        value = _read_char(stream, order, dims)
+    elif mclass == _mxSTRUCT:
+        mtype, length = _read_element(stream, order)
+        length = unpack(order + 'i', bytes(length[:4]))[0]
+        mtype, names = _read_element(stream, order)
+        names = [bytes(names[ix:ix+length]).split(b'\x00')[0].decode('ascii')
+                 for ix in range(0, len(names), length)]
+        value = []
+        for __ in range(int(np.prod(dims))):
+            struct = {}
+            for key in names:
+                mtype, size = unpack(order + 'II', stream.read(8))
+                if fields is not None and key not in fields:
+                    stream.skip(size)
+                    continue
+                __, struct[key] = _read_matrix(stream, order, size,
+                                               layered=key in energyFirst)
+            value.append(struct)
+        if len(value) == 1:
+            value = value[0]
+    elif mclass == _mxCELL:
+        value = []
+        for __ in range(int(np.prod(dims))):
+            mtype, size = unpack(order + 'II', stream.read(8))
+            value.append(_read_matrix(stream, order, size)[1])
+    else:
+        print('WARNING: Skipped {:}, matlab class {:} is not supported.'.format(
+              name or 'a value', mclass))
+        value = None
+    stream.skip(nbytes - (stream.pos - start))
+    return name, value
+
+def _read_numeric(stream, order, mclass, flags, dims, energyFirst=False):
+    dtype = np.dtype(_MX_CLASSES[mclass][0])
+    if flags & _LOGICAL:
+        dtype = np.dtype(bool)
+    if flags & _COMPLEX:
+        dtype = np.result_type(dtype, np.complex64)
+    layered = energyFirst and len(dims) > 1
+    if layered:
+        shape = (dims[-1],) + dims[:-1]
+        value = np.empty(shape, dtype=dtype)
+    parts = ['real', 'imag'] if flags & _COMPLEX else ['real']
+    for part in parts:
+        tag = stream.read(8)
+        mtype, nbytes = unpack(order + 'II', bytes(tag))
+        small = mtype >> 16
+        if small:
+            nbytes, mtype = mtype >> 16, mtype & 0xffff
+        src = np.dtype(order + _MI_TYPES[mtype])
+        if layered:
+            count = int(np.prod(dims[:-1]))
+            target = value.real if part == 'real' else value.imag
+            if small:
+                layers = np.frombuffer(tag[4:4 + nbytes], src)
+                target[...] = np.moveaxis(layers.reshape(dims, order='F'), -1, 0)
+                continue
+            for ix in range(dims[-1]):
+                layer = np.frombuffer(stream.read(count * src.itemsize), src)
+                target[ix] = layer.reshape(dims[:-1], order='F')
+            stream.skip(-nbytes % 8)
+            continue
+        if small:
+            raw = tag[4:4 + nbytes]
+        else:
+            raw = stream.read(nbytes)
+            stream.skip(-nbytes % 8)
+        array = np.frombuffer(raw, src).reshape(dims, order='F')
+        if part == 'real':
+            real = array
+        else:
+            real = real + 1j * array
+    if layered:
+        return value
+    return real.astype(dtype, copy=False)
+
+def _read_char(stream, order, dims):
+    mtype, raw = _read_element(stream, order)
+    if mtype == _miUTF8 or _MI_TYPES.get(mtype) in ('u1', 'i1'):
+        text = bytes(raw).decode('utf-8')
+        if len(dims) == 2 and dims[0] > 1:
+            rows = np.array(list(text)).reshape(dims, order='F')
+            return [''.join(row) for row in rows]
+        return text
+    codes = np.frombuffer(raw, order + _MI_TYPES[mtype])
+    if mtype != _miUTF32:
+        codes = codes.astype('u2')
+    if not codes.size:
+        return ''
+    rows = codes.reshape(dims, order='F').reshape(dims[0], -1)
+    encoding = 'utf-32-le' if mtype == _miUTF32 else 'utf-16-le'
+    text = [row.astype('<' + row.dtype.str[1:]).tobytes().decode(encoding)
+            for row in rows]
+    return text[0] if len(text) == 1 else text
+
+
+class _MatWriter(object):
+    '''
+    Write python values to a MAT5 file: dictionaries become structures,
+    lists and tuples cell arrays, strings char arrays and numbers and numpy
+    arrays numeric matrices.  Arrays are written one layer (along the last
+    matlab axis) at a time.
+    '''
+    def __init__(self, fileObj):
+        self.fileObj = fileObj
+        text = 'MATLAB 5.0 MAT-file, Platform: {:}, Created on: {:}'.format(
+                os.name, time.asctime()).encode('ascii')
+        fileObj.write(text.ljust(116, b' ')[:116] + b'\x00' * 8)
+        fileObj.write(pack('<H', 0x0100) + b'IM')
+
+    def write(self, name, value, energyLast=()):
+        '''Write a variable.  Fields in energyLast are written [e,i,j] -> [i,j,e].'''
+        self._matrix(name, value, energyLast)
+
+    def _matrix(self, name, value, energyLast=()):
+        fileObj = self.fileObj
+        tagPos = fileObj.tell()
+        fileObj.write(pack('<II', _miMATRIX, 0))
+        if isinstance(value, dict):
+            self._header(_mxSTRUCT, 0, (1, 1), name)
+            keys = [str(key) for key in value]
+            length = max([len(key) for key in keys] + [0]) + 1
+            self._element(_miINT32, pack('<i', length))
+            self._element(_miINT8, b''.join(key.encode('ascii').ljust(length, b'\x00')
+                                            for key in keys))
+            for key, item in value.items():
+                if key in energyLast and np.ndim(item) > 1:
+                    self._numeric('', np.moveaxis(np.asarray(item), 0, -1))
+                else:
+                    self._matrix('', item)
+        elif isinstance(value, (list, tuple)):
+            self._header(_mxCELL, 0, (1, len(value)), name)
+            for item in value:
+                self._matrix('', item)
+        elif isinstance(value, (str, bytes)) or (isinstance(value, np.ndarray)
+                and value.dtype.kind in 'US' and value.size == 1):
+            text = value.item() if isinstance(value, np.ndarray) else value
+            if isinstance(text, bytes):
+                text = text.decode('utf-8', 'replace')
+            raw = text.encode('utf-16-le')
+            dims = (1, len(raw) // 2) if raw else (0, 0)
+            self._header(_mxCHAR, 0, dims, name)
+            self._element(_miUTF16, raw)
+        elif value is None:
+            self._numeric(name, np.empty((0, 0)), header=False)
+        else:
+            array = np.asarray(value)
+            if array.dtype.kind in 'OUS':
+                self._header(_mxCELL, 0, _dims(array), name)
+                for item in array.ravel(order='F'):
+                    self._matrix('', item)
+            else:
+                self._numeric(name, array, header=False)
+        end = fileObj.tell()
+        fileObj.seek(tagPos + 4)
+        fileObj.write(pack('<I', end - tagPos - 8))
+        fileObj.seek(end)
+
+    def _numeric(self, name, array, header=True):
+        fileObj = self.fileObj
+        if header:
+            tagPos = fileObj.tell()
+            fileObj.write(pack('<II', _miMATRIX, 0))
+        flags = 0
+        if array.dtype.kind == 'b':
+            flags, array = _LOGICAL, array.view(np.uint8)
+        if array.dtype.kind == 'c':
+            flags |= _COMPLEX
+        real = array.real
+        for mclass, (dtype, mtype) in _MX_CLASSES.items():
+            if real.dtype.str[1:] == dtype:
+                break
+        else:
+            mclass, (dtype, mtype) = 6, _MX_CLASSES[6]
+        self._header(mclass, flags, _dims(array), name)
+        parts = [real, array.imag] if flags & _COMPLEX else [real]
+        for part in parts:
+            itemsize = np.dtype(dtype).itemsize
+            nbytes = part.size * itemsize
+            fileObj.write(pack('<II', mtype, nbytes))
+            if part.ndim < 3:
+                fileObj.write(part.astype('<' + dtype).tobytes(order='F'))
+            else:
+                for ix in range(part.shape[-1]):
+                    fileObj.write(part[..., ix].astype('<' + dtype)
+                                  .tobytes(order='F'))
+            fileObj.write(b'\x00' * (-nbytes % 8))
+        if header:
+            end = fileObj.tell()
+            fileObj.seek(tagPos + 4)
+            fileObj.write(pack('<I', end - tagPos - 8))
+            fileObj.seek(end)
+
+    def _header(self, mclass, flags, dims, name):
+        self._element(_miUINT32, pack('<II', mclass | flags, 0))
+        self._element(_miINT32, pack('<{:}i'.format(len(dims)), *dims))
+        self._element(_miINT8, name.encode('ascii'))
+
+    def _element(self, mtype, raw):
+        self.fileObj.write(pack('<II', mtype, len(raw)) + raw +
+                           b'\x00' * (-len(raw) % 8))
+
+def _dims(array):
+    if array.ndim == 0:
+        return (1, 1)
+    if array.ndim == 1:
+        return (1, array.shape[0])
+    return array.shape
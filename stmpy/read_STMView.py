@@ -1,4 +1,12 @@
 import scipy.io as sio
+from stmpy import matio
+
+'''
+Legacy STMView reader kept for old scripts.  load_STMView reads the file
+with scipy.io.loadmat, so the fields keep scipy's types (strings and scalars
+are numpy arrays).  Files are written by the MAT5 writer in stmpy.matio; use
+stmpy.load(filePath) or stmpy.matio.load_stmview in new code.
+'''
 
 def load_STMView(filePath):
     '''Load an STMView file into python as an object.
@@ -15,16 +23,16 @@ def load_STMView(filePath):
     return dataObjects
 
 def save(filePath,pyObject):
-    '''Save a python object into STMView format. 
+    '''Save a python object into STMView format.
         Under deveopment - anticipate some bugs.
         Usage: save(filePath, dataObject)
         '''
-    pySave = {}
-    for key in pyObject.keys():
-        pyDict = vars(pyObject[key])
-        pyDict['info'] = vars(pyObject[key].info)
-        pySave[key] = pyDict
-    sio.savemat(filePath, pySave)
+    with open(filePath, 'wb') as fileObj:
+        writer = matio._MatWriter(fileObj)
+        for key in pyObject.keys():
+            pyDict = dict(vars(pyObject[key]))
+            pyDict['info'] = vars(pyObject[key].info)
+            writer.write(key, pyDict)
 
 class pyData(object):
     def __init__(self,fileObject,typeID):
@@ -37,4 +45,3 @@ class pyInfo(object):
     def __init__(self,info) :
         for name in info.dtype.names:
              setattr(self, name, info[name][0,0])
-
@@ -4,102 +4,313 @@ from __future__ import print_function
 import stmpy
 import sys
 import numpy as np
-import matplotlib as mpl
+from stmpy import config
 #import scipy.interpolate as sin  #this is a stupid name for this package...
 from scipy.interpolate import interp1d
 import scipy.optimize as opt
 import scipy.ndimage as snd
+import scipy.fft as scifft
 from scipy.signal import butter, filtfilt, fftconvolve, hilbert
 
 
-def interp2d(x, y, z, kind='nearest', **kwargs):
+def interp2d(x, y, z, kind='nearest', fill_value=None, **kwargs):
     '''
-    An extension for scipy.interpolate.interp2d() which adds a 'nearest'
-    neighbor interpolation. 
-
-    See help(scipy.interpolate.interp2d) for details. 
+    Interpolate data on a regular 2D grid.  A replacement for
+    scipy.interpolate.interp2d() (removed from scipy) which adds a 'nearest'
+    neighbor interpolation.  The returned function is backed by
+    stmpy.tools.sample, so the spline coefficients are computed once and
+    whole arrays of points are evaluated in one call.
 
     Inputs:
-        x       - Required : Array contining x values for data points. 
+        x       - Required : Array contining x values for data points.
         y       - Required : Array contining y values for data points.
-        z       - Required : Array contining z values for data points. 
+        z       - Required : 2D array of shape (len(y), len(x)).
         kind    - Optional : Sting for interpolation scheme. Options are:
                              'nearest', 'linear', 'cubic', 'quintic'.  Note
-                             that 'linear', 'cubic', 'quintic' use spline. 
-        **kwargs - Optional : Keyword arguments passed to
-                              scipy.interpolate.interp2d
+                             that 'linear', 'cubic', 'quintic' use spline.
+        fill_value - Optional : Value for points outside the grid.  Default
+                                is None, which uses the nearest edge value.
+        **kwargs - Optional : Other scipy interp2d keywords.  As in scipy,
+                              assume_sorted=True skips sorting the new x
+                              and y for the spline kinds; the rest (e.g.
+                              copy, bounds_error) are accepted and ignored.
 
-    Returns: 
-        f(x,y) - Callable function which will return interpolated values. 
+    Returns:
+        f(x,y) - Callable function which will return interpolated values on
+                 the grid of x and y.  The spline kinds return the shapes
+                 of scipy's interp2d: (len(y), len(x)), squeezed to 1D when
+                 y is a scalar.  'nearest' returns (len(x), len(y)) when x
+                 or y is a scalar (so (1, 1) for two scalars), as it always
+                 has, and (len(y), len(x)) otherwise.
 
     History:
         2017-08-24  - HP : Initial commit.
     '''
-    from scipy.interpolate import NearestNDInterpolator
-    if kind is 'nearest':
-        X, Y = np.meshgrid(x ,y)
-        points = np.array([X.flatten(), Y.flatten()]).T
-        values = z.flatten()
-        fActual = NearestNDInterpolator(points, values)
-        def fCall(x, y):
-            if type(x) is not np.ndarray:
-                lx = 1
-            else:
-                lx = x.shape[0]
-            if type(y) is not np.ndarray:
-                ly = 1
-            else:
-                ly = y.shape[0]    
-            X, Y = np.meshgrid(x ,y)
-            points = np.array([X.flatten(), Y.flatten()]).T
-            values = fActual(points)
-            return values.reshape(lx, ly)
-        return fCall
+    if fill_value is None:
+        sampler = _Sampler(z, kind, mode='nearest')
     else:
-        from scipy.interpolate import interp2d as scinterp2d
-        return scinterp2d(x, y, z, kind=kind, **kwargs)
+        sampler = _Sampler(z, kind, mode='constant', cval=fill_value)
+    toPixels = [_pixel_coordinates(t) for t in (x, y)]
+    sort = kind != 'nearest' and not kwargs.get('assume_sorted', False)
+    def fCall(xnew, ynew):
+        if sort:
+            xnew, ynew = np.sort(xnew, axis=None), np.sort(ynew, axis=None)
+        X, Y = np.meshgrid(toPixels[0](xnew), toPixels[1](ynew))
+        values = sampler(X, Y)
+        if kind == 'nearest':
+            return values.reshape(X.shape[::-1]) if 1 in X.shape else values
+        return values[0] if len(values) == 1 else values
+    return fCall
+
+
+def sample(data, x, y, order=1, mode='nearest', cval=np.nan):
+    '''
+    Sample a 2D image, or every layer of a 3D stack, at arbitrary sub-pixel
+    points.  All points (and all layers) are evaluated in one vectorized
+    call, using scipy.ndimage.map_coordinates on precomputed spline
+    coefficients for order > 1.
+
+    Inputs:
+        data    - Required : A 2D image or a 3D stack with layers along the
+                             first axis.
+        x       - Required : Array of x (column) pixel coordinates.
+        y       - Required : Array of y (row) pixel coordinates, broadcast
+                             against x.
+        order   - Optional : Spline order 0 to 5, or one of 'nearest',
+                             'linear', 'cubic', 'quintic'.
+        mode    - Optional : How points outside the image are handled.
+                             'nearest' uses the edge value, 'constant' gives
+                             cval.  Other scipy.ndimage modes ('mirror',
+                             'wrap', ...) are also accepted.
+        cval    - Optional : Value outside the image for mode='constant'.
+
+    Returns:
+        values  - Array of shape x.shape for 2D data, or (layers,) + x.shape
+                  for 3D data.
+
+    Usage:
+        t = np.linspace(0, 1, 500)
+        cut = sample(data.LIY, 10 + 80*t, 20 + 30*t, order='cubic')
+    '''
+    return _Sampler(data, order, mode, cval)(x, y)
+
+
+_SPLINE_ORDERS = {'nearest': 0, 'linear': 1, 'cubic': 3, 'quintic': 5}
+
+
+class _Sampler(object):
+    '''
+    Sampler for a 2D image or 3D stack (layers first).  The spline
+    coefficients are computed once, so the sampler can be called many times.
+    Orders 0 and 1 with modes 'nearest' or 'constant' gather all layers with
+    fancy indexing; everything else uses scipy.ndimage.map_coordinates.
+    '''
+    def __init__(self, data, order=1, mode='nearest', cval=np.nan):
+        if isinstance(order, str):
+            if order not in _SPLINE_ORDERS:
+                raise ValueError('Unknown interpolation {:}. Options are: {:}'.format(
+                                 order, ', '.join(_SPLINE_ORDERS)))
+            order = _SPLINE_ORDERS[order]
+        data = np.asarray(data)
+        if data.ndim not in (2, 3):
+            raise TypeError('Data must be 2D or 3D numpy array.')
+        if not np.issubdtype(data.dtype, np.inexact):
+            data = data.astype(np.float64)
+        self.order, self.mode, self.cval = int(order), mode, cval
+        self.gather = self.order <= 1 and mode in ('nearest', 'constant')
+        self.npad = 0
+        if self.order > 1:
+            if mode in ('nearest', 'grid-constant'):
+                # Same padding as scipy.ndimage.map_coordinates, as these
+                # modes have no exact boundary condition for the filter.
+                self.npad = 12
+                pad = [(0, 0)] * (data.ndim - 2) + [(self.npad, self.npad)] * 2
+                if mode == 'nearest':
+                    data = np.pad(data, pad, mode='edge')
+                else:
+                    data = np.pad(data, pad, mode='constant', constant_values=cval)
+            data = snd.spline_filter1d(data, self.order, axis=-1, mode=mode,
+                                       output=data.dtype)
+            data = snd.spline_filter1d(data, self.order, axis=-2, mode=mode,
+                                       output=data.dtype)
+        self.coeffs = data
+
+    def __call__(self, x, y):
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64),
+                                   np.asarray(y, dtype=np.float64))
+        if self.gather:
+            return self._gather(x, y)
+        coords = np.array([y.ravel(), x.ravel()]) + self.npad
+        kwargs = {'order': self.order, 'mode': self.mode, 'cval': self.cval,
+                  'prefilter': False}
+        if self.coeffs.ndim == 2:
+            return snd.map_coordinates(self.coeffs, coords, **kwargs).reshape(x.shape)
+        out = np.empty((len(self.coeffs), x.size), dtype=self.coeffs.dtype)
+        for ix, layer in enumerate(self.coeffs):
+            snd.map_coordinates(layer, coords, output=out[ix], **kwargs)
+        return out.reshape((len(self.coeffs),) + x.shape)
+
+    def _gather(self, x, y):
+        data = self.coeffs
+        ny, nx = data.shape[-2:]
+        if self.mode == 'constant':
+            outside = (x < 0) | (x > nx-1) | (y < 0) | (y > ny-1)
+        x = np.clip(x, 0, nx-1)
+        y = np.clip(y, 0, ny-1)
+        # Gathering by flat pixel index is much faster than fancy indexing
+        # of the two pixel axes for stacks.
+        flat = data.reshape(data.shape[:-2] + (ny*nx,))
+        at = lambda iy, ix: np.take(flat, iy*nx + ix, axis=-1)
+        if self.order == 0:
+            out = at(np.floor(y + 0.5).astype(np.intp),
+                     np.floor(x + 0.5).astype(np.intp))
+        else:
+            x0 = np.minimum(x.astype(np.intp), max(nx-2, 0))
+            y0 = np.minimum(y.astype(np.intp), max(ny-2, 0))
+            x1 = np.minimum(x0 + 1, nx-1)
+            y1 = np.minimum(y0 + 1, ny-1)
+            rtype = data.real.dtype
+            fx = (x - x0).astype(rtype)
+            fy = (y - y0).astype(rtype)
+            out = at(y0, x0) * ((1 - fx) * (1 - fy))
+            out += at(y0, x1) * (fx * (1 - fy))
+            out += at(y1, x0) * ((1 - fx) * fy)
+            out += at(y1, x1) * (fx * fy)
+        if self.mode == 'constant' and outside.any():
+            out[..., outside] = self.cval
+        return out
+
+
+def _pixel_coordinates(t):
+    '''Return a function converting coordinates on the axis t to pixels.'''
+    t = np.asarray(t, dtype=np.float64).ravel()
+    if len(t) < 2:
+        return lambda tnew: np.zeros_like(np.asarray(tnew, dtype=np.float64))
+    step = (t[-1] - t[0]) / (len(t) - 1)
+    if np.allclose(np.diff(t), step):
+        return lambda tnew: (np.asarray(tnew, dtype=np.float64) - t[0]) / step
+    return lambda tnew: np.interp(tnew, t, np.arange(len(t), dtype=np.float64))
 
 
 def azimuthalAverage(F, x0, y0, r, theta=np.linspace(0,2*np.pi,500), 
         kind='linear'):
     ''' Uses 2D interpolation to average F over an arc defined by theta 
-    for every r value starting from x0,y0. 
+    for every r value starting from x0,y0.  F can be 2D, or 3D in which case
+    every layer is averaged in the same call and the result is (layer, r).
 
     History:
         2017-08-24  - HP : Modified to use stmpy.tools.interp2d().
     '''
-    f = interp2d(np.arange(F.shape[1]), np.arange(F.shape[0]), F, kind=kind)
-    Z = np.zeros_like(r); fTheta = np.zeros_like(theta)
-    for ix, r0 in enumerate(r):
-        x = r0*np.cos(theta) + x0
-        y = r0*np.sin(theta) + y0
-        for iy, (xn,yn) in enumerate(zip(x,y)):
-            fTheta[iy] = f(xn,yn)
-        Z[ix] = np.mean(fTheta)
-    return Z
+    x = x0 + np.outer(r, np.cos(theta))
+    y = y0 + np.outer(r, np.sin(theta))
+    return sample(F, x, y, order=kind).mean(axis=-1)
 
 
 def azimuthalAverageRaw(F,x0,y0,rmax):
-    ''' Azimuthally average beginning at x0,y0 to a maximum distance rmax'''
-    f=[]; p=[]; R=[]; FAvg=[]
-    for x in range(F.shape[1]):
-        for y in range(F.shape[0]):
-            r = np.sqrt((x-x0)**2 + (y-y0)**2)
-            if r <= rmax:
-                p.append(r)
-                f.append(F[y,x])
-    for r0 in set(np.sort(p)):
-        R.append(r0)
-        allFVals = [f0 for ix,f0 in enumerate(f) if p[ix] == r0]
-        FAvg.append(np.mean(allFVals))  
-    R = np.array(R); ixSorted = R.argsort()  
-    return R[ixSorted], np.array(FAvg)[ixSorted]
+    ''' Azimuthally average beginning at x0,y0 to a maximum distance rmax.
+    Returns every distinct pixel distance R <= rmax and the mean of F over
+    the pixels at that distance, for a 2D image or for each layer of a 3D
+    stack (FAvg then has shape (layers, len(R))).'''
+    if len(F.shape) not in (2, 3):
+        raise TypeError('Data must be 2D or 3D numpy array.')
+    ny, nx = F.shape[-2:]
+    y, x = np.indices((ny, nx))
+    r = np.sqrt((x-x0)**2 + (y-y0)**2).ravel()
+    inside = r <= rmax
+    R, index = np.unique(r[inside], return_inverse=True)
+    counts = np.bincount(index, minlength=len(R))
+    flat = F.reshape(-1, ny*nx)[:, inside]
+    FAvg = np.empty((len(flat), len(R)))
+    for ix, layer in enumerate(flat):
+        FAvg[ix] = np.bincount(index, weights=layer, minlength=len(R))
+    FAvg /= counts
+    if len(F.shape) == 2:
+        return R, FAvg[0]
+    return R, FAvg
+
+
+def radial_profile(data, center, bins=None, angle_range=None, kind=None):
+    '''
+    Radial profile of a 2D image or of every layer of a 3D stack, e.g. the
+    average of a QPI pattern over rings around q=0.
+
+    Pixels are assigned to radius (and angle) bins once, and each bin is
+    summed with np.bincount, so a full stack takes one pass over the data.
+    With kind set, the data is instead interpolated on a polar grid at the
+    bin centers, which gives sub-pixel resolution (see arc_linecut).
+
+    Inputs:
+        data        - Required : A 2D or 3D numpy array (layers first).
+        center      - Required : Tuple (x0, y0) of the center in pixels.
+        bins        - Optional : Number of radius bins from 0 to the largest
+                                 distance in the image, or an array of bin
+                                 edges in pixels.  Default is one bin per
+                                 pixel, centered on integer radii.
+        angle_range - Optional : Tuple (start, stop) of angles IN DEGREES,
+                                 counterclockwise from the +x axis, to
+                                 average over.  Default is the full circle.
+        kind        - Optional : None to average pixels in each bin, or
+                                 one of 'nearest', 'linear', 'cubic',
+                                 'quintic' to interpolate.
+
+    Returns:
+        r       - 1D array of bin centers in pixels.
+        profile - 1D array (r) or 2D array (layer, r).  Empty bins are NaN.
+
+    Usage:
+        r, profile = radial_profile(data.LIY, (256, 256), bins=128)
+        r, cut = radial_profile(data.LIY, (256, 256), angle_range=(40, 50))
+    '''
+    if len(data.shape) not in (2, 3):
+        raise TypeError('Data must be 2D or 3D numpy array.')
+    x0, y0 = center
+    ny, nx = data.shape[-2:]
+    rmax = np.sqrt(max(x0, nx-1-x0)**2 + max(y0, ny-1-y0)**2)
+    if bins is None:
+        edges = np.arange(np.ceil(rmax) + 1) - 0.5
+        edges[0] = 0
+    elif np.ndim(bins) == 0:
+        edges = np.linspace(0, rmax, int(bins) + 1)
+    else:
+        edges = np.asarray(bins, dtype=np.float64)
+    r = (edges[:-1] + edges[1:]) / 2.0
+    if bins is None:
+        r[0] = 0
+    if kind is not None:
+        start, stop = (0, 360) if angle_range is None else angle_range
+        span = np.radians(stop - start)
+        theta = np.radians(start) + np.linspace(0, span,
+                                                int(np.ceil(abs(span)*r[-1])) + 2)
+        return r, azimuthalAverage(data, x0, y0, r, theta, kind=kind)
+    y, x = np.indices((ny, nx))
+    dist = np.hypot(x-x0, y-y0).ravel()
+    index = np.digitize(dist, edges) - 1
+    # As in np.histogram, the last bin includes its right edge.
+    index[dist == edges[-1]] = len(r) - 1
+    use = (index >= 0) & (index < len(r))
+    if angle_range is not None:
+        start, stop = angle_range
+        angle = np.degrees(np.arctan2(y-y0, x-x0)).ravel()
+        if stop - start < 360:
+            use &= (angle - start) % 360 <= (stop - start) % 360
+    index = index[use]
+    counts = np.bincount(index, minlength=len(r)).astype(np.float64)
+    counts[counts == 0] = np.nan
+    flat = data.reshape(data.shape[:-2] + (nx*ny,))
+    if flat.ndim == 1:
+        return r, np.bincount(index, weights=flat[use], minlength=len(r)) / counts
+    profile = np.empty((len(flat), len(r)))
+    for ix, layer in enumerate(flat):
+        profile[ix] = np.bincount(index, weights=layer[use], minlength=len(r))
+    return r, profile / counts
 
 
 def arc_linecut(data, p0, length, angle, width=20, dl=0, dw=100, kind='linear',  
         show=False, ax=None, **kwarg):
     '''A less cumbersome wrapper for stmpy.tools.azimuthalAverage.  Computes an
-    arc-averaged linecut on 2D data, or on each layer in 3D data.
+    arc-averaged linecut on 2D data, or on each layer in 3D data.  The polar
+    grid is interpolated once for all layers.  For a pixel-binned version see
+    stmpy.tools.radial_profile.
 
     Inputs:
         data    - Required : A 2D or 3D numpy array.
@@ -139,14 +350,9 @@ def arc_linecut(data, p0, length, angle, width=20, dl=0, dw=100, kind='linear',
     dtheta = np.radians(width/2.0)
     r = np.linspace(0, length, round(length+dl))
     t = np.linspace(theta-dtheta, theta+dtheta, round(dw))
-    if len(data.shape) == 2:
-        cut = azimuthalAverage(data, p0[0], p0[1], r, t, kind=kind)
-    elif len(data.shape) == 3:
-        cut = np.zeros([data.shape[0], len(r)])
-        for ix, layer in enumerate(data):
-            cut[ix] = azimuthalAverage(layer, p0[0], p0[1], r, t, kind=kind)
-    else:
+    if len(data.shape) not in (2, 3):
         raise TypeError('Data must be 2D or 3D numpy array.')
+    cut = azimuthalAverage(data, p0[0], p0[1], r, t, kind=kind)
     if show:  
         ax.plot([p0[0], p0[0]+length*np.cos(theta-dtheta)], 
                 [p0[1], p0[1]+length*np.sin(theta-dtheta)], 'k--', lw=1, **kwarg)
@@ -179,15 +385,12 @@ History:
     2017-06-19  - HP : Changed name to linecut_old (will be replaced by
                        linecut)
     '''
-    x = np.arange(F.shape[0])
-    y =  np.arange(F.shape[1])
     cen = np.sqrt((x1-x2)**2 + (y1-y2)**2) / 2.0
     r = np.linspace(-1*cen, cen, n)
-    f = interp2d(x, y, F, kind = 'linear')
     xval = np.linspace(x1, x2, n)
     yval = np.linspace(y1, y2, n)
-    z = [f(xval[ix],yval[ix])[0] for ix in range(n)]
-    return r, np.array(z)
+    z = sample(F, xval, yval, order='linear')
+    return r, z
 
 
 def squareCrop(image,m=None):
@@ -227,11 +430,13 @@ def removePolynomial1d(y, n, x=None, fitRange=None):
     return y - polyBackgroundFunction(x)
 
 
-def lineSubtract(data, n=1, normalize=True, colSubtract=False):
+def lineSubtract(data, n=1, normalize=True, colSubtract=False, robust=False):
     '''
     Remove a polynomial background from the data line-by-line.  If the data is
     3D (eg. 3ds) this does a 2D background subtract on each layer
-    independently.  Input is a numpy array. 
+    independently.  Input is a numpy array.  The pseudo-inverse of the
+    Vandermonde matrix is computed once and applied to all lines of all
+    layers as a matrix product.
     
     Inputs:
         data    -   Required : A 1D, 2D or 3D numpy array.
@@ -241,9 +446,15 @@ def lineSubtract(data, n=1, normalize=True, colSubtract=False):
                                is set to zero (True) or preserved (False).
                                (default : True)
         colSubtract - Optional : Boolean flag (False by default) to determine if polynomial background should also be subtracted column-wise
+        robust  -   Optional : Boolean flag (False by default). If True the
+                               polynomials are fit by iteratively reweighted
+                               (Huber) least squares, which is much less
+                               sensitive to steps and defects.
 
     Returns:
-        subtractedData  -   Data after removing an n-degree polynomial
+        subtractedData  -   Data after removing an n-degree polynomial, in the
+                            working dtype (see stmpy.set_dtype).  The fits are
+                            done in float64.
     
     Usage:
         dataObject.z = lineSubtract(dataObject.Z, n=1, normalize=True)
@@ -252,36 +463,90 @@ def lineSubtract(data, n=1, normalize=True, colSubtract=False):
         2017-07-19  - HP : Updated to work for 1D data. 
         2018-06-07  - MF : Updated to do a background subtract in the orthogonal direction (ie. column-wise) 
     '''
-    def subtract_1D(data, n):
-        x = np.linspace(0,1,len(data))
-        popt = np.polyfit(x, data, n)
-        return data - np.polyval(popt, x)
-    def subtract_2D(data, n):
-        if normalize:
-            norm = 0
-        else: 
-            norm = np.mean(data)
-        output = np.zeros_like(data)
-        for ix, line in enumerate(data):
-            output[ix] = subtract_1D(line, n) 
-        if colSubtract:
-            temp = np.zeros_like(data)
-            for ix, line in enumerate(np.transpose(output)):
-                temp[ix] = subtract_1D(line, n) 
-            output = np.transpose(temp)
-        return output + norm
-
-    if len(data.shape) == 3:
-        output = np.zeros_like(data)
-        for ix, layer in enumerate(data):
-            output[ix] = subtract_2D(layer, n)
-        return output
-    elif len(data.shape) == 2:
-        return subtract_2D(data, n)
-    elif len(data.shape) == 1:
-        return subtract_1D(data, n)
-    else:
+    data = config.as_working(data)
+    if len(data.shape) not in (1, 2, 3):
         raise TypeError('Data must be 1D, 2D or 3D numpy array.')
+    vander = lambda length: np.vander(np.linspace(-1, 1, length), n+1)
+    output = _subtract_background(data, vander(data.shape[-1]), robust)
+    if len(data.shape) == 1:
+        return output
+    if colSubtract:
+        output = _subtract_background(output, vander(output.shape[-2]), robust,
+                                      axis=-2)
+    if not normalize:
+        output += data.mean(axis=(-2, -1), keepdims=True, dtype=np.float64
+                            ).astype(output.dtype)
+    return output
+
+
+# Number of float64 values fitted at a time by _subtract_background.  Small
+# chunks stay in the CPU cache, which is faster than one large product, but
+# at least 16 slices are fit together so that a large V is read less often.
+_FIT_CHUNK = 2**16
+
+
+def _subtract_background(data, V, robust=False, axis=-1, iterations=50):
+    '''
+    Subtract from every 1D slice of data along axis (-1 or -2) its least
+    squares fit by the columns of the design matrix V (samples x terms).
+    The pseudo-inverse of V is computed once and applied to many slices at a
+    time as one matrix product, in float64.  With robust=True the fits are
+    refined by _irls.  Returns an array with the shape and dtype of data.
+    '''
+    m = V.shape[0]
+    P = np.linalg.pinv(V)
+    if axis == -2 and robust:
+        out = _subtract_background(np.swapaxes(data, -1, -2), V, robust,
+                                   iterations=iterations)
+        return np.ascontiguousarray(np.swapaxes(out, -1, -2))
+    if axis == -2:
+        # Columns: fit V @ (P @ layer) for whole layers, without transposing.
+        stack = data.reshape((-1,) + data.shape[-2:])
+        out = np.empty(stack.shape, dtype=data.dtype)
+        step = max(1, _FIT_CHUNK // stack[0].size)
+        for start in range(0, len(stack), step):
+            y = stack[start:start+step].astype(np.float64)
+            np.subtract(y, V @ (P @ y), out=out[start:start+step],
+                        casting='same_kind')
+        return out.reshape(data.shape)
+    flat = data.reshape(-1, m)
+    out = np.empty(flat.shape, dtype=data.dtype)
+    step = max(16, _FIT_CHUNK // m)
+    for start in range(0, len(flat), step):
+        y = flat[start:start+step].astype(np.float64)
+        fit = (y @ P.T) @ V.T
+        if robust:
+            fit = _irls(y, V, fit, iterations)
+        np.subtract(y, fit, out=out[start:start+step], casting='same_kind')
+    return out.reshape(data.shape)
+
+
+def _irls(y, V, fit, iterations=50, tol=1e-6):
+    '''
+    Robust fits of the rows of y by iteratively reweighted least squares,
+    starting from fit.  Residuals larger than 1.345 times the noise (from
+    the median absolute deviation of each row) are down-weighted as in a
+    Huber fit, so steps and defects barely change the background.
+    '''
+    k = V.shape[1]
+    scale = np.abs(y).max() or 1.0
+    A = np.empty((len(y), k, k))
+    for __ in range(iterations):
+        res = y - fit
+        mad = np.median(np.abs(res - np.median(res, axis=-1, keepdims=True)),
+                        axis=-1, keepdims=True)
+        c = 1.345 * np.maximum(1.4826 * mad, 1e-12 * scale)
+        w = np.minimum(1.0, c / np.maximum(np.abs(res), 1e-300))
+        for i in range(k):
+            A[:, i, :] = (w * V[:, i]) @ V
+        b = (w * y) @ V
+        newFit = np.linalg.solve(A, b[..., None])[..., 0] @ V.T
+        converged = np.abs(newFit - fit).max() <= tol * scale
+        fit = newFit
+        if converged:
+            break
+    return fit
+
 
 def fitGaussian2d(data, p0):
     ''' Fit a 2D gaussian to the data with initial parameters p0. '''
@@ -388,29 +653,22 @@ def foldLayerImage(layerImage,bpThetaInRadians=0,n=4):
     return B
 
 
-def quickFT(data, n=None, zero_center=True, flag=True):
+def quickFT(data, n=None, zero_center=True, flag=True, workers=-1):
     '''
     A hassle-free FFT for 2D or 3D data.  Useful for quickly computing the QPI
     patterns from a DOS map. Returns the absolute value of the FFT for each
     layer in the image. Has the option of setting the center pixel to zero and
     the option to n-fold symmetrize the output.
 
+    The output uses the working dtype (see stmpy.set_dtype).  All layers are
+    transformed in one multi-threaded call (see fft), using workers threads.
+
     Usage: A.qpi = quickFT(A.LIY, zero_center=True, n=None)
     '''
-    def ft2(data):
-        ft = np.fft.fft2(data)
-        if zero_center:
-            ft[0,0] = 0
-        return np.absolute(np.fft.fftshift(ft))
-    if len(data.shape) is 2:
-        if n is None:
-            return ft2(data)
-        else:
-            return symmetrize(ft2(data), n, flag=flag)
-    if len(data.shape) is 3:
-        output = np.zeros_like(data)
-        for ix, layer in enumerate(data):
-            output[ix] = ft2(layer)
+    data = config.as_working(data, copy=True)
+    if len(data.shape) in (2, 3):
+        output = _fft2_shifted(data, 'absolute', zeroDC=zero_center,
+                               workers=workers)
         if n is None:
             return output
         else:
@@ -435,7 +693,8 @@ def symmetrize(data, n, bp=(1.,1.), diag=False):
                              on the diagonal.
     
     Returns:
-        dataSymm - A 2D or 3D numpy array containing symmetrized data.
+        dataSymm - A 2D or 3D numpy array containing symmetrized data, in the
+                   working dtype (see stmpy.set_dtype).
 
     History:
         2017-05-04  - JG : Initial commit.
@@ -469,6 +728,7 @@ def symmetrize(data, n, bp=(1.,1.), diag=False):
         else:
             return F
     p = np.array(bp, dtype=np.float64)
+    data = config.as_working(data)
     if len(data.shape) is 2:
             return linmirr(sym2d(data, n), p[0], p[1])
     if len(data.shape) is 3:
@@ -689,55 +949,54 @@ def track_peak(x, z, p0, **kwarg):
     return mu
 
 
-def plane_subtract(data, deg, X0=None):
+def plane_subtract(data, deg, X0=None, cross=False, robust=False):
     '''
-    Subtracts a polynomial plane from an image. The polynomial does not keep
-    any cross terms, i.e. not xy, only x^2 and y*2.  I think this is fine and
-    just doesn't keep any hyperbolic-like terms.
+    Subtracts a polynomial plane from an image.  By default the polynomial
+    does not keep any cross terms, i.e. not xy, only x^2 and y*2; set
+    cross=True for a full 2D polynomial.  Each layer is normalized as
+    (layer - mean) / max(layer - mean) before the plane is removed.
+
+    The planes of all layers are fit by least squares with a single
+    precomputed pseudo-inverse, rather than by a scipy.optimize.minimize of
+    the absolute deviation per layer.  robust=True refines the fits by
+    iteratively reweighted (Huber) least squares, which like the absolute
+    deviation is insensitive to defects.
 
     Inputs: 
         data    - Required : A 2D or 3D numpy array containing data
         deg     - Required : Degree of polynomial to be removed.
-        X0      - Optional : Guess optimization parameters for
-                             scipy.optimize.minimize.
+        X0      - Optional : Ignored.  Kept for compatibility, it used to be
+                             the initial guess for scipy.optimize.minimize.
+        cross   - Optional : Boolean. If True include the cross terms
+                             x^i*y^j with i+j <= deg.
+        robust  - Optional : Boolean. If True use a robust (Huber) fit,
+                             which is less sensitive to defects.
 
     Returns:
-        subtractedData - Data with a polynomial plane removed.
+        subtractedData - Data with a polynomial plane removed, in the
+                         working dtype (see stmpy.set_dtype).
 
     History:
         2017-07-13  - HP : Fixed so that it works up to at least 3rd order.  
     '''
-    def plane(a):
-        x = np.arange(subtract2D.norm.shape[1])
-        y = np.arange(subtract2D.norm.shape[0])
-        x = x[None,:]
-        y = y[:,None]
-        z = np.zeros_like(subtract2D.norm) + a[0]
-        N = int((len(a)-1)/2)
-        for k in range(1, N+1):
-            z += a[2*k-1] * x**k + a[2*k] * y**k
-        return z
-    def chi(X):
-        chi.fit = plane(X)
-        res = subtract2D.norm - chi.fit
-        err = np.sum(np.absolute(res))
-        return err
-    def subtract2D(layer):
-        vx = np.linspace(-1, 1, layer.shape[0])
-        vy = np.linspace(-1, 1, layer.shape[1])
-        x, y = vx[:, None], vy[None, :]
-        subtract2D.norm = (layer-np.mean(layer)) / np.max(layer-np.mean(layer))
-        result = opt.minimize(chi, X0)
-        return subtract2D.norm - chi.fit
-    if X0 is None:
-        X0 = np.zeros([2*deg+1])
-    if len(data.shape) == 2:
-        return subtract2D(data)
-    elif len(data.shape) == 3:
-        output = np.zeros_like(data)
-        for ix, layer in enumerate(data):
-            output[ix] = subtract2D(layer)
-        return output
+    data = config.as_working(data)
+    if len(data.shape) not in (2, 3):
+        raise TypeError('Data must be 2D or 3D numpy array.')
+    ny, nx = data.shape[-2:]
+    y, x = np.meshgrid(np.linspace(-1, 1, ny), np.linspace(-1, 1, nx),
+                       indexing='ij')
+    if cross:
+        terms = [x**i * y**(total-i) for total in range(deg+1)
+                 for i in range(total+1)]
+    else:
+        terms = [np.ones_like(x)]
+        for k in range(1, deg+1):
+            terms += [x**k, y**k]
+    V = np.column_stack([term.ravel() for term in terms])
+    norm = data.reshape(data.shape[:-2] + (nx*ny,))
+    norm = norm - norm.mean(axis=-1, keepdims=True)
+    norm /= norm.max(axis=-1, keepdims=True)
+    return _subtract_background(norm, V, robust).reshape(data.shape)
 
 def butter_lowpass_filter(data, ncutoff=0.5, order=1, method='pad', padtype='odd', irlen=None):
     '''
@@ -1049,10 +1308,15 @@ def radial_linecut(data, length, angle, width, reshape=True):
         print('ERR: Input must be 2D or 3D numpy array')
 
 
-def fft(dataIn, window='None', output='absolute', zeroDC=False, beta=1.0):
+def fft(dataIn, window='None', output='absolute', zeroDC=False, beta=1.0,
+        workers=-1):
     '''
     Compute the fast Frouier transform of a data set with the option to add
-    windowing. 
+    windowing.  For 2D and 3D data the mean removal, windowing, transform
+    and shift are done for all layers at once: the window is applied in
+    place, one batched scipy.fft call runs on several cores, and when only
+    the absolute value is needed a real FFT is used and written back into
+    the same buffer.
    
     Inputs:
         dataIn    - Required : A 1D, 2D or 3D numpy array
@@ -1066,9 +1330,12 @@ def fft(dataIn, window='None', output='absolute', zeroDC=False, beta=1.0):
                                 FFT will be set to zero.
         beta    - Optional : Float used to specify the kaiser window.  Only
                                used if window='kaiser'. 
+        workers - Optional : Number of threads used by scipy.fft. Default -1
+                             uses all cores.
     
     Returns:
-        fftData - numpy array containing FFT of data
+        fftData - numpy array containing FFT of data, in the working dtype
+                  (see stmpy.set_dtype) or its complex counterpart.
     
     Usage:
         fftData = fft(data, window='None', output='absolute', zeroDC=False, 
@@ -1080,63 +1347,83 @@ def fft(dataIn, window='None', output='absolute', zeroDC=False, beta=1.0):
         2017-10-31  - HP : Improved zeroDC to subtact the mean before FFT.
         2017-11-19  - HP : Fixed a bug in calculating the mean of 3D data. 
     '''
-    def ft2(data):
-        ftData = np.fft.fft2(data)
-        if zeroDC:
-            ftData[0,0] = 0
-        return np.fft.fftshift(ftData)
-    
-    outputFunctions = {'absolute':np.absolute, 'real':np.real, 
-                       'imag':np.imag, 'phase':np.angle, 'complex':(lambda x:x) }
-    
-    windowFunctions = {'None':(lambda x:np.ones(x)), 'none':(lambda x:np.ones(x)),
+    windowFunctions = {'None':None, 'none':None,
                        'bartlett':np.bartlett, 'blackman':np.blackman, 
                        'hamming':np.hamming, 'hanning':np.hanning, 
                        'kaiser':np.kaiser }
-
-    outputFunction = outputFunctions[output]
+    if output not in _FFT_OUTPUTS:
+        raise KeyError(output)
     windowFunction = windowFunctions[window]
-    
-    data = dataIn.copy()
-    if zeroDC:
-        if len(data.shape) == 3:
-            for ix, layer in enumerate(data):
-                data[ix] -= np.mean(layer)
-        else:
+    def make_window(length):
+        if windowFunction is None:
+            return None
+        if window == 'kaiser':
+            return windowFunction(length, beta)
+        return windowFunction(length)
+
+    data = config.as_working(dataIn, copy=True)
+    if len(data.shape) == 1:
+        if zeroDC:
             data -= np.mean(data)
+        W = make_window(data.shape[0])
+        if W is not None:
+            data *= W.astype(data.real.dtype)
+        ftD = scifft.fft(data, workers=workers, overwrite_x=True)
+        return _FFT_OUTPUTS[output](scifft.fftshift(ftD))
+    elif len(data.shape) in (2, 3):
+        wX, wY = make_window(data.shape[-2]), make_window(data.shape[-1])
+        W = None if wX is None else wX[:,None] * wY[None,:]
+        return _fft2_shifted(data, output, W, removeMean=zeroDC, zeroDC=zeroDC,
+                             workers=workers)
+    else: 
+        print('ERR: Input must be 1D, 2D or 3D numpy array')
 
-    if len(data.shape) != 1:
-        if window == 'kaiser':
-            wX = windowFunction(data.shape[-2], beta)[:,None]
-            wY = windowFunction(data.shape[-1], beta)[None,:]
-        else:
-            wX = windowFunction(data.shape[-2])[:,None]
-            wY = windowFunction(data.shape[-1])[None,:]
-        W = wX * wY
-        if len(data.shape) == 2:
-            wData = data * W
-            ftData = outputFunction(ft2(wData))
-        elif len(data.shape) == 3:
-            wTile = np.tile(W, (data.shape[0],1,1))
-            wData = data * wTile
-            if output == 'complex':
-                ftData = np.zeros_like(data, dtype=np.complex)
-            else: 
-                ftData = np.zeros_like(data)
-            for ix, layer in enumerate(wData):
-                ftData[ix] = outputFunction(ft2(layer))
-        else: 
-            print('ERR: Input must be 1D, 2D or 3D numpy array')
 
+_FFT_OUTPUTS = {'absolute':np.absolute, 'real':np.real, 'imag':np.imag,
+                'phase':np.angle, 'complex':(lambda x:x)}
+
+
+def _fft2_shifted(data, output='absolute', W=None, removeMean=False,
+                  zeroDC=False, workers=-1):
+    '''
+    fftshift(fft2(W*data)) over the last two axes of data, for all layers in
+    one call.  data must be a working dtype array that can be overwritten.
+
+    For even image sizes the shift is done by multiplying the data with a
+    checkerboard of signs, folded into the window, so it costs nothing.  For
+    output='absolute' a real FFT is computed, the missing half of the
+    spectrum is filled in from its Hermitian symmetry, and the result is
+    written back into data so no full size output is allocated.
+    '''
+    ny, nx = data.shape[-2:]
+    if removeMean:
+        data -= data.mean(axis=(-2, -1), keepdims=True)
+    even = ny % 2 == 0 and nx % 2 == 0
+    if even:
+        sign = 1 - 2 * (np.add.outer(np.arange(ny), np.arange(nx)) % 2)
+        W = sign if W is None else W * sign
+    if W is not None:
+        data *= W.astype(data.real.dtype)
+    axes = (-2, -1)
+    if output == 'absolute' and even and not np.iscomplexobj(data):
+        half = scifft.rfft2(data, axes=axes, workers=workers)
+        nh = half.shape[-1]
+        np.absolute(half, out=data[..., :nh])
+        del half
+        out = data
+        # |F(ky, kx)| = |F(-ky, -kx)| for the columns the real FFT skips.
+        out[..., :1, nh:] = out[..., :1, nx-nh:0:-1]
+        out[..., 1:, nh:] = out[..., :0:-1, nx-nh:0:-1]
     else:
-        if window == 'kaiser':
-            W = windowFunction(data.shape[0], beta)
-        else:
-            W = windowFunction(data.shape[0])
-        wData = data * W
-        ftD = np.fft.fft(wData)
-        ftData = outputFunction(np.fft.fftshift(ftD))
-    return ftData
+        out = scifft.fft2(data, axes=axes, workers=workers,
+                          overwrite_x=np.iscomplexobj(data))
+        if not even:
+            out = scifft.fftshift(out, axes=axes)
+        if output != 'complex':
+            out = _FFT_OUTPUTS[output](out).astype(data.real.dtype, copy=False)
+    if zeroDC:
+        out[..., ny//2, nx//2] = 0
+    return out
 
 
 def ifft(data, output='real', envelope=False):
@@ -1213,7 +1500,9 @@ def normalize(data, axis=0, condition='mean'):
 
 def linecut(data, p0, p1, width=1, dl=0, dw=0, kind='linear',
                 show=False, ax=None, **kwarg):
-    '''Linecut tool for 2D or 3D data.
+    '''Linecut tool for 2D or 3D data.  The (length x width) grid of
+    sampling points is computed once and all layers are sampled in a single
+    call to stmpy.tools.sample.
 
     Inputs:
         data    - Required : A 2D or 3D numpy array.
@@ -1249,18 +1538,6 @@ def linecut(data, p0, p1, width=1, dl=0, dw=0, kind='linear',
         2017-06-22  - HP : Python 3 compatible.
         2017-08-24  - HP : Modified to use stmpy.tools.interp2d()
     '''
-    def calc_length(p0, p1, dl):
-        dx = float(p1[0]-p0[0])
-        dy = float(p1[1]-p0[1])
-        l = np.sqrt(dy**2 + dx**2)
-        if dx == 0:
-            theta = np.pi/2
-        else:
-            theta = np.arctan(dy / dx)
-        xtot = np.linspace(p0[0], p1[0], int(np.ceil(l+dl)))
-        ytot = np.linspace(p0[1], p1[1], int(np.ceil(l+dl)))
-        return l, theta, xtot, ytot
-
     def get_perp_line(x, y, theta, w):
         wx0 = x - w/2.0*np.cos(np.pi/2 - theta)
         wx1 = x + w/2.0*np.cos(np.pi/2 - theta)
@@ -1268,34 +1545,11 @@ def linecut(data, p0, p1, width=1, dl=0, dw=0, kind='linear',
         wy1 = y - w/2.0*np.sin(np.pi/2 - theta)
         return (wx0, wx1), (wy0, wy1)
 
-    def cutter(F, p0, p1, dw):
-        l, __, xtot, ytot = calc_length(p0, p1, dw)    
-        cut = np.zeros(int(np.ceil(l+dw)))
-        for ix, (x,y) in enumerate(zip(xtot, ytot)):
-            cut[ix] = F(x,y)
-        return cut
-    
-    def linecut2D(layer, p0, p1, width, dl, dw):
-        xAll, yAll = np.arange(layer.shape[1]), np.arange(layer.shape[0])
-        F = interp2d(xAll, yAll, layer, kind=kind)
-        l, theta, xtot, ytot = calc_length(p0, p1, dl)
-        r = np.linspace(0, l, int(np.ceil(l+dl)))
-        cut = np.zeros(int(np.ceil(l+dl)))
-        for ix, (x,y) in enumerate(zip(xtot,ytot)):
-            (wx0, wx1), (wy0, wy1) = get_perp_line(x, y, theta, width)
-            wcut = cutter(F, (wx0,wy0), (wx1,wy1), dw)
-            cut[ix] = np.mean(wcut)
-        return r, cut
-    
-    if len(data.shape) == 2:
-        r, cut = linecut2D(data, p0, p1, width, dl, dw)
-    if len(data.shape) == 3:
-        l, __, __, __ = calc_length(p0, p1, dl) 
-        cut = np.zeros([data.shape[0], int(np.ceil(l+dl))])
-        for ix, layer in enumerate(data):
-            r, cut[ix] = linecut2D(layer, p0, p1, width, dl, dw)
+    if len(data.shape) not in (2, 3):
+        raise TypeError('Data must be 2D or 3D numpy array.')
+    r, x, y, theta = _linecut_grid(p0, p1, width, dl, dw)
+    cut = sample(data, x, y, order=kind).mean(axis=-2)
     if show:
-        __, theta, __, __ = calc_length(p0, p1, dl)
         (wx00, wx01), (wy00, wy01) = get_perp_line(p0[0], p0[1], theta, width)
         (wx10, wx11), (wy10, wy11) = get_perp_line(p1[0], p1[1], theta, width)
         ax.plot([p0[0],p1[0]], [p0[1],p1[1]], 'k--', **kwarg)
@@ -1304,6 +1558,87 @@ def linecut(data, p0, p1, width=1, dl=0, dw=0, kind='linear',
     return r, cut
 
 
+
+def fan_linecut(data, p0, length, angles, width=1, dl=0, dw=0, kind='linear',
+                show=False, ax=None, **kwarg):
+    '''Linecuts along many angles from a common starting point, e.g. for
+    dispersion plots of QPI data.  All cuts and all layers are sampled in a
+    single call, and each cut is the same as linecut(data, p0, p1) with
+    p1 = p0 + length*(cos(angle), sin(angle)).
+
+    Inputs:
+        data    - Required : A 2D or 3D numpy array.
+        p0      - Required : A tuple containing indicies for the start of the
+                             linecuts: p0=(x0,y0)
+        length  - Required : Float containing length of the linecuts.
+        angles  - Required : List of angles (IN DEGREES) of the linecuts.
+        width   - Optional : Float for perpendicular width to average over.
+        dl      - Optional : Extra pixels for interpolation in the linecut
+                             direction.
+        dw      - Optional : Extra pixels for interpolation in the
+                             perpendicular direction.
+        kind    - Optional : Sting for interpolation scheme. Options are:
+                             'nearest', 'linear', 'cubic', 'quintic'.
+        show    - Optional : Boolean determining whether to plot where the
+                             linecuts were taken.
+        ax      - Optional : Matplotlib axes instance to plot where linecuts
+                             are taken.  Required if show=True.
+        **kwarg - Optional : Additional keyword arguments passed to ax.plot().
+
+    Returns:
+        r   -   1D numpy array which goes from 0 to the length of the cuts.
+        cut -   2D array (angle, r) for 2D data, or 3D array (angle, layer,
+                r) for 3D data.
+
+    Usage:
+        r, cuts = fan_linecut(data.LIY, (256, 256), 200, np.arange(0, 46, 5),
+                              width=5)
+    '''
+    if len(data.shape) not in (2, 3):
+        raise TypeError('Data must be 2D or 3D numpy array.')
+    angles = np.radians(np.atleast_1d(angles))
+    n = int(np.ceil(length+dl))
+    xs, ys = [], []
+    for angle in angles:
+        p1 = (p0[0] + length*np.cos(angle), p0[1] + length*np.sin(angle))
+        __, x, y, __ = _linecut_grid(p0, p1, width, dl, dw, n=n)
+        xs.append(x)
+        ys.append(y)
+    r = np.linspace(0, length, n)
+    cut = sample(data, np.array(xs), np.array(ys), order=kind).mean(axis=-2)
+    if len(data.shape) == 3:
+        cut = np.moveaxis(cut, 0, 1)
+    if show:
+        for angle in angles:
+            ax.plot([p0[0], p0[0]+length*np.cos(angle)],
+                    [p0[1], p0[1]+length*np.sin(angle)], 'k--', **kwarg)
+    return r, cut
+
+
+def _linecut_grid(p0, p1, width, dl, dw, n=None):
+    '''
+    Sampling points of a linecut from p0 to p1: n points along the cut,
+    each averaged over ceil(width+dw) points on a perpendicular line of
+    length width.  Returns r, the x and y coordinates of shape (width
+    points, n) and the angle theta of the cut.
+    '''
+    dx = float(p1[0]-p0[0])
+    dy = float(p1[1]-p0[1])
+    l = np.sqrt(dy**2 + dx**2)
+    if dx == 0:
+        theta = np.pi/2
+    else:
+        theta = np.arctan(dy / dx)
+    if n is None:
+        n = int(np.ceil(l+dl))
+    r = np.linspace(0, l, n)
+    xtot = np.linspace(p0[0], p1[0], n)
+    ytot = np.linspace(p0[1], p1[1], n)
+    w = width/2.0 * np.linspace(-1, 1, int(np.ceil(width+dw)))[:, None]
+    x = xtot + w*np.cos(np.pi/2 - theta)
+    y = ytot - w*np.sin(np.pi/2 - theta)
+    return r, x, y, theta
+
 def crop(data, cen, width=15):
     '''Crops data to be square.
 
@@ -1394,21 +1729,23 @@ def boxcar_average1D(data, N):
         N       - Required : Integer describing the width of the boxcar window.
     
     Returns:
-        averagedData - Data with filter applied
+        averagedData - Data with filter applied, in the working dtype (see
+                       stmpy.set_dtype).  The running sums use float64.
 
     History:
         2017-07-14  - HP : Initial commit. 
     '''
     def running_mean(x, N):
-        cumsum = np.cumsum(np.insert(x, 0, 0)) 
-        return (cumsum[N:] - cumsum[:-N]) / N 
+        cumsum = np.cumsum(np.insert(x, 0, 0), dtype=np.float64) 
+        return ((cumsum[N:] - cumsum[:-N]) / N).astype(config.get_dtype())
     if type(N) != int:
         raise TypeError('N must be an integer.')
     if len(data.shape) == 1:
         return running_mean(data, N)
     elif len(data.shape) == 3: 
         getShape = running_mean(data[:,0,0], N) 
-        output = np.zeros([data.shape[0] - N + 1, data.shape[1], data.shape[2]])
+        output = np.zeros([data.shape[0] - N + 1, data.shape[1], data.shape[2]],
+                          dtype=config.get_dtype())
         for ix in range(data.shape[2]):
             for iy in range(data.shape[1]):
                 output[:,iy,ix] = running_mean(data[:,iy,ix], N)
@@ -1586,7 +1923,7 @@ def shift_DOS_en(en, LIY, shift, enNew=None, **kwargs):
 
     Returns:
         LIYshift - 3D array contining the LIY values once the shift has been
-                   applied.
+                   applied, in the working dtype (see stmpy.set_dtype).
 
     History:
         2017-08-24  - HP : Initial commit.
@@ -1595,7 +1932,8 @@ def shift_DOS_en(en, LIY, shift, enNew=None, **kwargs):
         shift = np.zeros_like(LIY[0]) + shift
     if enNew is None:
         enNew = en.copy()
-    output = np.zeros([len(enNew), LIY.shape[1], LIY.shape[2]])
+    output = np.zeros([len(enNew), LIY.shape[1], LIY.shape[2]],
+                      dtype=config.get_dtype())
     for ix in range(LIY.shape[2]):
         for iy in range(LIY.shape[1]):
             f = interp1d(en-shift[iy,ix], LIY[:,iy,ix], bounds_error=False,
@@ -0,0 +1,359 @@
+'''
+Reference implementations from before the loaders and tools were
+vectorized.  They are kept as straightforward loops (with only the changes
+needed to run on current numpy) so that the tests can check the new code
+returns the same results.
+'''
+
+import re
+import numpy as np
+from struct import unpack
+from datetime import datetime
+
+
+class Spy(object):
+    pass
+
+
+def load_3ds(filePath):
+    fileObj = open(filePath, 'rb')
+    self = Spy()
+    self.header = {}
+    while True:
+        line = fileObj.readline().strip().decode('utf-8')
+        if line == ':HEADER_END:':
+            break
+        splitLine = line.split('=')
+        self.header[splitLine[0]] = splitLine[1]
+    info = {'params'    : int(self.header['# Parameters (4 byte)']),
+            'paramName' : self.header['Fixed parameters'][1:-1].split(';') +
+                          self.header['Experiment parameters'][1:-1].split(';'),
+            'channels'  : self.header['Channels'][1:-1].split(';'),
+            'points'    : int(self.header['Points']),
+            'sizex'     : int(self.header['Grid dim'][1:-1].split(' x ')[0]),
+            'sizey'     : int(self.header['Grid dim'][1:-1].split(' x ')[1]),
+            }
+    self.grid = {}; self.scan = {}
+    for channel in info['channels']:
+        self.grid[channel] = np.zeros([info['points'], info['sizey'], info['sizex']])
+    for channel in info['paramName']:
+        self.scan[channel] = np.zeros([info['sizey'], info['sizex']])
+    try:
+        for iy in range(info['sizey']):
+            for ix in range(info['sizex']):
+                for channel in info['paramName']:
+                    value = unpack('>f', fileObj.read(4))[0]
+                    self.scan[channel][iy,ix] = value
+                for channel in info['channels']:
+                    for ie in range(info['points']):
+                        value = unpack('>f', fileObj.read(4))[0]
+                        self.grid[channel][ie,iy,ix] = value
+    except Exception:
+        pass
+    fileObj.close()
+    self.LIY = self.grid['LIY 1 omega (A)']
+    self.didv = np.mean(self.LIY, axis=(1,2))
+    self.didvStd = np.std(self.LIY, axis=(1,2))
+    self.I = self.grid['Current (A)']
+    self.Z = self.grid['Z (m)'][0]
+    self.en = np.linspace(self.scan['Sweep Start'].flatten()[0],
+                          self.scan['Sweep End'].flatten()[0],
+                          info['points'])
+    return self
+
+
+def load_nsp(filePath):
+    fileObj = open(filePath, 'rb')
+    self = Spy()
+    self.header = {}
+    while True:
+        line = fileObj.readline().strip().decode('utf-8')
+        if line == ':HEADER_END:':
+            break
+        elif re.match('^:.*:$', line):
+            tagname = line[1:-1]
+        else:
+            try:
+                self.header[tagname] = int(line.split('\t')[0])
+            except ValueError:
+                self.header[tagname] = line.split('\t')[0]
+    rows = int(self.header['DATASIZEROWS'])
+    cols = int(self.header['DATASIZECOLS'])
+    self.freq = np.linspace(0, np.round(cols * float(self.header['DELTA_f'])), cols)
+    self.start = datetime.strptime(self.header['START_DATE'] +
+            self.header['START_TIME'], '%d.%m.%Y%H:%M:%S')
+    self.end = datetime.strptime(self.header['END_DATE'] +
+            self.header['END_TIME'], '%d.%m.%Y%H:%M:%S')
+    self.time = np.linspace(0, (self.end - self.start).total_seconds(), rows)
+    self.data = np.zeros([rows, cols])
+    fileObj.read(2)
+    for ix in range(rows):
+        for iy in range(cols):
+            self.data[ix,iy] = unpack('>f', fileObj.read(4))[0]
+    fileObj.close()
+    return self
+
+
+def load_dat(filePath):
+    fileObj = open(filePath, 'rb')
+    self = Spy()
+    self.header = {}
+    self.channels = {}
+    while True:
+        line = fileObj.readline().decode('utf-8')
+        splitLine = line.split('\t')
+        if line[0:6] == '[DATA]':
+            break
+        elif line.rstrip() != '':
+            self.header[splitLine[0]] = splitLine[1]
+    channels = fileObj.readline().decode('utf-8').rstrip().split('\t')
+    allData = []
+    for line in fileObj:
+        line = line.decode('utf-8').rstrip().split('\t')
+        allData.append(np.array(line, dtype=float))
+    allData = np.array(allData)
+    fileObj.close()
+    for ix, channel in enumerate(channels):
+        self.channels[channel] = allData[:,ix]
+    self.didv = self.channels['LIY 1 omega (A)']
+    self.I = self.channels['Current (A)']
+    self.en = self.channels['Bias calc (V)']
+    if 'LIY 1 omega [00001] (A)' in self.channels.keys():
+        sweeps = int(self.header['Bias Spectroscopy>Number of sweeps'])
+        self.LIY = np.zeros([len(self.en), sweeps])
+        for ix in range(1, sweeps+1):
+            s = str(ix).zfill(5)
+            self.LIY[:,ix-1] = self.channels['LIY 1 omega [' + s + '] (A)']
+        self.didvStd = np.std(self.LIY, axis=1)
+    return self
+
+
+def load_sxm(filePath):
+    fileObj = open(filePath, 'rb')
+    self = Spy()
+    self.header = {}
+    fileObj.readline()
+    self.header['version'] = int(fileObj.readline())
+    while True:
+        line = fileObj.readline().strip().decode('utf-8')
+        if re.match('^:.*:$', line):
+            tagname = line[1:-1]
+        else:
+            if tagname == 'SCAN_PIXELS':
+                self.header['scan_pixels'] = [float(i) for i in re.split(r'\s+', line)]
+            elif tagname == 'DATA_INFO':
+                keys = line.split('\t')
+                self.header['data_info'] = []
+                while True:
+                    line = fileObj.readline().strip().decode('utf-8')
+                    if not line:
+                        break
+                    values = line.strip().split('\t')
+                    self.header['data_info'].append(dict(zip(keys, values)))
+            elif tagname == 'SCANIT_END':
+                break
+    fileObj.readline()
+    fileObj.read(2)
+    size = int(self.header['scan_pixels'][0] * self.header['scan_pixels'][1] * 4)
+    shape = [int(val) for val in self.header['scan_pixels']]
+    self.channels = {}
+    for channel in self.header['data_info']:
+        if channel['Direction'] == 'both':
+            self.channels[channel['Name'] + '_Fwd'] = np.ndarray(
+                    shape=shape[::-1], dtype='>f', buffer=fileObj.read(size))
+            self.channels[channel['Name'] + '_Bkd'] = np.ndarray(
+                    shape=shape[::-1], dtype='>f', buffer=fileObj.read(size))
+        else:
+            self.channels[channel['Name'] + channel['Direction']] = np.ndarray(
+                    shape=shape[::-1], dtype='>f', buffer=fileObj.read(size))
+    self.Z = self.channels['Z_Fwd']
+    self.I = self.channels['Current_Fwd']
+    self.LIY = self.channels['LIY_1_omega_Fwd']
+    fileObj.close()
+    return self
+
+
+def azimuthalAverageRaw(F, x0, y0, rmax):
+    f = []; p = []; R = []; FAvg = []
+    for x in range(F.shape[1]):
+        for y in range(F.shape[0]):
+            r = np.sqrt((x-x0)**2 + (y-y0)**2)
+            if r <= rmax:
+                p.append(r)
+                f.append(F[y,x])
+    for r0 in set(np.sort(p)):
+        R.append(r0)
+        allFVals = [f0 for ix, f0 in enumerate(f) if p[ix] == r0]
+        FAvg.append(np.mean(allFVals))
+    R = np.array(R); ixSorted = R.argsort()
+    return R[ixSorted], np.array(FAvg)[ixSorted]
+
+
+def lineSubtract(data, n=1, normalize=True, colSubtract=False):
+    def subtract_1D(data, n):
+        x = np.linspace(0, 1, len(data))
+        popt = np.polyfit(x, data, n)
+        return data - np.polyval(popt, x)
+    def subtract_2D(data, n):
+        norm = 0 if normalize else np.mean(data)
+        output = np.zeros_like(data)
+        for ix, line in enumerate(data):
+            output[ix] = subtract_1D(line, n)
+        if colSubtract:
+            temp = np.zeros_like(np.transpose(data))
+            for ix, line in enumerate(np.transpose(output)):
+                temp[ix] = subtract_1D(line, n)
+            output = np.transpose(temp)
+        return output + norm
+    if len(data.shape) == 3:
+        output = np.zeros_like(data)
+        for ix, layer in enumerate(data):
+            output[ix] = subtract_2D(layer, n)
+        return output
+    elif len(data.shape) == 2:
+        return subtract_2D(data, n)
+    return subtract_1D(data, n)
+
+
+def fft(dataIn, window='None', output='absolute', zeroDC=False, beta=1.0):
+    def ft2(data):
+        ftData = np.fft.fft2(data)
+        if zeroDC:
+            ftData[0,0] = 0
+        return np.fft.fftshift(ftData)
+    outputFunctions = {'absolute':np.absolute, 'real':np.real,
+                       'imag':np.imag, 'phase':np.angle, 'complex':(lambda x:x)}
+    windowFunctions = {'None':(lambda x:np.ones(x)), 'bartlett':np.bartlett,
+                       'blackman':np.blackman, 'hamming':np.hamming,
+                       'hanning':np.hanning, 'kaiser':np.kaiser}
+    outputFunction = outputFunctions[output]
+    windowFunction = windowFunctions[window]
+    data = dataIn.copy()
+    if zeroDC:
+        if len(data.shape) == 3:
+            for ix, layer in enumerate(data):
+                data[ix] -= np.mean(layer)
+        else:
+            data -= np.mean(data)
+    if len(data.shape) != 1:
+        if window == 'kaiser':
+            wX = windowFunction(data.shape[-2], beta)[:,None]
+            wY = windowFunction(data.shape[-1], beta)[None,:]
+        else:
+            wX = windowFunction(data.shape[-2])[:,None]
+            wY = windowFunction(data.shape[-1])[None,:]
+        W = wX * wY
+        if len(data.shape) == 2:
+            return outputFunction(ft2(data * W))
+        wData = data * W
+        ftData = np.zeros_like(data, dtype=complex if output == 'complex' else float)
+        for ix, layer in enumerate(wData):
+            ftData[ix] = outputFunction(ft2(layer))
+        return ftData
+    if window == 'kaiser':
+        W = windowFunction(data.shape[0], beta)
+    else:
+        W = windowFunction(data.shape[0])
+    return outputFunction(np.fft.fftshift(np.fft.fft(data * W)))
+
+
+def quickFT(data, zero_center=True):
+    def ft2(data):
+        ft = np.fft.fft2(data)
+        if zero_center:
+            ft[0,0] = 0
+        return np.absolute(np.fft.fftshift(ft))
+    if len(data.shape) == 2:
+        return ft2(data)
+    output = np.zeros_like(data)
+    for ix, layer in enumerate(data):
+        output[ix] = ft2(layer)
+    return output
+
+
+def qkrdasciifile(filename, delimiter='\t'):
+    with open(filename, 'r') as f:
+        lines = f.readlines()
+    ih = 0
+    while not lines[ih].lstrip('- \t')[0].isdigit():
+        ih = ih + 1
+    header = lines[:ih]
+    idt = 0
+    while lines[ih+idt].lstrip('- \t')[0].isdigit():
+        idt = idt + 1
+        if ih+idt == len(lines):
+            break
+    endnote = lines[(ih+idt):]
+    rows = idt
+    cols = len(lines[ih].lstrip('\t').split(delimiter))
+    data = np.zeros((cols, rows))
+    for ir in range(rows):
+        tmp = lines[ir+ih].lstrip('\t').split(delimiter)
+        for ic in range(cols):
+            data[ic, ir] = float(tmp[ic])
+    return data, header, endnote
+
+
+def interp2d_nearest(x, y, z):
+    from scipy.interpolate import NearestNDInterpolator
+    X, Y = np.meshgrid(x, y)
+    points = np.array([X.flatten(), Y.flatten()]).T
+    fActual = NearestNDInterpolator(points, z.flatten())
+    def fCall(x, y):
+        lx = 1 if type(x) is not np.ndarray else x.shape[0]
+        ly = 1 if type(y) is not np.ndarray else y.shape[0]
+        X, Y = np.meshgrid(x, y)
+        points = np.array([X.flatten(), Y.flatten()]).T
+        return fActual(points).reshape(lx, ly)
+    return fCall
+
+
+def _interp2d_spline(x, y, z, kind):
+    # scipy.interpolate.interp2d was removed from scipy; on a regular grid
+    # it fitted the same interpolating spline as RectBivariateSpline.
+    from scipy.interpolate import RectBivariateSpline
+    k = {'linear': 1, 'cubic': 3, 'quintic': 5}[kind]
+    spline = RectBivariateSpline(x, y, z.T, kx=k, ky=k)
+    return lambda xnew, ynew: spline.ev(xnew, ynew)
+
+
+def azimuthalAverage(F, x0, y0, r, theta, kind='linear'):
+    f = _interp2d_spline(np.arange(F.shape[1]), np.arange(F.shape[0]), F, kind)
+    Z = np.zeros_like(r); fTheta = np.zeros_like(theta)
+    for ix, r0 in enumerate(r):
+        x = r0*np.cos(theta) + x0
+        y = r0*np.sin(theta) + y0
+        for iy, (xn,yn) in enumerate(zip(x,y)):
+            fTheta[iy] = f(xn,yn)
+        Z[ix] = np.mean(fTheta)
+    return Z
+
+
+def arc_linecut(data, p0, length, angle, width=20, dl=0, dw=100, kind='linear'):
+    theta = np.radians(angle)
+    dtheta = np.radians(width/2.0)
+    r = np.linspace(0, length, round(length+dl))
+    t = np.linspace(theta-dtheta, theta+dtheta, round(dw))
+    if len(data.shape) == 2:
+        cut = azimuthalAverage(data, p0[0], p0[1], r, t, kind=kind)
+    else:
+        cut = np.zeros([data.shape[0], len(r)])
+        for ix, layer in enumerate(data):
+            cut[ix] = azimuthalAverage(layer, p0[0], p0[1], r, t, kind=kind)
+    return r, cut
+
+
+def driftcorr_lockin(A, ux, uy, interpolation):
+    A_corr = np.zeros_like(A)
+    s = np.shape(A)[-1]
+    t = np.arange(s, dtype='float')
+    x, y = np.meshgrid(t, t)
+    xnew = (x - ux).ravel()
+    ynew = (y - uy).ravel()
+    tmp = np.zeros(s**2)
+    for iz, layer in enumerate(A.reshape((-1, s, s))):
+        tmp_f = _interp2d_spline(t, t, layer, interpolation)
+        for ix in range(tmp.size):
+            tmp[ix] = tmp_f(xnew[ix], ynew[ix])
+        A_corr.reshape((-1, s, s))[iz] = tmp.reshape(s, s)
+    return A_corr
@@ -0,0 +1,21 @@
+import pytest
+from stmpy import bench
+
+
+@pytest.fixture(scope='session')
+def files(tmp_path_factory):
+    '''Small synthetic data files written with the stmpy.bench writers.  The
+    grid and scan are not square so that transposed axes are caught.'''
+    directory = tmp_path_factory.mktemp('data')
+    path = lambda name: str(directory / name)
+    return {'3ds' : bench.write_3ds(path('grid.3ds'), nx=12, ny=10, points=16),
+            'sxm' : bench.write_sxm(path('scan.sxm'), nx=24, ny=20),
+            'dat' : bench.write_dat(path('point.dat'), points=64, sweeps=3),
+            'nsp' : bench.write_nsp(path('noise.nsp'), rows=8, cols=32),
+            }
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    '''Keep the load() cache off unless a test asks for it.'''
+    monkeypatch.delenv('STMPY_CACHE_DIR', raising=False)
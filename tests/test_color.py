@@ -0,0 +1,42 @@
+import os
+import numpy as np
+
+from stmpy.color import lut
+
+
+def test_compile_luts(tmp_path):
+    filePath = lut.compile_luts(str(tmp_path / 'stmview.lut.npz'))
+    with np.load(filePath) as npz:
+        names = list(npz['names'])
+        table = npz['lut'].astype(np.float32)
+    assert names == lut.names()
+    for name, ref in zip(names, table):
+        np.testing.assert_array_equal(lut.get_lut(name), ref)
+        np.testing.assert_array_equal(lut.get_lut(name + '_r'), ref[::-1])
+
+
+def test_apply():
+    table = lut.get_lut('blue2')
+    data = np.array([[0., 0.5, 1.], [np.nan, 0.25, 2.]])
+    rgba = lut.apply(data, 'blue2', vmin=0, vmax=1)
+    np.testing.assert_array_equal(rgba[0], table[[0, 128, 255]])
+    np.testing.assert_array_equal(rgba[1, 1:], table[[64, 255]])
+    np.testing.assert_array_equal(rgba[1, 0], 0)
+    rgba = lut.apply(data, 'blue2', vmin=0, vmax=1, bytes=True)
+    assert rgba.dtype == np.uint8
+    np.testing.assert_array_equal(rgba[0], (table[[0, 128, 255]] * 255)
+                                  .astype(np.uint8))
+
+
+def test_lut_cache(tmp_path, monkeypatch):
+    '''The LUT file is compiled into the user cache and color/maps is left
+    untouched; an up to date file there is read without recompiling.'''
+    monkeypatch.setenv('STMPY_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(lut, '_luts', None)
+    before = sorted(os.listdir(lut._path))
+    table = lut.get_lut('gray').copy()
+    assert sorted(os.listdir(lut._path)) == before
+    assert os.listdir(str(tmp_path)) == ['stmview.lut.npz']
+    monkeypatch.setattr(lut, '_luts', None)
+    monkeypatch.setattr(lut, '_read_source', None)
+    np.testing.assert_array_equal(lut.get_lut('gray'), table)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from scipy import ndimage
+
+from stmpy import bench
+import stmpy.driftcorr as dfc
+import baseline
+
+
+@pytest.fixture(scope='module')
+def stack():
+    return bench.synthetic_map(16, 16, points=3, seed=2)[1]
+
+
+@pytest.fixture(scope='module')
+def drift():
+    y, x = np.mgrid[0:16, 0:16] / 15.0
+    return 0.8 * np.sin(2 * x + y), -0.6 * np.cos(x * y + 1)
+
+
+def test_driftcorr_lockin_matches_baseline(stack, drift):
+    ux, uy = drift
+    for A in [stack[1], stack]:
+        np.testing.assert_allclose(
+                dfc.driftcorr(A, ux, uy, interpolation='linear'),
+                baseline.driftcorr_lockin(A, ux, uy, 'linear'),
+                atol=1e-12 * np.abs(A).max())
+
+
+def test_driftcorr_lockin_cubic(stack, drift):
+    ux, uy = drift
+    y, x = np.mgrid[0:16, 0:16].astype(float)
+    out = dfc.driftcorr(stack, ux, uy)
+    for layer, ref in zip(stack, out):
+        np.testing.assert_allclose(
+                ndimage.map_coordinates(layer, [y - uy, x - ux], order=3,
+                                        mode='nearest'),
+                ref, atol=1e-12 * np.abs(layer).max())
+    zero = np.zeros_like(ux)
+    np.testing.assert_allclose(dfc.driftcorr(stack, zero, zero), stack,
+                               atol=1e-12 * np.abs(stack).max())
+
+
+def test_cropedge_commensurate(stack):
+    bp = np.array([[12, 8], [8, 12], [4, 8], [8, 4]])
+    t1 = np.linspace(0.5, 15.5, 17)[:-1]
+    x, y = np.meshgrid(t1, np.arange(16.))
+    out = dfc.cropedge(stack[0], 0, bp=bp, a1=3, a2=1, force_commen=True)
+    ref = ndimage.map_coordinates(stack[0], [y, x], order=3, mode='nearest')
+    np.testing.assert_allclose(out, ref, atol=1e-12 * np.abs(ref).max())
+    out = dfc.cropedge(stack, 0, bp=bp, a1=1, a2=1, force_commen=True)
+    np.testing.assert_allclose(out, stack, atol=1e-12 * np.abs(stack).max())
@@ -0,0 +1,414 @@
+import os
+import sys
+import shutil
+import numpy as np
+import pytest
+from datetime import datetime
+
+import stmpy
+from stmpy import io, read_all
+from stmpy import bench
+import baseline
+
+
+def test_load_3ds_matches_baseline(files):
+    data = io.load_3ds(files['3ds'])
+    ref = baseline.load_3ds(files['3ds'])
+    assert sorted(data.grid) == sorted(ref.grid)
+    for channel in ref.grid:
+        np.testing.assert_array_equal(data.grid[channel], ref.grid[channel])
+    for name in ref.scan:
+        np.testing.assert_array_equal(data.scan[name], ref.scan[name])
+    for attr in ['LIY', 'I', 'Z', 'en']:
+        np.testing.assert_array_equal(getattr(data, attr), getattr(ref, attr))
+    np.testing.assert_allclose(data.didv, ref.didv, rtol=1e-12)
+    np.testing.assert_allclose(data.didvStd, ref.didvStd, rtol=1e-12)
+
+
+def test_load_3ds_truncated(files, tmp_path, capsys):
+    filePath = str(tmp_path / 'truncated.3ds')
+    with open(files['3ds'], 'rb') as fileObj:
+        raw = fileObj.read()
+    with open(filePath, 'wb') as fileObj:
+        fileObj.write(raw[:-1000])
+    capsys.readouterr()
+    data = io.load_3ds(filePath)
+    out = capsys.readouterr().out
+    assert out.index('WARNING: Data set is not complete.') < \
+           out.index('File import successful.')
+    ref = baseline.load_3ds(files['3ds'])
+    np.testing.assert_array_equal(data.LIY[:, :8], ref.LIY[:, :8])
+    assert (data.LIY[:, -1, -1] == 0).all()
+
+
+def test_load_3ds_lazy(files):
+    data = io.load_3ds(files['3ds'], lazy=True)
+    ref = baseline.load_3ds(files['3ds'])
+    assert not data.grid.is_loaded('Current (A)')
+    np.testing.assert_array_equal(data.grid['Current (A)'], ref.I)
+    assert data.grid.is_loaded('Current (A)')
+    data.materialize()
+    np.testing.assert_array_equal(data.LIY, ref.LIY)
+
+
+def test_load_3ds_partial(files):
+    ref = baseline.load_3ds(files['3ds'])
+    channel = 'LIY 1 omega (A)'
+    data = io.load_3ds(files['3ds'], channels=[channel],
+                       energies=slice(4, 9), roi=(2, 7, 3, 11))
+    assert list(data.grid) == [channel]
+    np.testing.assert_array_equal(data.grid[channel],
+                                  ref.grid[channel][4:9, 2:7, 3:11])
+    np.testing.assert_array_equal(data.en, ref.en[4:9])
+    data = io.load_3ds(files['3ds'], channels=[channel], energies=[0, 5, 15])
+    np.testing.assert_array_equal(data.LIY, ref.LIY[[0, 5, 15]])
+
+
+def test_load_many(files, tmp_path):
+    bad = str(tmp_path / 'bad.sxm')
+    with open(bad, 'wb') as fileObj:
+        fileObj.write(b'not a scan')
+    paths = [files['sxm'], files['3ds'], bad]
+    results = io.load_many(paths, workers=2)
+    assert list(results) == paths
+    assert isinstance(results[bad], Exception)
+    ref = io.load(files['3ds'])
+    np.testing.assert_array_equal(results[files['3ds']].LIY, ref.LIY)
+    np.testing.assert_array_equal(results[files['3ds']].en, ref.en)
+    done = dict(io.load_many(paths[:2], as_completed=True))
+    assert sorted(done) == sorted(paths[:2])
+
+
+def test_load_many_stdout(files, capsys):
+    '''Quiet thread loads only silence the workers, and leave sys.stdout
+    as it was even when as_completed iteration stops early.'''
+    io.load(files['3ds'])
+    printed = capsys.readouterr().out
+    assert printed
+    stdout = sys.stdout
+    results = io.load_many([files['3ds']] * 3, workers=1, as_completed=True)
+    next(results)
+    assert sys.stdout is stdout
+    print('still here')
+    results.close()
+    assert capsys.readouterr().out == 'still here\n'
+    dict(io.load_many([files['3ds']], quiet=False))
+    assert capsys.readouterr().out == printed
+
+
+def test_scan_headers(files, tmp_path):
+    directory = os.path.dirname(files['3ds'])
+    index = str(tmp_path / 'index.jsonl')
+    records = io.scan_headers(directory, index=index)
+    byType = {record['type']: record for record in records}
+    assert sorted(byType) == ['3ds', 'dat', 'nsp', 'sxm']
+    assert byType['3ds']['pixels'] == [12, 10]
+    assert byType['3ds']['points'] == 16
+    assert byType['sxm']['pixels'] == [24, 20]
+    assert byType['dat']['bias'] == pytest.approx(0.1)
+    assert os.path.exists(index)
+    assert io.scan_headers(directory, index=index) == records
+
+
+def _spy_data():
+    data = io.Spy()
+    data.LIY = np.arange(5 * 6 * 7, dtype=np.float32).reshape(5, 6, 7)
+    data.en = np.linspace(-0.1, 0.1, 5)
+    data.grid = {'LIY 1 omega (A)': data.LIY, 'name': 'grid'}
+    data.items = [1, 2.5, 3 + 4j, True, None, 'text', b'raw', 2**70]
+    data.shape = (5, 6)
+    data.objects = np.array([np.arange(3), 'a'], dtype=object)
+    return data
+
+
+def _assert_spy_equal(data, ref):
+    np.testing.assert_array_equal(data.LIY, ref.LIY)
+    assert data.LIY.dtype == ref.LIY.dtype
+    np.testing.assert_array_equal(data.en, ref.en)
+    np.testing.assert_array_equal(data.grid['LIY 1 omega (A)'], ref.LIY)
+    assert data.grid['name'] == 'grid'
+    assert data.items == ref.items
+    assert data.shape == ref.shape
+    np.testing.assert_array_equal(data.objects[0], ref.objects[0])
+    assert data.objects[1] == 'a'
+
+
+def test_spy_round_trip(tmp_path):
+    filePath = str(tmp_path / 'data.spy')
+    ref = _spy_data()
+    io.save_spy(ref, filePath)
+    _assert_spy_equal(io.load_spy(filePath), ref)
+    data = io.load_spy(filePath, keys=['LIY', 'grid/name'], layers=slice(1, 4))
+    np.testing.assert_array_equal(data.LIY, ref.LIY[1:4])
+    assert data.grid == {'name': 'grid'}
+    assert not hasattr(data, 'en')
+    data = io.load_spy(filePath, keys=['LIY'], layers=[0, 4])
+    np.testing.assert_array_equal(data.LIY, ref.LIY[[0, 4]])
+
+
+def test_spy_mmap(tmp_path):
+    filePath = str(tmp_path / 'data.spy')
+    ref = _spy_data()
+    io.save_spy(ref, filePath)
+    data = io.load_spy(filePath, mmap=True)
+    assert isinstance(data.LIY, np.memmap)
+    _assert_spy_equal(data, ref)
+    del data
+
+
+@pytest.mark.parametrize('compression', ['zlib', 'lzma', 'bz2'])
+def test_spy_compression(tmp_path, compression):
+    filePath = str(tmp_path / 'data.spy')
+    ref = _spy_data()
+    io.save_spy(ref, filePath, compression=compression, chunks=(2,))
+    _assert_spy_equal(io.load_spy(filePath), ref)
+    data = io.load_spy(filePath, keys=['LIY'], layers=slice(1, 4))
+    np.testing.assert_array_equal(data.LIY, ref.LIY[1:4])
+    data = io.load_spy(filePath, keys=['LIY'], layers=[0, 4])
+    np.testing.assert_array_equal(data.LIY, ref.LIY[[0, 4]])
+
+
+def test_spy_datetime(tmp_path):
+    filePath = str(tmp_path / 'data.spy')
+    ref = {'start': datetime(2018, 5, 14, 9, 30, 12), 'items': [datetime(2019, 1, 2)]}
+    io.save_spy(ref, filePath)
+    assert io.load_spy(filePath) == ref
+
+
+@pytest.mark.parametrize('fileType', ['3ds', 'sxm', 'dat', 'nsp'])
+def test_cache(files, tmp_path, capsys, fileType):
+    cacheDir = str(tmp_path / 'cache')
+    ref = io.load(files[fileType])
+    first = io.load(files[fileType], cache=cacheDir)
+    assert len(os.listdir(cacheDir)) == 1
+    capsys.readouterr()
+    second = io.load(files[fileType], cache=cacheDir)
+    out = capsys.readouterr().out
+    assert 'WARNING' not in out and 'successful' not in out
+    assert len(os.listdir(cacheDir)) == 1
+    for data in [first, second]:
+        for attr, value in vars(ref).items():
+            if isinstance(value, np.ndarray) and value.dtype != object:
+                np.testing.assert_array_equal(getattr(data, attr), value)
+    if fileType == 'nsp':
+        assert second.start == ref.start and second.end == ref.end
+
+
+def test_grid_follower(files, tmp_path):
+    filePath = str(tmp_path / 'growing.3ds')
+    with open(files['3ds'], 'rb') as fileObj:
+        raw = fileObj.read()
+    ref = baseline.load_3ds(files['3ds'])
+    dataStart = raw.index(b':HEADER_END:') + len(b':HEADER_END:\r\n')
+    size = (len(raw) - dataStart) // 120
+    with open(filePath, 'wb') as fileObj:
+        fileObj.write(raw[:dataStart + 10 * size + 7])
+    follower = io.GridFollower(filePath)
+    assert follower.count == 10
+    with open(filePath, 'wb') as fileObj:
+        fileObj.write(raw[:dataStart + 30 * size + 7])
+    iy, ix, new = follower.update()
+    assert follower.count == 30 and not follower.complete
+    np.testing.assert_array_equal(iy * 12 + ix, np.arange(10, 30))
+    np.testing.assert_array_equal(new['LIY 1 omega (A)'],
+                                  ref.LIY.reshape(16, -1)[:, 10:30])
+    np.testing.assert_allclose(follower.didv,
+                               ref.LIY.reshape(16, -1)[:, :30].mean(axis=1))
+    assert np.isnan(follower.LIY[:, -1, -1]).all()
+    with open(filePath, 'wb') as fileObj:
+        fileObj.write(raw)
+    follower.update()
+    assert follower.complete
+    np.testing.assert_array_equal(follower.LIY, ref.LIY)
+    np.testing.assert_allclose(follower.didv, ref.didv, rtol=1e-12)
+    np.testing.assert_allclose(follower.didvStd, ref.didvStd, rtol=1e-9)
+    np.testing.assert_array_equal(follower.en, ref.en)
+
+
+def test_load_nsp_matches_baseline(files):
+    data = io.load_nsp(files['nsp'])
+    ref = baseline.load_nsp(files['nsp'])
+    for attr in ['data', 'freq', 'time']:
+        np.testing.assert_array_equal(getattr(data, attr), getattr(ref, attr))
+    assert data.start == ref.start and data.end == ref.end
+    np.testing.assert_array_equal(data.fftI, ref.data.T)
+
+
+@pytest.mark.parametrize('mmap', [False, True])
+def test_waterfall(files, mmap):
+    data = io.load_nsp(files['nsp'], mmap=mmap)
+    ref = baseline.load_nsp(files['nsp'])
+    assert isinstance(data.data, np.memmap) == mmap
+    time, spectra = data.waterfall(max_rows=3)
+    # 8 rows in blocks of 4, the smallest power of two giving <= 3 rows.
+    assert spectra.shape == (2, ref.data.shape[1])
+    np.testing.assert_allclose(time, [ref.time[:4].mean(), ref.time[4:].mean()])
+    np.testing.assert_allclose(spectra[1], ref.data[4:].mean(axis=0), rtol=1e-6)
+    time, spectra = data.waterfall(max_rows=5)
+    assert spectra.shape == (4, ref.data.shape[1])
+    np.testing.assert_allclose(spectra[0], ref.data[:2].mean(axis=0), rtol=1e-6)
+    time, spectra = data.waterfall()
+    np.testing.assert_array_equal(time, ref.time)
+    np.testing.assert_allclose(spectra, ref.data, rtol=1e-6)
+
+
+def test_load_dat_matches_baseline(files):
+    data = io.load_dat(files['dat'])
+    ref = baseline.load_dat(files['dat'])
+    for name in ref.channels:
+        np.testing.assert_array_equal(data.channels[name], ref.channels[name])
+    for attr in ['didv', 'I', 'en', 'LIY']:
+        np.testing.assert_array_equal(getattr(data, attr), getattr(ref, attr))
+    np.testing.assert_allclose(data.didvStd, ref.didvStd, rtol=1e-12)
+
+
+def test_load_dat_stack(tmp_path):
+    paths = [bench.write_dat(str(tmp_path / 'point_{:}.dat'.format(ix)),
+                             points=64, seed=seed)
+             for ix, seed in enumerate([3, 1, 2])]
+    stack = io.load_dat_stack(paths)
+    assert stack.paths == paths
+    assert stack.data.shape == (3, 64, len(stack.channels))
+    for ix, filePath in enumerate(paths):
+        ref = baseline.load_dat(filePath)
+        np.testing.assert_array_equal(stack.didv[ix], ref.didv)
+        np.testing.assert_array_equal(stack.I[ix], ref.I)
+        np.testing.assert_array_equal(stack.en, ref.en)
+        np.testing.assert_allclose(stack.biasOffset[ix], io.bias_offset(ref.en, ref.I))
+    pattern = io.load_dat_stack(str(tmp_path / 'point_*.dat'), biasOffset=False)
+    assert pattern.paths == sorted(paths)
+    assert not hasattr(pattern, 'biasOffset')
+    bench.write_dat(str(tmp_path / 'short.dat'), points=32)
+    with pytest.raises(ValueError):
+        io.load_dat_stack(paths + [str(tmp_path / 'short.dat')])
+
+
+def test_load_sxm_matches_baseline(files):
+    ref = baseline.load_sxm(files['sxm'])
+    for lazy in [False, True]:
+        data = io.load_sxm(files['sxm'], lazy=lazy)
+        assert sorted(data.channels) == sorted(ref.channels)
+        for name in ref.channels:
+            np.testing.assert_array_equal(data.channels[name], ref.channels[name])
+        np.testing.assert_array_equal(data.Z, ref.Z)
+
+
+def test_load_3ds_precision(files):
+    with stmpy.precision('float32'):
+        data = io.load_3ds(files['3ds'])
+    ref = baseline.load_3ds(files['3ds'])
+    assert data.LIY.dtype == np.float32
+    np.testing.assert_array_equal(data.LIY, ref.LIY.astype(np.float32))
+
+
+def test_cache_precision(files, tmp_path):
+    cacheDir = str(tmp_path / 'cache')
+    data = io.load(files['sxm'], cache=cacheDir)
+    assert data.Z.dtype == np.float64
+    with stmpy.precision('float32'):
+        data = io.load(files['sxm'], cache=cacheDir)
+    assert data.Z.dtype == np.float32
+    assert len(os.listdir(cacheDir)) == 2
+
+
+def test_load_many_precision(files):
+    with stmpy.precision('float32'):
+        results = io.load_many([files['sxm'], files['3ds']], workers=2)
+    ref = io.load(files['3ds'])
+    assert results[files['3ds']].LIY.dtype == np.float32
+    np.testing.assert_array_equal(results[files['3ds']].LIY,
+                                  ref.LIY.astype(np.float32))
+    assert results[files['sxm']].Z.dtype == np.float32
+
+
+def test_bias_offset():
+    en = np.linspace(-1, 1, 21)
+    offsets = np.array([-0.33, 0.0, 0.27])
+    I = en[None, :] - offsets[:, None]
+    np.testing.assert_allclose(io.bias_offset(en, I, axis=1), offsets,
+                               atol=1e-12)
+    np.testing.assert_allclose(io.bias_offset(en, I[1]), 0, atol=1e-12)
+    assert np.isnan(io.bias_offset(en, np.ones_like(en)))
+
+
+def test_bias_offset_no_crossing(capsys):
+    data = io.Spy()
+    data.en = np.linspace(-1, 1, 11)
+    data.I = np.ones(11)
+    io._correct_bias_offset(data, 'dat')
+    assert 'ERR: No zero crossing' in capsys.readouterr().out
+    np.testing.assert_array_equal(data.en, np.linspace(-1, 1, 11))
+    assert not hasattr(data, 'biasOffset')
+
+
+def test_find_format_by_content(files, tmp_path):
+    for fileType in ['3ds', 'sxm', 'nsp']:
+        filePath = str(tmp_path / ('renamed_' + fileType))
+        shutil.copy(files[fileType], filePath)
+        assert io.find_format(filePath).name == fileType
+
+
+def _write_text(filePath, lines):
+    with open(filePath, 'w') as fileObj:
+        fileObj.write('\n'.join(lines) + '\n')
+    return filePath
+
+
+@pytest.mark.parametrize('chunkLines', [None, 3])
+def test_qkrdasciifile_matches_baseline(tmp_path, monkeypatch, chunkLines):
+    if chunkLines:
+        monkeypatch.setattr(io, '_TEXT_CHUNK', chunkLines)
+    rng = np.random.default_rng(0)
+    rows = ['\t'.join(['{:.6E}'.format(val) for val in row])
+            for row in rng.standard_normal((10, 3))]
+    rows[4] += '\t1.5'
+    filePath = _write_text(str(tmp_path / 'data.txt'),
+                           ['Title', 'x\ty\tz'] + rows + ['End of data', 'Notes'])
+    data, header, endnote = read_all.qkrdasciifile(filePath, returnnotes=True)
+    ref, refHeader, refEndnote = baseline.qkrdasciifile(filePath)
+    np.testing.assert_array_equal(data, ref)
+    assert header == refHeader and endnote == refEndnote
+
+
+@pytest.mark.parametrize('chunkLines', [None, 2])
+def test_qkrdasciifile_errors(tmp_path, monkeypatch, chunkLines):
+    if chunkLines:
+        monkeypatch.setattr(io, '_TEXT_CHUNK', chunkLines)
+    rows = ['1\t2\t3', '4\t5\t6', '7\t8\t9', '10\t11\t12']
+    badToken = rows[:2] + ['7\tnan?\t9'] + rows[3:]
+    filePath = _write_text(str(tmp_path / 'bad.txt'), ['Title'] + badToken)
+    with pytest.raises(ValueError, match='line 4'):
+        read_all.qkrdasciifile(filePath)
+    shortRow = rows[:3] + ['10\t11']
+    filePath = _write_text(str(tmp_path / 'short.txt'), ['Title'] + shortRow)
+    with pytest.raises(ValueError, match='Line 5'):
+        read_all.qkrdasciifile(filePath)
+
+
+def test_load_asc(tmp_path):
+    rng = np.random.default_rng(0)
+    ref = rng.standard_normal((7, 2))
+    rows = ['   '.join(['{:.8E}'.format(val) for val in row]) for row in ref]
+    filePath = _write_text(str(tmp_path / 'curve.asc'),
+                           ['Date:2018-05-14 09:30', 'Bias:0.1', '',
+                            'Bias (V)      Current (A)'] + rows)
+    data = io.load_asc(filePath)
+    assert data.header == {'Date': '2018-05-14 09:30', 'Bias': '0.1'}
+    assert sorted(data.channels) == ['Bias (V)', 'Current (A)']
+    np.testing.assert_allclose(data.x, ref[:, 0], rtol=1e-8)
+    np.testing.assert_allclose(data.channels['Current (A)'], ref[:, 1], rtol=1e-8)
+    rows[3] = rows[3].replace('E', 'Q', 1)
+    _write_text(filePath, ['Bias:0.1', '', 'Bias (V)      Current (A)'] + rows)
+    with pytest.raises(ValueError, match='line 7'):
+        io.load_asc(filePath)
+
+
+def test_load_dat_bad_value(files, tmp_path):
+    with open(files['dat'], 'r') as fileObj:
+        lines = fileObj.read().split('\n')
+    start = lines.index('[DATA]') + 2
+    values = lines[start + 5].split('\t')
+    lines[start + 5] = '\t'.join(['--'] + values[1:])
+    filePath = _write_text(str(tmp_path / 'bad.dat'), lines[:-1])
+    with pytest.raises(ValueError, match='line {:}'.format(start + 6)):
+        io.load_dat(filePath)
@@ -0,0 +1,99 @@
+import numpy as np
+import scipy.io as sio
+
+from stmpy import io, matio, read_STMView
+
+
+def _mappy():
+    mappy = matio.Mappy()
+    rng = np.random.default_rng(0)
+    mappy.map = rng.standard_normal((4, 6, 5))
+    mappy.en = np.linspace(-0.1, 0.1, 4)
+    mappy.ave = mappy.map.mean(axis=(1, 2))
+    mappy.name = 'grid'
+    mappy.info = {'FILENAME': 'grid.3ds', 'BIAS': 0.1, 'PIXELS': np.array([5, 6])}
+    mappy.add_op('synthetic')
+    return mappy
+
+
+def test_mat_round_trip(tmp_path):
+    filePath = str(tmp_path / 'map.mat')
+    ref = _mappy()
+    ref.savemat(filePath)
+    data = matio.load_stmview(filePath)
+    np.testing.assert_array_equal(data.map, ref.map)
+    np.testing.assert_array_equal(data.en, ref.en)
+    np.testing.assert_array_equal(np.ravel(data.ave), ref.ave)
+    assert data.name == 'grid'
+    assert data.info['FILENAME'] == 'grid.3ds'
+    assert np.ravel(data.info['BIAS'])[0] == 0.1
+    assert data.ops == ['synthetic']
+    info = matio.load_stmview(filePath, fields=['info'])
+    assert not hasattr(info, 'map')
+    assert info.info['FILENAME'] == 'grid.3ds'
+
+
+def test_mat_matches_scipy(tmp_path):
+    '''Files written by the streaming writer read back the same with scipy,
+    with the map stored energy last as STM_View expects.'''
+    filePath = str(tmp_path / 'map.mat')
+    ref = _mappy()
+    ref.savemat(filePath)
+    mat = sio.loadmat(filePath)['mappy'][0, 0]
+    np.testing.assert_array_equal(mat['map'], np.moveaxis(ref.map, 0, -1))
+    np.testing.assert_array_equal(np.ravel(mat['e']), ref.en)
+    assert str(mat['name'][0]) == 'grid'
+
+
+def test_mat_reads_scipy_files(tmp_path):
+    filePath = str(tmp_path / 'scipy.mat')
+    ref = _mappy()
+    mhh = {'map': np.moveaxis(ref.map, 0, -1), 'e': ref.en, 'name': ref.name,
+           'info': ref.info}
+    sio.savemat(filePath, {'mappy': mhh}, do_compression=True)
+    data = matio.load_stmview(filePath)
+    np.testing.assert_array_equal(data.map, ref.map)
+    np.testing.assert_array_equal(data.en, ref.en)
+    assert data.info['FILENAME'] == 'grid.3ds'
+
+
+def test_save_load_mat(tmp_path):
+    filePath = str(tmp_path / 'map.mat')
+    ref = _mappy()
+    io.save(ref, filePath)
+    data = io.load(filePath)
+    np.testing.assert_array_equal(data.map, ref.map)
+
+
+def test_load_stmview_types(tmp_path):
+    '''Strings are str, ops a list and the other fields numpy arrays, as
+    Mappy.mat2mappy gave them.'''
+    filePath = str(tmp_path / 'map.mat')
+    _mappy().savemat(filePath)
+    data = matio.load_stmview(filePath)
+    assert type(data.name) is str
+    assert type(data.ops) is list and type(data.ops[0]) is str
+    assert type(data.info) is dict and type(data.info['FILENAME']) is str
+    for value in [data.map, data.en, data.ave, data.info['BIAS'],
+                  data.info['PIXELS']]:
+        assert isinstance(value, np.ndarray) and value.dtype.kind in 'fiu'
+    assert data.map.flags['C_CONTIGUOUS'] and data.en.ndim == 1
+
+
+def test_read_STMView_types(tmp_path):
+    '''The legacy reader keeps the types scipy.io.loadmat gives.'''
+    filePath = str(tmp_path / 'map.mat')
+    _mappy().savemat(filePath)
+    data = read_STMView.load_STMView(filePath)['mappy']
+    assert isinstance(data.name, np.ndarray) and data.name.dtype.kind == 'U'
+    assert data.name[0] == 'grid'
+    assert data.map.shape == (6, 5, 4)
+    assert isinstance(data.info.FILENAME, np.ndarray)
+    assert data.info.FILENAME[0] == 'grid.3ds'
+    np.testing.assert_array_equal(data.info.PIXELS, [[5, 6]])
+    copyPath = str(tmp_path / 'copy.mat')
+    read_STMView.save(copyPath, {'mappy': data})
+    copy = read_STMView.load_STMView(copyPath)['mappy']
+    assert copy.name.dtype.kind == 'U' and copy.name[0] == 'grid'
+    np.testing.assert_array_equal(copy.map, data.map)
+    np.testing.assert_array_equal(copy.info.BIAS, data.info.BIAS)